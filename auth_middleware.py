@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Basic Auth 纯ASGI中间件
+直接处理ASGI消息，不经过 BaseHTTPMiddleware 的请求对象构建和任务转发；
+公共路径使用预先计算的 frozenset 查找，已验证通过的 Authorization 头放入有界LRU缓存，
+命中时无需再做 base64 解码、拆分和凭据比较。
+"""
+
+import time
+import base64
+import logging
+from collections import OrderedDict
+
+from fastapi import status
+from fastapi.responses import JSONResponse
+
+from config import AuthConfig
+from request_tracing import AUTH_SECONDS_SCOPE_KEY
+import service_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _unauthorized(message: str, detail: str) -> JSONResponse:
+    """认证失败响应"""
+    return JSONResponse(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        content={
+            "error": "认证失败",
+            "message": message,
+            "detail": detail
+        },
+        headers={"WWW-Authenticate": "Basic"}
+    )
+
+
+class BasicAuthMiddleware:
+    """
+    Basic Auth认证中间件
+
+    缓存只保存校验通过的完整请求头值，用户名或密码配置变化时整体清空；
+    失败的请求头不缓存，每次都完整校验（凭据比较为常量时间）。
+    """
+
+    def __init__(self, app, cache_size: int = None):
+        """
+        初始化中间件
+
+        Args:
+            app: 下游ASGI应用
+            cache_size: 已验证请求头缓存条数，0 表示不缓存
+        """
+        self.app = app
+        self.public_paths = frozenset(AuthConfig.PUBLIC_PATHS)
+        self.cache_size = AuthConfig.VERIFIED_CACHE_SIZE if cache_size is None else cache_size
+        self._verified = OrderedDict()
+        self._credentials = (AuthConfig.USERNAME, AuthConfig.PASSWORD)
+
+    def _is_cached(self, authorization: bytes) -> bool:
+        """请求头是否已验证通过（只在事件循环线程中访问，无需加锁）"""
+        if self._credentials != (AuthConfig.USERNAME, AuthConfig.PASSWORD):
+            self._verified.clear()
+            self._credentials = (AuthConfig.USERNAME, AuthConfig.PASSWORD)
+            return False
+
+        if authorization not in self._verified:
+            return False
+        self._verified.move_to_end(authorization)
+        return True
+
+    def _remember(self, authorization: bytes):
+        if self.cache_size <= 0:
+            return
+        self._verified[authorization] = True
+        if len(self._verified) > self.cache_size:
+            self._verified.popitem(last=False)
+
+    @staticmethod
+    def _get_authorization(scope) -> bytes:
+        for name, value in scope['headers']:
+            if name == b'authorization':
+                return value
+        return b''
+
+    def _check(self, authorization: bytes):
+        """
+        完整校验请求头
+
+        Returns:
+            校验失败时的401响应；通过时返回 None
+        """
+        header = authorization.decode('latin-1')
+        if not header.startswith("Basic "):
+            return _unauthorized(AuthConfig.AUTH_FAILED_MESSAGE, "请提供Basic Auth认证信息")
+
+        try:
+            encoded_credentials = header.split(" ")[1]
+            decoded_credentials = base64.b64decode(encoded_credentials).decode("utf-8")
+            username, password = decoded_credentials.split(":", 1)
+        except Exception as e:
+            logger.error(f"Basic Auth认证过程中发生错误: {e}")
+            return _unauthorized("认证信息格式错误", str(e))
+
+        if not AuthConfig.validate_credentials(username, password):
+            return _unauthorized("用户名或密码错误", "请检查您的登录凭据")
+
+        self._remember(authorization)
+        return None
+
+    async def __call__(self, scope, receive, send):
+        # 未启用认证、非HTTP请求或公共路径直接通过
+        if scope['type'] != 'http' or not AuthConfig.ENABLE_AUTH or scope['path'] in self.public_paths:
+            await self.app(scope, receive, send)
+            return
+
+        auth_started = time.perf_counter()
+        authorization = self._get_authorization(scope)
+
+        if not self._is_cached(authorization):
+            error_response = self._check(authorization)
+            if error_response is not None:
+                await error_response(scope, receive, send)
+                return
+
+        # 认证成功，继续处理请求（只统计认证通过的请求的认证耗时）
+        auth_seconds = time.perf_counter() - auth_started
+        service_metrics.AUTH_SECONDS.observe(auth_seconds)
+        scope[AUTH_SECONDS_SCOPE_KEY] = auth_seconds
+
+        await self.app(scope, receive, send)
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Basic Auth中间件开销基准
+在只返回固定文本的最小应用上，直接以ASGI调用对比：无中间件、原 BaseHTTPMiddleware 实现
+（每次解码校验、非常量时间比较）、纯ASGI中间件（带/不带已验证缓存）的单请求耗时，
+以与无中间件的差值作为认证开销；同时检查新旧实现对各类请求返回相同的状态码和响应体
+
+用法:
+    python benchmarks/bench_auth.py --requests 20000 --output auth.json
+"""
+
+import sys
+import json
+import time
+import base64
+import asyncio
+import logging
+import argparse
+import platform
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from common import latency_summary
+
+from fastapi import Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.routing import Route
+
+from config import AuthConfig
+from auth_middleware import BasicAuthMiddleware
+
+
+async def legacy_basic_auth_middleware(request: Request, call_next):
+    """原实现：app.middleware("http") 注册的 Basic Auth 中间件（作为对照）"""
+    if not AuthConfig.ENABLE_AUTH:
+        return await call_next(request)
+
+    if request.url.path in AuthConfig.PUBLIC_PATHS:
+        return await call_next(request)
+
+    authorization = request.headers.get("authorization")
+
+    if not authorization or not authorization.startswith("Basic "):
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content={"error": "认证失败", "message": AuthConfig.AUTH_FAILED_MESSAGE,
+                     "detail": "请提供Basic Auth认证信息"},
+            headers={"WWW-Authenticate": "Basic"}
+        )
+
+    try:
+        encoded_credentials = authorization.split(" ")[1]
+        decoded_credentials = base64.b64decode(encoded_credentials).decode("utf-8")
+        username, password = decoded_credentials.split(":", 1)
+
+        if not (username == AuthConfig.USERNAME and password == AuthConfig.PASSWORD):
+            return JSONResponse(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                content={"error": "认证失败", "message": "用户名或密码错误", "detail": "请检查您的登录凭据"},
+                headers={"WWW-Authenticate": "Basic"}
+            )
+
+        return await call_next(request)
+
+    except Exception as e:
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content={"error": "认证失败", "message": "认证信息格式错误", "detail": str(e)},
+            headers={"WWW-Authenticate": "Basic"}
+        )
+
+
+async def endpoint(request):
+    return PlainTextResponse("ok")
+
+
+def build_apps() -> Dict:
+    routes = [Route('/recommend', endpoint), Route('/health', endpoint)]
+    return {
+        'none': Starlette(routes=routes),
+        'legacy_base_http': Starlette(routes=routes, middleware=[
+            Middleware(BaseHTTPMiddleware, dispatch=legacy_basic_auth_middleware)]),
+        'asgi_no_cache': Starlette(routes=routes, middleware=[Middleware(BasicAuthMiddleware, cache_size=0)]),
+        'asgi_cached': Starlette(routes=routes, middleware=[Middleware(BasicAuthMiddleware)]),
+    }
+
+
+def make_scope(path: str, authorization: bytes = None) -> Dict:
+    headers = [(b'host', b'testserver'), (b'user-agent', b'bench')]
+    if authorization is not None:
+        headers.append((b'authorization', authorization))
+    return {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+        'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': b'',
+        'headers': headers, 'client': ('127.0.0.1', 12345), 'server': ('testserver', 80)
+    }
+
+
+async def call(app, scope) -> Tuple[int, bytes]:
+    """以ASGI方式调用一次，返回 (状态码, 响应体)"""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    status_code = next(message['status'] for message in messages if message['type'] == 'http.response.start')
+    body = b''.join(message.get('body', b'') for message in messages if message['type'] == 'http.response.body')
+    return status_code, body
+
+
+def basic(credentials: str) -> bytes:
+    return b'Basic ' + base64.b64encode(credentials.encode('utf-8'))
+
+
+def equivalence_cases() -> List[Tuple[str, Dict]]:
+    valid = f"{AuthConfig.USERNAME}:{AuthConfig.PASSWORD}"
+    return [
+        ('valid', make_scope('/recommend', basic(valid))),
+        ('valid_repeated', make_scope('/recommend', basic(valid))),
+        ('missing', make_scope('/recommend')),
+        ('not_basic', make_scope('/recommend', b'Bearer token')),
+        ('wrong_password', make_scope('/recommend', basic(f"{AuthConfig.USERNAME}:wrong"))),
+        ('no_colon', make_scope('/recommend', basic('nocolon'))),
+        ('bad_base64', make_scope('/recommend', b'Basic !!!')),
+        ('public_path', make_scope('/health')),
+    ]
+
+
+async def check_equivalence(apps: Dict) -> List[Dict]:
+    mismatches = []
+    for name, scope in equivalence_cases():
+        expected = await call(apps['legacy_base_http'], scope)
+        for variant in ('asgi_no_cache', 'asgi_cached'):
+            actual = await call(apps[variant], scope)
+            if actual != expected:
+                mismatches.append({'case': name, 'variant': variant,
+                                   'expected': [expected[0], expected[1].decode('utf-8', 'replace')],
+                                   'actual': [actual[0], actual[1].decode('utf-8', 'replace')]})
+    return mismatches
+
+
+async def time_app(app, scope, requests: int) -> List[float]:
+    for _ in range(min(200, requests)):
+        await call(app, scope)
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await call(app, scope)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+async def run(args) -> Dict:
+    apps = build_apps()
+    mismatches = await check_equivalence(apps)
+    scope = make_scope('/recommend', basic(f"{AuthConfig.USERNAME}:{AuthConfig.PASSWORD}"))
+
+    variants = {}
+    for name, app in apps.items():
+        samples = await time_app(app, scope, args.requests)
+        variants[name] = latency_summary(samples)
+        variants[name]['mean_us'] = round(sum(samples) / len(samples) * 1e6, 2)
+
+    baseline = variants['none']['mean_us']
+    for name, report in variants.items():
+        report['auth_overhead_us'] = round(report['mean_us'] - baseline, 2)
+
+    return {
+        'benchmark': 'auth',
+        'generated_at': datetime.now().isoformat(),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'config': {'requests': args.requests},
+        'equivalent': not mismatches,
+        'mismatches': mismatches,
+        'variants': variants
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Basic Auth中间件开销基准")
+    parser.add_argument('--requests', type=int, default=20000, help='每种实现的请求数')
+    parser.add_argument('--output', help='结果JSON输出路径（默认输出到标准输出）')
+    args = parser.parse_args()
+
+    logging.disable(logging.ERROR)
+    report = asyncio.run(run(args))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+
+    if report['mismatches']:
+        print(f"❌ {len(report['mismatches'])} 处响应与原实现不一致", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+端到端流水线基准
+在本地模拟OSS上生成 N 个分类 × M 个对象的合成Bucket，测量遍历、构建、保存、加载、
+推荐和刷新各阶段的耗时分位数与吞吐，结果以JSON输出便于跟踪性能回归
+
+用法:
+    python benchmarks/bench_pipeline.py --categories 500 --objects 100 --latency 0.005 --output result.json
+"""
+
+import os
+import json
+import logging
+import argparse
+import platform
+import tempfile
+from datetime import datetime
+
+from common import CHAT_TEXTS, synthetic_category_names, latency_summary, time_call
+from fake_oss import FakeObjectIterator, generate_bucket
+
+from config import OSSConfig
+from emoji_snapshot import RecommenderSnapshot
+from oss_metadata_builder import OSSMetadataBuilder
+from oss_emoji_recommender import OSSEmojiRecommender
+
+
+def repeat_stage(repeat: int, func, *args, **kwargs):
+    """重复执行一个阶段，返回最后一次的结果和全部耗时"""
+    samples, result = [], None
+    for _ in range(repeat):
+        result, elapsed = time_call(func, *args, **kwargs)
+        samples.append(elapsed)
+    return result, samples
+
+
+def stage_report(samples, items: int = None, unit: str = 'objects') -> dict:
+    """阶段耗时汇总；items 为单次处理的条目数，用于计算每秒条目数"""
+    report = latency_summary(samples)
+    if items is not None and report['p50_ms']:
+        report[f'{unit}_per_sec'] = round(items / (report['p50_ms'] / 1000), 1)
+    return report
+
+
+def run(args) -> dict:
+    bucket = generate_bucket(synthetic_category_names(args.categories, seed=args.seed), args.objects,
+                             root_path=OSSConfig.EMOJI_ROOT_PATH, latency=args.latency,
+                             page_size=args.page_size, seed=args.seed)
+    OSSConfig.LIST_WORKERS = args.workers
+
+    def make_builder():
+        return OSSMetadataBuilder(bucket=bucket, object_iterator=FakeObjectIterator)
+
+    builder = make_builder()
+    stages = {}
+
+    # 遍历
+    emoji_files, samples = repeat_stage(args.repeat, builder.list_emoji_files, parallel=False)
+    stages['list_sequential'] = stage_report(samples, len(emoji_files))
+    _, samples = repeat_stage(args.repeat, builder.list_emoji_files, parallel=True)
+    stages['list_parallel'] = stage_report(samples, len(emoji_files))
+
+    # 构建 / 保存
+    metadata, samples = repeat_stage(args.repeat, builder.build_metadata_json, emoji_files)
+    stages['build'] = stage_report(samples, len(emoji_files))
+    _, samples = repeat_stage(args.repeat, builder.save_metadata, metadata)
+    stages['save'] = stage_report(samples, len(emoji_files))
+    stages['save']['json_bytes'] = os.path.getsize(OSSConfig.METADATA_CACHE_FILE)
+    if OSSConfig.USE_BINARY_CACHE:
+        stages['save']['binary_bytes'] = os.path.getsize(OSSConfig.BINARY_CACHE_FILE)
+
+    # 流式全量构建（遍历 + 分组 + 写出）
+    _, samples = repeat_stage(args.repeat, lambda: builder.stream_build_metadata(builder.iter_emoji_files()))
+    stages['stream_build'] = stage_report(samples, len(emoji_files))
+
+    # 加载与快照编译
+    _, samples = repeat_stage(args.repeat, builder.load_cached_metadata, OSSConfig.METADATA_CACHE_FILE)
+    stages['load_json'] = stage_report(samples, len(emoji_files))
+    if OSSConfig.USE_BINARY_CACHE:
+        _, samples = repeat_stage(args.repeat, builder.load_cached_binary_metadata)
+        stages['load_binary'] = stage_report(samples, len(emoji_files))
+    loaded = builder.load_cached_metadata()
+    _, samples = repeat_stage(args.repeat, RecommenderSnapshot, loaded)
+    stages['compile_snapshot'] = stage_report(samples, len(loaded), unit='categories')
+
+    # 推荐
+    recommender = OSSEmojiRecommender(auto_load_metadata=False, builder_factory=make_builder)
+    recommender.load_metadata()
+    for text in CHAT_TEXTS:
+        recommender.recommend(text)
+    samples = [time_call(recommender.recommend, CHAT_TEXTS[i % len(CHAT_TEXTS)])[1]
+               for i in range(args.requests)]
+    stages['recommend'] = stage_report(samples)
+
+    # 刷新（后台构建 + 原子替换）
+    for incremental in (False, True):
+        _, samples = repeat_stage(args.repeat, recommender.refresh_metadata, incremental=incremental)
+        stages['refresh_incremental' if incremental else 'refresh_full'] = stage_report(samples, len(emoji_files))
+
+    return {
+        'benchmark': 'pipeline',
+        'generated_at': datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'scoring_engine': recommender.scoring_engine,
+            'semantic_enabled': recommender.snapshot.semantic_scorer is not None
+        },
+        'config': {
+            'categories': args.categories,
+            'objects_per_category': args.objects,
+            'total_objects': len(emoji_files),
+            'latency_seconds': args.latency,
+            'page_size': args.page_size,
+            'list_workers': args.workers,
+            'list_requests': bucket.list_requests,
+            'repeat': args.repeat,
+            'recommend_requests': args.requests
+        },
+        'stages': stages
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端流水线基准（本地模拟OSS）")
+    parser.add_argument('--categories', type=int, default=200, help='分类数量')
+    parser.add_argument('--objects', type=int, default=50, help='每个分类的对象数量')
+    parser.add_argument('--latency', type=float, default=0.0, help='每次列举请求的模拟延迟（秒）')
+    parser.add_argument('--page-size', type=int, default=1000, help='模拟OSS的单页最大条数')
+    parser.add_argument('--workers', type=int, default=OSSConfig.LIST_WORKERS, help='并行遍历线程数')
+    parser.add_argument('--repeat', type=int, default=3, help='每个阶段的重复次数')
+    parser.add_argument('--requests', type=int, default=2000, help='推荐请求数')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--output', help='结果JSON输出路径（默认输出到标准输出）')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    output = os.path.abspath(args.output) if args.output else None
+
+    # 缓存文件写入临时目录，不影响工作目录中的真实缓存
+    with tempfile.TemporaryDirectory(prefix='emoji-bench-') as workdir:
+        OSSConfig.METADATA_CACHE_FILE = os.path.join(workdir, 'oss_emoji_metadata.json')
+        OSSConfig.BINARY_CACHE_FILE = os.path.join(workdir, 'oss_emoji_metadata.bin')
+        OSSConfig.MANIFEST_CACHE_FILE = os.path.join(workdir, 'oss_emoji_manifest.json')
+        report = run(args)
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
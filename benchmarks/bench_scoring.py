@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+打分引擎微基准与黄金等价检查
+在固定聊天语料和不同规模的合成分类集合上，对比参考实现（逐分类 calculate_keyword_score）、
+自动机引擎和NumPy向量化引擎的耗时（ns/分类、请求/秒），并断言各引擎的 (分类, 分数) 排序与参考实现完全一致；
+另外检查直接匹配与情绪匹配加分相同时 top_k 的同分排序
+
+用法:
+    python benchmarks/bench_scoring.py --sizes 100,1000,5000 --top-k 5 --output scoring.json
+"""
+
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+from datetime import datetime
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from common import CHAT_TEXTS, synthetic_category_names
+
+from config import MatchingConfig, ModelConfig
+from emoji_snapshot import RecommenderSnapshot
+from oss_emoji_recommender import OSSEmojiRecommender
+import emoji_vectorized
+
+Ranking = List[Tuple[str, float]]
+
+
+def reference_ranking(recommender: OSSEmojiRecommender, categories: Sequence[str], text: str) -> Ranking:
+    """参考实现：逐分类调用 calculate_keyword_score，按分数降序（同分保持分类顺序），只保留正分"""
+    scored = [(category, recommender.calculate_keyword_score(text, category)) for category in categories]
+    return [item for item in sorted(scored, key=lambda item: -item[1]) if item[1] > 0]
+
+
+def to_ranking(snapshot: RecommenderSnapshot, ranked_ids: List[Tuple[int, float]]) -> Ranking:
+    """将 [(分类下标, 分数)] 转换为 [(分类名, 分数)]"""
+    return [(snapshot.categories[category_id], score) for category_id, score in ranked_ids]
+
+
+def build_engines(recommender: OSSEmojiRecommender, snapshot: RecommenderSnapshot,
+                  vector_snapshot, top_k: int) -> Dict[str, Tuple[Callable[[Sequence[str]], List[Ranking]], int]]:
+    """
+    构建各引擎的批量打分函数
+
+    Returns:
+        {引擎名: (函数(texts) -> 每条文本的排序, 比较的排序长度；0 表示完整排序)}
+    """
+    categories = snapshot.categories
+    engines = {
+        'reference': (lambda texts: [reference_ranking(recommender, categories, text) for text in texts], 0),
+        'calculate_category_scores': (
+            lambda texts: [[item for item in recommender.calculate_category_scores(text) if item[1] > 0]
+                           for text in texts], 0),
+        'automaton': (lambda texts: [to_ranking(snapshot, snapshot.rank(snapshot.score(text)))
+                                     for text in texts], 0),
+        'automaton_top_k': (lambda texts: [to_ranking(snapshot, snapshot.automaton_top_k(text, top_k))
+                                           for text in texts], top_k),
+    }
+
+    if vector_snapshot is not None:
+        scorer = vector_snapshot.vector_scorer
+        engines['numpy'] = (lambda texts: [to_ranking(vector_snapshot, vector_snapshot.rank(scorer.score(text)))
+                                           for text in texts], 0)
+        engines['numpy_batch'] = (lambda texts: [to_ranking(vector_snapshot, vector_snapshot.rank(scores))
+                                                 for scores in scorer.score_batch(texts)], 0)
+        engines['numpy_top_k'] = (lambda texts: [to_ranking(vector_snapshot, ranked)
+                                                 for ranked in scorer.top_k_batch(texts, top_k)], top_k)
+
+    return engines
+
+
+def time_engine(func: Callable[[Sequence[str]], List[Ranking]], texts: Sequence[str],
+                min_seconds: float) -> Tuple[List[Ranking], float, int]:
+    """重复运行整个语料直到累计耗时不少于 min_seconds，返回 (结果, 总耗时, 运行的文本数)"""
+    func(texts[:1])  # 预热
+    rounds, elapsed, result = 0, 0.0, None
+    while elapsed < min_seconds or rounds == 0:
+        start = time.perf_counter_ns()
+        result = func(texts)
+        elapsed += (time.perf_counter_ns() - start) / 1e9
+        rounds += 1
+    return result, elapsed, rounds * len(texts)
+
+
+def check_equal_bonuses() -> List[Dict]:
+    """
+    直接匹配与情绪匹配加分相同时的同分检查
+
+    "开心小猫" 只命中情绪关键词，分数与直接匹配的 "猫猫"、"狗狗" 相同，且分类下标更小，
+    因此在任何 k 下都必须排在它们前面（top_k 不能因为直接匹配已够 k 个而提前结束）。
+
+    Returns:
+        与完整排序不一致的记录
+    """
+    categories = ['开心小猫', '猫猫', '狗狗']
+    metadata = {category: [f"https://example.com/sably/{category}/0.gif"] for category in categories}
+    emotion_keywords = {'开心': ['开心']}
+    text = '猫猫和狗狗都很开心'
+
+    saved_bonus = MatchingConfig.EMOTION_MATCH_BONUS
+    MatchingConfig.EMOTION_MATCH_BONUS = MatchingConfig.DIRECT_MATCH_BONUS
+    try:
+        snapshot = RecommenderSnapshot(metadata, emotion_keywords, 'automaton')
+        expected = to_ranking(snapshot, snapshot.rank(snapshot.score(text)))
+        engines = {'automaton_top_k': snapshot.automaton_top_k}
+        if emoji_vectorized.is_available():
+            engines['numpy_top_k'] = RecommenderSnapshot(metadata, emotion_keywords, 'numpy').vector_scorer.top_k
+
+        mismatches = []
+        if expected[0][0] != '开心小猫':
+            mismatches.append({'engine': 'reference', 'text': text, 'expected': '开心小猫 排在第一', 'actual': expected})
+        for name, top_k in engines.items():
+            for k in range(1, len(categories) + 1):
+                actual = to_ranking(snapshot, top_k(text, k))
+                if actual != expected[:k]:
+                    mismatches.append({'engine': f"{name}[equal_bonuses]", 'text': text, 'k': k,
+                                       'expected': expected[:k], 'actual': actual})
+        return mismatches
+    finally:
+        MatchingConfig.EMOTION_MATCH_BONUS = saved_bonus
+
+
+def run_size(size: int, texts: Sequence[str], top_k: int, min_seconds: float, seed: int) -> Dict:
+    """在一个分类规模上运行全部引擎"""
+    categories = synthetic_category_names(size, seed=seed)
+    metadata = {category: [f"https://example.com/sably/{category}/0.gif"] for category in categories}
+
+    recommender = OSSEmojiRecommender(auto_load_metadata=False, scoring_engine='automaton')
+    recommender.emoji_metadata = metadata
+    snapshot = recommender.snapshot
+
+    vector_snapshot = None
+    if emoji_vectorized.is_available():
+        vector_snapshot = RecommenderSnapshot(metadata, recommender.emotion_keywords, 'numpy')
+
+    engines = build_engines(recommender, snapshot, vector_snapshot, top_k)
+    golden = None
+    results, mismatches = {}, []
+
+    for name, (func, limit) in engines.items():
+        rankings, elapsed, evaluated = time_engine(func, texts, min_seconds)
+
+        if golden is None:
+            golden = rankings
+        else:
+            for text, expected, actual in zip(texts, golden, rankings):
+                expected = expected[:limit] if limit else expected
+                if actual != expected:
+                    mismatches.append({'engine': name, 'categories': size, 'text': text,
+                                       'expected': expected[:10], 'actual': actual[:10]})
+
+        results[name] = {
+            'texts_evaluated': evaluated,
+            'ns_per_category': round(elapsed * 1e9 / (evaluated * size), 2),
+            'us_per_request': round(elapsed * 1e6 / evaluated, 2),
+            'requests_per_sec': round(evaluated / elapsed, 1)
+        }
+
+    baseline = results['reference']['requests_per_sec']
+    for name, result in results.items():
+        result['speedup_vs_reference'] = round(result['requests_per_sec'] / baseline, 2)
+
+    return {'categories': size, 'engines': results, 'mismatches': mismatches}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="打分引擎微基准与黄金等价检查")
+    parser.add_argument('--sizes', default='100,1000,5000', help='分类规模，逗号分隔')
+    parser.add_argument('--top-k', type=int, default=5, help='top_k引擎比较的数量')
+    parser.add_argument('--min-seconds', type=float, default=0.5, help='每个引擎的最短计时时间')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--output', help='结果JSON输出路径（默认输出到标准输出）')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    # 只比较关键词打分，不构建语义TF-IDF矩阵
+    ModelConfig.USE_TFIDF_DEFAULT = False
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    runs = [run_size(size, CHAT_TEXTS, args.top_k, args.min_seconds, args.seed) for size in sizes]
+    mismatches = [mismatch for run in runs for mismatch in run.pop('mismatches')]
+    mismatches.extend(check_equal_bonuses())
+
+    report = {
+        'benchmark': 'scoring',
+        'generated_at': datetime.now().isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy_available': emoji_vectorized.is_available()
+        },
+        'config': {'sizes': sizes, 'texts': len(CHAT_TEXTS), 'top_k': args.top_k},
+        'equivalent': not mismatches,
+        'mismatches': mismatches,
+        'runs': runs
+    }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+
+    # 任何引擎与参考实现不一致都视为失败
+    if mismatches:
+        print(f"❌ {len(mismatches)} 处排序与参考实现不一致", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+推荐响应序列化基准与逐字节等价检查
+对比模型路径（构建 EmojiRecommendation / RecommendResponse 后由 Pydantic 或 jsonable_encoder + JSONResponse 序列化）
+和直接编码路径（encode_recommend_response，常量部分预先序列化）的耗时，并断言两者输出逐字节一致；
+另外通过 TestClient 请求 /recommend 和 /recommend/batch，与按模型路径序列化同一推荐结果得到的响应体比较
+
+用法:
+    python benchmarks/bench_serialization.py --categories 1000 --top-k 5 --output serialization.json
+"""
+
+import sys
+import json
+import time
+import base64
+import random
+import logging
+import argparse
+import platform
+from datetime import datetime
+from typing import Callable, Dict, List, Sequence
+
+from common import CHAT_TEXTS, synthetic_category_names
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from config import ModelConfig, ServerConfig
+from oss_api_server import BatchRecommendResponse
+from oss_emoji_recommender import OSSEmojiRecommender
+import oss_api_server
+
+# 额外覆盖需要转义的输入：引号、反斜杠、控制字符、emoji和代理对范围外的字符
+EDGE_TEXTS = [
+    '他说"开心"\\不开心',
+    '换行\n制表\t回车\r',
+    '😂😂😂 笑哭了',
+    ' 行分隔符 段分隔符',
+    '',
+    '<script>alert("开心")</script>',
+]
+
+
+def model_path_pydantic(input_text: str, recommendations: List[Dict]) -> bytes:
+    """模型路径：Pydantic直接序列化（FastAPI按 response_model 输出时的行为）"""
+    return oss_api_server.build_recommend_response(input_text, recommendations).model_dump_json().encode('utf-8')
+
+
+def model_path_json_response(input_text: str, recommendations: List[Dict]) -> bytes:
+    """模型路径：jsonable_encoder + JSONResponse（较早版本FastAPI的行为）"""
+    response = oss_api_server.build_recommend_response(input_text, recommendations)
+    return JSONResponse(jsonable_encoder(response)).body
+
+
+def time_path(func: Callable, cases: Sequence, min_seconds: float) -> Dict:
+    """重复编码全部用例直到累计耗时不少于 min_seconds"""
+    rounds, elapsed = 0, 0.0
+    while elapsed < min_seconds or rounds == 0:
+        start = time.perf_counter_ns()
+        for input_text, recommendations in cases:
+            func(input_text, recommendations)
+        elapsed += (time.perf_counter_ns() - start) / 1e9
+        rounds += 1
+    encoded = rounds * len(cases)
+    return {
+        'responses_encoded': encoded,
+        'us_per_response': round(elapsed * 1e6 / encoded, 2),
+        'responses_per_sec': round(encoded / elapsed, 1)
+    }
+
+
+def build_recommender(categories: int, seed: int) -> OSSEmojiRecommender:
+    names = synthetic_category_names(categories, seed=seed) + ['他说"引号"\\反斜杠', '😂 emoji 分类']
+    metadata = {
+        name: [f"https://example-bucket.oss-cn-beijing.aliyuncs.com/sably/{name}/{index}.gif" for index in range(3)]
+        for name in names
+    }
+    recommender = OSSEmojiRecommender(auto_load_metadata=False)
+    recommender.emoji_metadata = metadata
+    return recommender
+
+
+def compare_end_to_end(recommender: OSSEmojiRecommender, texts: Sequence[str], top_k: int, seed: int) -> List[Dict]:
+    """通过API请求，与按模型路径序列化同一推荐结果（相同随机种子）得到的完整响应体比较"""
+    ServerConfig.EXECUTOR_MODE = 'inline'
+    oss_api_server.recommender = recommender
+    client = TestClient(oss_api_server.app)
+    credentials = base64.b64encode(b"emoji_user:emoji_pass_2025").decode()
+    headers = {"Authorization": f"Basic {credentials}"}
+
+    def expected_single(text):
+        return model_path_pydantic(text, recommender.recommend(text, top_k=top_k))
+
+    def expected_batch():
+        results = [oss_api_server.build_recommend_response(text, recommendations)
+                   for text, recommendations in zip(texts, recommender.recommend_batch(list(texts), top_k=top_k))]
+        return BatchRecommendResponse(results=results, total_count=len(results)).model_dump_json().encode('utf-8')
+
+    def expected_stream():
+        return b''.join(model_path_pydantic(text, recommendations) + b'\n'
+                        for text, recommendations in zip(texts, recommender.recommend_batch(list(texts), top_k=top_k)))
+
+    requests = [('post', '/recommend', {'json': {'input': text, 'top_k': top_k}}, lambda text=text: expected_single(text))
+                for text in texts]
+    requests += [('get', '/recommend', {'params': {'input': text, 'top_k': top_k}}, lambda text=text: expected_single(text))
+                 for text in texts]
+    requests.append(('post', '/recommend/batch', {'json': {'inputs': list(texts), 'top_k': top_k}}, expected_batch))
+    requests.append(('post', '/recommend/batch', {'json': {'inputs': list(texts), 'top_k': top_k, 'stream': True}},
+                     expected_stream))
+
+    mismatches = []
+    for method, path, kwargs, expected in requests:
+        random.seed(seed)
+        response = getattr(client, method)(path, headers=headers, **kwargs)
+        random.seed(seed)
+        body = expected()
+        if response.status_code != 200 or response.content != body:
+            mismatches.append({'path': path, 'method': method, 'request': str(kwargs)[:200],
+                               'status': response.status_code,
+                               'model': body[:300].decode('utf-8', 'replace'),
+                               'actual': response.content[:300].decode('utf-8', 'replace')})
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推荐响应序列化基准与逐字节等价检查")
+    parser.add_argument('--categories', type=int, default=1000, help='分类数量')
+    parser.add_argument('--top-k', type=int, default=5, help='每条推荐的数量')
+    parser.add_argument('--min-seconds', type=float, default=0.5, help='每条路径的最短计时时间')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--output', help='结果JSON输出路径（默认输出到标准输出）')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    ModelConfig.USE_TFIDF_DEFAULT = False
+
+    recommender = build_recommender(args.categories, args.seed)
+    texts = CHAT_TEXTS + EDGE_TEXTS
+    cases = [(text, recommender.recommend(text, top_k=top_k))
+             for text in texts for top_k in sorted({1, args.top_k})]
+
+    oss_api_server.prepare_response_fragments()
+    paths = {
+        'model_pydantic': model_path_pydantic,
+        'model_json_response': model_path_json_response,
+        'fast': oss_api_server.encode_recommend_response,
+    }
+
+    mismatches = []
+    for input_text, recommendations in cases:
+        fast = oss_api_server.encode_recommend_response(input_text, recommendations)
+        for name in ('model_pydantic', 'model_json_response'):
+            expected = paths[name](input_text, recommendations)
+            if fast != expected:
+                mismatches.append({'reference': name, 'input': input_text,
+                                   'expected': expected.decode('utf-8'), 'actual': fast.decode('utf-8')})
+
+    mismatches.extend(compare_end_to_end(recommender, texts, args.top_k, args.seed))
+
+    results = {name: time_path(func, cases, args.min_seconds) for name, func in paths.items()}
+    baseline = results['model_pydantic']['responses_per_sec']
+    for result in results.values():
+        result['speedup_vs_model'] = round(result['responses_per_sec'] / baseline, 2)
+
+    report = {
+        'benchmark': 'serialization',
+        'generated_at': datetime.now().isoformat(),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'config': {'categories': args.categories, 'top_k': args.top_k, 'cases': len(cases)},
+        'equivalent': not mismatches,
+        'mismatches': mismatches,
+        'paths': results
+    }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+
+    if mismatches:
+        print(f"❌ {len(mismatches)} 处响应与模型路径不一致", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
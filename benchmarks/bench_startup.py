@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+冷启动基准
+预先在临时目录生成有效的元数据缓存，然后在全新的子进程中测量：
+  - import: 导入 oss_api_server 的耗时，以及导入后是否已加载 oss2
+  - load: 缓存有效时创建 OSSEmojiRecommender 并加载元数据的耗时，以及之后是否加载了 oss2
+  - first_request: 从启动 uvicorn 进程到第一个 /recommend 请求成功返回的耗时
+
+子进程使用AKSK配置（占位凭据），不会访问真实OSS；缓存有效时整个启动过程不应创建OSS客户端。
+
+用法:
+    python benchmarks/bench_startup.py --categories 2000 --objects 20 --repeat 5 --output startup.json
+"""
+
+import os
+import sys
+import json
+import time
+import base64
+import socket
+import logging
+import argparse
+import platform
+import tempfile
+import subprocess
+import urllib.request
+from datetime import datetime
+from typing import Dict, List
+
+from common import PROJECT_ROOT, synthetic_category_names, latency_summary
+from fake_oss import FakeObjectIterator, generate_bucket
+
+from config import OSSConfig
+
+# 子进程：导入并加载，输出JSON
+IMPORT_SCRIPT = r'''
+import sys, time, json
+started = time.perf_counter()
+import oss_api_server
+imported = time.perf_counter()
+oss2_after_import = 'oss2' in sys.modules
+from config import OSSConfig
+OSSConfig.METADATA_CACHE_FILE, OSSConfig.BINARY_CACHE_FILE, OSSConfig.MANIFEST_CACHE_FILE = sys.argv[1:4]
+from oss_emoji_recommender import OSSEmojiRecommender
+load_started = time.perf_counter()
+recommender = OSSEmojiRecommender(auto_load_metadata=True)
+loaded = time.perf_counter()
+print(json.dumps({
+    'import_seconds': imported - started,
+    'oss2_loaded_after_import': oss2_after_import,
+    'load_seconds': loaded - load_started,
+    'oss2_loaded_after_load': 'oss2' in sys.modules,
+    'categories': len(recommender.emoji_metadata)
+}))
+'''
+
+# 子进程：启动API服务
+SERVE_SCRIPT = r'''
+import sys
+import uvicorn
+import oss_api_server
+from config import OSSConfig
+OSSConfig.METADATA_CACHE_FILE, OSSConfig.BINARY_CACHE_FILE, OSSConfig.MANIFEST_CACHE_FILE = sys.argv[1:4]
+uvicorn.run(oss_api_server.app, host='127.0.0.1', port=int(sys.argv[4]), log_level='warning')
+'''
+
+
+def child_env() -> Dict[str, str]:
+    """子进程环境：占位AKSK凭据，项目根目录加入导入路径"""
+    env = dict(os.environ)
+    env.update({
+        'OSS_USE_ECS_RAM_ROLE': 'false',
+        'OSS_ACCESS_KEY_ID': env.get('OSS_ACCESS_KEY_ID') or 'bench-placeholder-id',
+        'OSS_ACCESS_KEY_SECRET': env.get('OSS_ACCESS_KEY_SECRET') or 'bench-placeholder-secret',
+        'PYTHONPATH': os.pathsep.join(filter(None, [PROJECT_ROOT, env.get('PYTHONPATH')])),
+        'PYTHONDONTWRITEBYTECODE': '1'
+    })
+    return env
+
+
+def prepare_cache(workdir: str, categories: int, objects: int, seed: int) -> List[str]:
+    """在临时目录生成有效的JSON/二进制缓存和对象清单"""
+    paths = [os.path.join(workdir, name) for name in
+             ('oss_emoji_metadata.json', 'oss_emoji_metadata.bin', 'oss_emoji_manifest.json')]
+    OSSConfig.METADATA_CACHE_FILE, OSSConfig.BINARY_CACHE_FILE, OSSConfig.MANIFEST_CACHE_FILE = paths
+
+    from oss_metadata_builder import OSSMetadataBuilder
+
+    bucket = generate_bucket(synthetic_category_names(categories, seed=seed), objects,
+                             root_path=OSSConfig.EMOJI_ROOT_PATH, seed=seed)
+    OSSMetadataBuilder(bucket=bucket, object_iterator=FakeObjectIterator).build_and_save_metadata(force_rebuild=True)
+    return paths
+
+
+def run_import(paths: List[str]) -> Dict:
+    result = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT, *paths], env=child_env(),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_first_request(paths: List[str], timeout: float) -> float:
+    """启动服务进程，返回到第一个 /recommend 请求成功的耗时"""
+    port = free_port()
+    credentials = base64.b64encode(b"emoji_user:emoji_pass_2025").decode()
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}/recommend",
+        data=json.dumps({'input': '今天好开心', 'top_k': 1}).encode('utf-8'),
+        headers={'Authorization': f"Basic {credentials}", 'Content-Type': 'application/json'}
+    )
+
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', SERVE_SCRIPT, *paths, str(port)], env=child_env(),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"服务进程提前退出，退出码 {process.returncode}")
+            try:
+                with urllib.request.urlopen(request, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.005)
+        raise TimeoutError(f"{timeout}s 内服务未就绪")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动基准（导入耗时与首个请求耗时）")
+    parser.add_argument('--categories', type=int, default=2000, help='分类数量')
+    parser.add_argument('--objects', type=int, default=20, help='每个分类的对象数量')
+    parser.add_argument('--repeat', type=int, default=5, help='每项测量的重复次数')
+    parser.add_argument('--timeout', type=float, default=60.0, help='等待服务就绪的最长时间（秒）')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--output', help='结果JSON输出路径（默认输出到标准输出）')
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    output = os.path.abspath(args.output) if args.output else None
+
+    with tempfile.TemporaryDirectory(prefix='emoji-startup-') as workdir:
+        paths = prepare_cache(workdir, args.categories, args.objects, args.seed)
+        imports = [run_import(paths) for _ in range(args.repeat)]
+        first_requests = [run_first_request(paths, args.timeout) for _ in range(args.repeat)]
+
+    report = {
+        'benchmark': 'startup',
+        'generated_at': datetime.now().isoformat(),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+        'config': {'categories': args.categories, 'objects_per_category': args.objects, 'repeat': args.repeat},
+        'import': latency_summary([run['import_seconds'] for run in imports]),
+        'load_metadata': latency_summary([run['load_seconds'] for run in imports]),
+        'first_request': latency_summary(first_requests),
+        'oss2_loaded_after_import': any(run['oss2_loaded_after_import'] for run in imports),
+        'oss2_loaded_after_load': any(run['oss2_loaded_after_load'] for run in imports)
+    }
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
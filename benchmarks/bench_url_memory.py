@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+URL存储内存基准
+比较 dict-of-lists（完整URL字符串）与前缀共享的 PrefixedUrls 的堆内存占用
+
+用法:
+    python benchmarks/bench_url_memory.py --categories 2000 --per-category 200
+"""
+
+import os
+import sys
+import gc
+import json
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import OSSConfig
+from emoji_url_store import PrefixedUrls
+
+CATEGORY_WORDS = ['开心', '难过', '愤怒', '惊讶', '害怕', '无语', '可爱', '搞笑', '尴尬', '委屈', '得意', '困']
+
+
+def synthetic_metadata(categories: int, per_category: int, seed: int = 42) -> dict:
+    """生成带中文分类名的合成元数据"""
+    rng = random.Random(seed)
+    metadata = {}
+    for i in range(categories):
+        category = f"{rng.choice(CATEGORY_WORDS)}_{rng.choice(CATEGORY_WORDS)}_{i}"
+        metadata[category] = [
+            OSSConfig.get_public_url(f"{OSSConfig.EMOJI_ROOT_PATH}{category}/{j:05d}_{rng.getrandbits(32):08x}.gif")
+            for j in range(per_category)
+        ]
+    return metadata
+
+
+def measure(build) -> int:
+    """测量 build() 返回对象在存活期间占用的堆内存（字节）"""
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del obj
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description="URL存储内存基准")
+    parser.add_argument('--categories', type=int, default=2000)
+    parser.add_argument('--per-category', type=int, default=200)
+    args = parser.parse_args()
+
+    OSSConfig.BUCKET_NAME = OSSConfig.BUCKET_NAME or 'emoji-bucket'
+    OSSConfig.ENDPOINT = OSSConfig.ENDPOINT or 'oss-cn-hangzhou.aliyuncs.com'
+
+    # 序列化后再反序列化，模拟从JSON缓存加载出的独立字符串
+    payload = json.dumps(synthetic_metadata(args.categories, args.per_category), ensure_ascii=False)
+
+    dict_of_lists = measure(lambda: json.loads(payload))
+    # 与快照中的存储方式一致：先从JSON加载，再压缩为 PrefixedUrls，只保留压缩后的结果
+    prefixed = measure(lambda: {c: PrefixedUrls(urls) for c, urls in json.loads(payload).items()})
+
+    total_urls = args.categories * args.per_category
+    report = {
+        'categories': args.categories,
+        'urls': total_urls,
+        'dict_of_lists_bytes': dict_of_lists,
+        'prefixed_urls_bytes': prefixed,
+        'dict_of_lists_bytes_per_url': round(dict_of_lists / total_urls, 1),
+        'prefixed_urls_bytes_per_url': round(prefixed / total_urls, 1),
+        'reduction': round(1 - prefixed / dict_of_lists, 3)
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
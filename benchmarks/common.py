@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+基准测试公共工具：合成分类名、聊天语料、计时与分位数统计
+"""
+
+import os
+import sys
+import math
+import time
+import random
+from typing import Callable, Dict, List, Sequence
+
+# 允许以 python benchmarks/xxx.py 方式运行时导入项目模块
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from config import EmotionConfig
+
+SUBJECTS = ['熊猫头', '猫猫', '狗狗', '小黄脸', '兔兔', '企鹅', '柴犬', '蘑菇头', '仓鼠', '鸭鸭', '小熊', '表情包']
+DESCRIPTORS = ['', '超级', '有点', '一直', '假装', '偷偷', '原地', '疯狂']
+
+# 固定的聊天语料：覆盖直接命中分类名、情绪关键词、英文混排和无命中的情况
+CHAT_TEXTS = [
+    '今天真的好开心啊哈哈哈',
+    '气死我了，这个bug改了一整天',
+    '呜呜呜好难过，想哭',
+    '求求你了，抱抱我嘛',
+    '太累了，只想躺着睡觉',
+    '晚上吃什么？好饿了想吃火锅',
+    '哎呀不好意思，脸红了',
+    '没错没错，确实是这样，点赞',
+    '加油！没事的，会好的',
+    '熊猫头表示无语',
+    '猫猫超级可爱，想摸',
+    '这个需求又改了，烦死了真的讨厌',
+    '周五啦，下班去吃蛋糕，美滋滋',
+    'lol 笑死我了 哈哈哈哈',
+    '明天考试，好紧张，压力好大',
+    '收到，好的，马上处理',
+    '今天天气不错',
+    '我也不知道该说什么',
+    'OK 没问题，同意这个方案',
+    '老板说要加班，心情很郁闷很失落',
+    '宝贝晚安，么么哒',
+    '这也太香了吧，流口水',
+    '别哭啦，抱抱，一切都会好的',
+    '柴犬原地爆炸',
+]
+
+
+def synthetic_category_names(count: int, seed: int = 42) -> List[str]:
+    """
+    生成不重复的中文分类名，形如 "熊猫头超级开心"、"猫猫委屈_3"
+
+    Args:
+        count: 分类数量
+        seed: 随机种子
+
+    Returns:
+        分类名列表
+    """
+    rng = random.Random(seed)
+    emotions = list(EmotionConfig.EMOTION_KEYWORDS.keys())
+    keywords = [keyword for words in EmotionConfig.EMOTION_KEYWORDS.values() for keyword in words]
+
+    names, seen = [], set()
+    while len(names) < count:
+        mood = rng.choice(emotions) if rng.random() < 0.6 else rng.choice(keywords)
+        name = f"{rng.choice(SUBJECTS)}{rng.choice(DESCRIPTORS)}{mood}"
+        if name in seen:
+            name = f"{name}_{len(names)}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def percentiles(samples: Sequence[float], points: Sequence[int] = (50, 95, 99)) -> Dict[str, float]:
+    """
+    计算分位数（最近秩法），单位与输入一致
+
+    Args:
+        samples: 样本
+        points: 需要的分位点
+
+    Returns:
+        {'p50': ..., 'p95': ..., 'p99': ..., 'max': ...}
+    """
+    if not samples:
+        return {**{f"p{p}": None for p in points}, 'max': None}
+    ordered = sorted(samples)
+    result = {}
+    for p in points:
+        rank = min(len(ordered), max(1, math.ceil(p / 100 * len(ordered))))
+        result[f"p{p}"] = ordered[rank - 1]
+    result['max'] = ordered[-1]
+    return result
+
+
+def time_call(func: Callable, *args, **kwargs):
+    """调用函数并返回 (结果, 耗时秒数)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def latency_summary(samples_seconds: Sequence[float]) -> Dict[str, float]:
+    """将秒级延迟样本汇总为毫秒分位数和吞吐"""
+    summary = {key: round(value * 1000, 4) if value is not None else None
+               for key, value in percentiles(samples_seconds).items()}
+    total = sum(samples_seconds)
+    return {
+        'count': len(samples_seconds),
+        **{f"{key}_ms": value for key, value in summary.items()},
+        'mean_ms': round(total / len(samples_seconds) * 1000, 4) if samples_seconds else None,
+        'throughput_per_sec': round(len(samples_seconds) / total, 1) if total else None
+    }
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地模拟OSS
+进程内实现 OSSMetadataBuilder 用到的 oss2.Bucket / oss2.ObjectIterator 接口，
+支持可配置的请求延迟和分页大小，用于在没有真实Bucket的情况下做基准测试
+"""
+
+import time
+import random
+import bisect
+import threading
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional, Sequence
+
+
+class FakeObjectInfo:
+    """与 oss2.models.SimplifiedObjectInfo 字段一致的对象信息"""
+
+    __slots__ = ('key', 'last_modified', 'etag', 'type', 'size', 'storage_class')
+
+    def __init__(self, key: str, last_modified: Optional[int], etag: Optional[str],
+                 type: Optional[str], size: Optional[int], storage_class: Optional[str]):
+        self.key = key
+        self.last_modified = last_modified
+        self.etag = etag
+        self.type = type
+        self.size = size
+        self.storage_class = storage_class
+
+    def is_prefix(self) -> bool:
+        """是否为公共前缀（目录）"""
+        return self.last_modified is None
+
+
+class FakeBucket:
+    """
+    内存中的模拟Bucket
+
+    对象按键字典序保存；list_objects 的分页、分隔符和 marker 语义与OSS一致，
+    每次请求按 latency 秒休眠以模拟网络往返，单页最多返回 page_size 条。
+    """
+
+    def __init__(self, objects: Dict[str, int] = None, latency: float = 0.0, page_size: int = 1000,
+                 bucket_name: str = 'fake-bucket'):
+        """
+        Args:
+            objects: {object_key: size}
+            latency: 每次列举请求的模拟延迟（秒）
+            page_size: 服务端单页最大条数，请求的 max_keys 超过时按此截断
+            bucket_name: Bucket名称
+        """
+        self.latency = latency
+        self.page_size = page_size
+        self.bucket_name = bucket_name
+        self.list_requests = 0
+
+        self._lock = threading.Lock()
+        now = int(time.time())
+        self._objects: Dict[str, FakeObjectInfo] = {
+            key: FakeObjectInfo(key, now, f'"{random.getrandbits(64):016X}"', 'Normal', size, 'Standard')
+            for key, size in (objects or {}).items()
+        }
+        self._keys: List[str] = sorted(self._objects)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def put_object(self, key: str, size: int = 1024, last_modified: int = None):
+        """新增或覆盖一个对象"""
+        last_modified = last_modified or int(time.time())
+        etag = f'"{random.getrandbits(64):016X}"'
+        with self._lock:
+            if key not in self._objects:
+                bisect.insort(self._keys, key)
+            self._objects[key] = FakeObjectInfo(key, last_modified, etag, 'Normal', size, 'Standard')
+
+    def delete_object(self, key: str):
+        """删除一个对象"""
+        with self._lock:
+            if self._objects.pop(key, None) is not None:
+                del self._keys[bisect.bisect_left(self._keys, key)]
+
+    def get_bucket_info(self):
+        """模拟 oss2.Bucket.get_bucket_info"""
+        return SimpleNamespace(name=self.bucket_name, creation_date=datetime(2024, 1, 1).isoformat())
+
+    def list_objects(self, prefix: str = '', delimiter: str = '', marker: str = '', max_keys: int = 100,
+                     headers=None):
+        """
+        模拟 oss2.Bucket.list_objects
+
+        Returns:
+            带 object_list / prefix_list / is_truncated / next_marker 的结果对象
+        """
+        if self.latency:
+            time.sleep(self.latency)
+
+        limit = min(max_keys, self.page_size)
+        object_list, prefix_list = [], []
+        last_key = ''
+
+        with self._lock:
+            self.list_requests += 1
+            keys = self._keys
+            i = bisect.bisect_right(keys, marker) if marker else bisect.bisect_left(keys, prefix)
+
+            while i < len(keys) and len(object_list) + len(prefix_list) < limit:
+                key = keys[i]
+                if not key.startswith(prefix):
+                    break
+
+                rest = key[len(prefix):]
+                if delimiter and delimiter in rest:
+                    # 公共前缀计为一条，并跳过该前缀下的全部对象
+                    common_prefix = prefix + rest[:rest.index(delimiter) + len(delimiter)]
+                    prefix_list.append(common_prefix)
+                    upper = common_prefix[:-1] + chr(ord(common_prefix[-1]) + 1)
+                    i = bisect.bisect_left(keys, upper, i)
+                    last_key = keys[i - 1]
+                    continue
+
+                object_list.append(self._objects[key])
+                last_key = key
+                i += 1
+
+            is_truncated = i < len(keys) and keys[i].startswith(prefix)
+
+        return SimpleNamespace(
+            object_list=object_list,
+            prefix_list=prefix_list,
+            is_truncated=is_truncated,
+            next_marker=last_key if is_truncated else ''
+        )
+
+
+class FakeObjectIterator:
+    """模拟 oss2.ObjectIterator：逐页请求并依次产出对象和公共前缀"""
+
+    def __init__(self, bucket: FakeBucket, prefix: str = '', delimiter: str = '', marker: str = '',
+                 max_keys: int = 100, max_retries=None, headers=None):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.delimiter = delimiter
+        self.marker = marker
+        self.max_keys = max_keys
+
+    def __iter__(self) -> Iterator[FakeObjectInfo]:
+        marker = self.marker
+        while True:
+            result = self.bucket.list_objects(self.prefix, self.delimiter, marker, self.max_keys)
+            yield from result.object_list
+            for common_prefix in result.prefix_list:
+                yield FakeObjectInfo(common_prefix, None, None, None, None, None)
+            if not result.is_truncated:
+                return
+            marker = result.next_marker
+
+
+def generate_bucket(category_names: Sequence[str], objects_per_category: int, root_path: str = 'sably/',
+                    latency: float = 0.0, page_size: int = 1000, seed: int = 42) -> FakeBucket:
+    """
+    生成合成Bucket：每个分类一个目录，包含目录占位对象、表情包文件和少量非图片文件
+
+    Args:
+        category_names: 分类名
+        objects_per_category: 每个分类的表情包文件数
+        root_path: 表情包根路径
+        latency: 每次列举请求的模拟延迟（秒）
+        page_size: 服务端单页最大条数
+        seed: 随机种子
+
+    Returns:
+        FakeBucket
+    """
+    rng = random.Random(seed)
+    extensions = ['.gif', '.gif', '.png', '.jpg', '.webp']
+    objects = {}
+
+    for category in category_names:
+        objects[f"{root_path}{category}/"] = 0
+        for j in range(objects_per_category):
+            key = f"{root_path}{category}/{j:05d}_{rng.getrandbits(32):08x}{rng.choice(extensions)}"
+            objects[key] = rng.randint(2_000, 2_000_000)
+        objects[f"{root_path}{category}/说明.txt"] = 128
+
+    return FakeBucket(objects, latency=latency, page_size=page_size)
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+oss_api_server HTTP负载测试
+基于 asyncio 原生连接的 HTTP/1.1 keep-alive 负载生成器（无额外依赖），
+以固定请求速率或固定并发驱动 /recommend (GET/POST) 和 /status，携带 Basic Auth 认证头，
+可在压测过程中并发触发 /refresh，对比刷新期间与平时的尾延迟
+
+用法:
+    # 自动启动基于模拟OSS的服务，固定并发 32，持续 20 秒，第 5 秒触发刷新
+    python benchmarks/load_test.py --launch --concurrency 32 --duration 20 --refresh-at 5
+
+    # 对已启动的服务以 500 req/s 固定速率压测
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --rate 500 --duration 30
+"""
+
+import sys
+import json
+import time
+import base64
+import random
+import asyncio
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+from common import CHAT_TEXTS, percentiles
+
+from config import AuthConfig
+
+DEFAULT_MIX = 'recommend_get=4,recommend_post=4,status=1'
+
+
+class HttpConnection:
+    """单个 HTTP/1.1 keep-alive 连接"""
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, headers: Dict[str, str],
+                      body: bytes = b'') -> Tuple[int, bytes]:
+        """
+        发送请求并读取完整响应
+
+        Returns:
+            (状态码, 响应体)
+        """
+        if self.writer is None or self.writer.is_closing():
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        if body or method == 'POST':
+            lines.append(f"Content-Length: {len(body)}")
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+
+        head = await self.reader.readuntil(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').split('\r\n')
+        status_code = int(status_line.split(' ', 2)[1])
+        response_headers = {}
+        for line in header_lines:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                response_headers[name.strip().lower()] = value.strip()
+
+        if 'content-length' in response_headers:
+            payload = await self.reader.readexactly(int(response_headers['content-length']))
+        elif response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readuntil(b'\r\n')
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readexactly(2)
+            payload = b''.join(chunks)
+        else:
+            payload = await self.reader.read()
+            self.close()
+
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+
+        return status_code, payload
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class LoadTest:
+    """负载测试运行器"""
+
+    def __init__(self, args):
+        url = urlsplit(args.url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.args = args
+        self.rng = random.Random(args.seed)
+
+        token = base64.b64encode(f"{args.username}:{args.password}".encode('utf-8')).decode('ascii')
+        self.auth_headers = {'Authorization': f'Basic {token}', 'Connection': 'keep-alive'}
+
+        self.endpoints, self.weights = [], []
+        for item in args.mix.split(','):
+            name, weight = item.split('=')
+            self.endpoints.append(name.strip())
+            self.weights.append(float(weight))
+
+        self.samples: List[Dict] = []
+        self.refreshes: List[Dict] = []
+        self.idle_connections: List[HttpConnection] = []
+        self.active_connections = 0
+        self.connection_available = None
+
+    def build_request(self, endpoint: str) -> Tuple[str, str, Dict[str, str], bytes]:
+        """按端点构造请求"""
+        text = self.rng.choice(CHAT_TEXTS)
+        top_k = self.args.top_k
+        if endpoint == 'recommend_get':
+            return 'GET', f"/recommend?input={quote(text)}&top_k={top_k}", self.auth_headers, b''
+        if endpoint == 'recommend_post':
+            body = json.dumps({'input': text, 'top_k': top_k}, ensure_ascii=False).encode('utf-8')
+            return 'POST', '/recommend', {**self.auth_headers, 'Content-Type': 'application/json'}, body
+        if endpoint == 'status':
+            return 'GET', '/status', self.auth_headers, b''
+        raise ValueError(f"未知端点: {endpoint}")
+
+    async def send(self, connection: HttpConnection, endpoint: str, scheduled_at: float):
+        """发送一个请求并记录样本；延迟从计划发送时间起算，包含客户端排队时间"""
+        method, path, headers, body = self.build_request(endpoint)
+        sample = {'endpoint': endpoint, 'start': scheduled_at, 'status': None, 'error': None}
+        try:
+            sample['status'], _ = await connection.request(method, path, headers, body)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            sample['error'] = type(e).__name__
+            connection.close()
+        sample['end'] = time.perf_counter()
+        self.samples.append(sample)
+
+    def pick_endpoint(self) -> str:
+        return self.rng.choices(self.endpoints, self.weights)[0]
+
+    async def run_concurrency(self, deadline: float):
+        """固定并发：每个工作协程独占一个连接，收到响应后立即发送下一个请求"""
+        async def worker():
+            connection = HttpConnection(self.host, self.port)
+            while time.perf_counter() < deadline:
+                await self.send(connection, self.pick_endpoint(), time.perf_counter())
+            connection.close()
+
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+
+    async def acquire_connection(self) -> HttpConnection:
+        """从连接池获取连接，达到上限时等待归还"""
+        while not self.idle_connections and self.active_connections >= self.args.max_connections:
+            await self.connection_available.wait()
+            self.connection_available.clear()
+        if self.idle_connections:
+            return self.idle_connections.pop()
+        self.active_connections += 1
+        return HttpConnection(self.host, self.port)
+
+    def release_connection(self, connection: HttpConnection):
+        self.idle_connections.append(connection)
+        self.connection_available.set()
+
+    async def run_rate(self, deadline: float):
+        """固定速率（开环）：按计划时间发出请求，不等待前一个请求完成"""
+        self.connection_available = asyncio.Event()
+        interval = 1.0 / self.args.rate
+        next_at = time.perf_counter()
+        tasks = []
+
+        async def fire(scheduled_at: float):
+            connection = await self.acquire_connection()
+            try:
+                await self.send(connection, self.pick_endpoint(), scheduled_at)
+            finally:
+                self.release_connection(connection)
+
+        while next_at < deadline:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(fire(next_at)))
+            next_at += interval
+
+        await asyncio.gather(*tasks)
+        for connection in self.idle_connections:
+            connection.close()
+
+    async def run_refresh(self, start: float, offset: float):
+        """在压测开始后 offset 秒触发一次 POST /refresh?wait=true 并记录刷新窗口"""
+        await asyncio.sleep(max(0.0, start + offset - time.perf_counter()))
+        connection = HttpConnection(self.host, self.port)
+        path = '/refresh?wait=true'
+        if self.args.refresh_incremental is not None:
+            path += f"&incremental={str(self.args.refresh_incremental).lower()}"
+
+        refresh = {'offset_seconds': offset, 'start': time.perf_counter(), 'status': None, 'error': None}
+        try:
+            refresh['status'], _ = await connection.request('POST', path, self.auth_headers)
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            refresh['error'] = type(e).__name__
+        refresh['end'] = time.perf_counter()
+        connection.close()
+        self.refreshes.append(refresh)
+
+    async def run(self) -> Dict:
+        start = time.perf_counter()
+        deadline = start + self.args.duration
+        driver = self.run_rate(deadline) if self.args.rate else self.run_concurrency(deadline)
+        refreshes = [self.run_refresh(start, offset) for offset in self.args.refresh_at]
+        await asyncio.gather(driver, *refreshes)
+        elapsed = time.perf_counter() - start
+        return self.report(start, elapsed)
+
+    @staticmethod
+    def summarize(samples: List[Dict], elapsed: float) -> Dict:
+        """汇总一组样本的延迟分位数、错误率和吞吐"""
+        latencies = [sample['end'] - sample['start'] for sample in samples]
+        errors = [sample for sample in samples
+                  if sample['error'] is not None or sample['status'] is None or sample['status'] >= 400]
+        summary = {
+            'requests': len(samples),
+            'errors': len(errors),
+            'error_rate': round(len(errors) / len(samples), 4) if samples else None,
+            'status_503': sum(1 for sample in samples if sample['status'] == 503),
+            'throughput_per_sec': round(len(samples) / elapsed, 1) if elapsed else None,
+        }
+        for key, value in percentiles(latencies).items():
+            summary[f'{key}_ms'] = round(value * 1000, 3) if value is not None else None
+        return summary
+
+    def report(self, start: float, elapsed: float) -> Dict:
+        by_endpoint = {}
+        for endpoint in self.endpoints:
+            by_endpoint[endpoint] = self.summarize(
+                [sample for sample in self.samples if sample['endpoint'] == endpoint], elapsed)
+
+        # 请求时间区间与任一刷新窗口重叠即计入"刷新期间"
+        windows = [(refresh['start'], refresh['end']) for refresh in self.refreshes]
+        during = [sample for sample in self.samples
+                  if any(sample['start'] < end and sample['end'] > begin for begin, end in windows)]
+        during_ids = {id(sample) for sample in during}
+        outside = [sample for sample in self.samples if id(sample) not in during_ids]
+        during_seconds = sum(end - begin for begin, end in windows)
+
+        return {
+            'benchmark': 'http_load',
+            'generated_at': datetime.now().isoformat(),
+            'environment': {'python': platform.python_version(), 'platform': platform.platform()},
+            'config': {
+                'url': self.args.url,
+                'mode': 'rate' if self.args.rate else 'concurrency',
+                'rate': self.args.rate,
+                'concurrency': None if self.args.rate else self.args.concurrency,
+                'max_connections': self.args.max_connections if self.args.rate else None,
+                'duration_seconds': self.args.duration,
+                'mix': self.args.mix,
+                'top_k': self.args.top_k,
+                'refresh_at': self.args.refresh_at
+            },
+            'elapsed_seconds': round(elapsed, 3),
+            'overall': self.summarize(self.samples, elapsed),
+            'endpoints': by_endpoint,
+            'refresh': {
+                'runs': [{
+                    'offset_seconds': refresh['offset_seconds'],
+                    'status': refresh['status'],
+                    'error': refresh['error'],
+                    'duration_ms': round((refresh['end'] - refresh['start']) * 1000, 1)
+                } for refresh in self.refreshes],
+                'during_refresh': self.summarize(during, during_seconds) if windows else None,
+                'outside_refresh': self.summarize(outside, elapsed - during_seconds) if windows else None
+            }
+        }
+
+
+def wait_for_health(host: str, port: int, timeout: float) -> bool:
+    """等待服务的 /health 返回200"""
+    async def probe():
+        connection = HttpConnection(host, port)
+        try:
+            status_code, _ = await connection.request('GET', '/health', {'Connection': 'close'})
+            return status_code == 200
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            return False
+        finally:
+            connection.close()
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if asyncio.run(probe()):
+            return True
+        time.sleep(0.5)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="oss_api_server HTTP负载测试")
+    parser.add_argument('--url', default='http://127.0.0.1:8765', help='服务地址')
+    parser.add_argument('--username', default=AuthConfig.USERNAME)
+    parser.add_argument('--password', default=AuthConfig.PASSWORD)
+    parser.add_argument('--rate', type=float, help='固定请求速率（req/s），不指定时使用固定并发')
+    parser.add_argument('--concurrency', type=int, default=16, help='固定并发数')
+    parser.add_argument('--max-connections', type=int, default=256, help='固定速率模式下的最大连接数')
+    parser.add_argument('--duration', type=float, default=10.0, help='压测时长（秒）')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='端点权重，如 recommend_get=4,recommend_post=4,status=1')
+    parser.add_argument('--top-k', type=int, default=3)
+    parser.add_argument('--refresh-at', type=float, action='append', default=[],
+                        help='压测开始后第几秒触发 /refresh（可重复指定）')
+    parser.add_argument('--refresh-incremental', type=lambda value: value.lower() == 'true', default=None,
+                        help='刷新时的 incremental 参数（true/false，默认使用服务端配置）')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--launch', action='store_true', help='自动启动基于模拟OSS的服务（benchmarks/serve_fake.py）')
+    parser.add_argument('--categories', type=int, default=500, help='--launch 时的分类数量')
+    parser.add_argument('--objects', type=int, default=100, help='--launch 时每个分类的对象数量')
+    parser.add_argument('--oss-latency', type=float, default=0.002, help='--launch 时模拟OSS的请求延迟（秒）')
+    parser.add_argument('--output', help='结果JSON输出路径（默认输出到标准输出）')
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    server = None
+    if args.launch:
+        server = subprocess.Popen([
+            sys.executable, __file__.replace('load_test.py', 'serve_fake.py'),
+            '--host', url.hostname, '--port', str(url.port or 80),
+            '--categories', str(args.categories), '--objects', str(args.objects),
+            '--latency', str(args.oss_latency)
+        ], stdout=sys.stderr)
+
+    try:
+        if not wait_for_health(url.hostname, url.port or 80, timeout=120 if server else 5):
+            print(f"❌ 服务不可用: {args.url}", file=sys.stderr)
+            sys.exit(1)
+
+        report = asyncio.run(LoadTest(args).run())
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+基于本地模拟OSS启动 oss_api_server
+生成合成Bucket并预先构建元数据文件，/refresh 也会遍历同一个模拟Bucket，供负载测试使用
+
+用法:
+    python benchmarks/serve_fake.py --port 8765 --categories 500 --objects 100 --latency 0.002
+"""
+
+import os
+import logging
+import argparse
+import tempfile
+from functools import partial
+
+from common import synthetic_category_names
+from fake_oss import FakeObjectIterator, generate_bucket
+
+import uvicorn
+
+from config import OSSConfig
+from oss_metadata_builder import OSSMetadataBuilder
+from oss_emoji_recommender import OSSEmojiRecommender
+import oss_api_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基于本地模拟OSS启动API服务")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--categories', type=int, default=500, help='分类数量')
+    parser.add_argument('--objects', type=int, default=100, help='每个分类的对象数量')
+    parser.add_argument('--latency', type=float, default=0.002, help='每次列举请求的模拟延迟（秒）')
+    parser.add_argument('--page-size', type=int, default=1000, help='模拟OSS的单页最大条数')
+    parser.add_argument('--workdir', help='元数据文件目录（默认使用临时目录）')
+    parser.add_argument('--log-level', default='warning')
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='emoji-serve-')
+    os.makedirs(workdir, exist_ok=True)
+    OSSConfig.METADATA_CACHE_FILE = os.path.join(workdir, 'oss_emoji_metadata.json')
+    OSSConfig.BINARY_CACHE_FILE = os.path.join(workdir, 'oss_emoji_metadata.bin')
+    OSSConfig.MANIFEST_CACHE_FILE = os.path.join(workdir, 'oss_emoji_manifest.json')
+
+    # 模拟环境不需要真实凭据
+    OSSConfig.USE_ECS_RAM_ROLE = True
+    OSSConfig.BUCKET_NAME = OSSConfig.BUCKET_NAME or 'fake-bucket'
+    OSSConfig.ENDPOINT = OSSConfig.ENDPOINT or 'oss-cn-local.aliyuncs.com'
+
+    logging.getLogger().setLevel(getattr(logging, args.log_level.upper()))
+
+    bucket = generate_bucket(synthetic_category_names(args.categories), args.objects,
+                             root_path=OSSConfig.EMOJI_ROOT_PATH, latency=args.latency,
+                             page_size=args.page_size)
+
+    def make_builder():
+        return OSSMetadataBuilder(bucket=bucket, object_iterator=FakeObjectIterator)
+
+    # 预先生成合成元数据文件，服务启动时直接加载
+    make_builder().build_and_save_metadata(force_rebuild=True)
+    print(f"📦 模拟Bucket: {len(bucket)} 个对象，元数据目录: {workdir}", flush=True)
+
+    oss_api_server.recommender_factory = partial(OSSEmojiRecommender, builder_factory=make_builder)
+    uvicorn.run(oss_api_server.app, host=args.host, port=args.port, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,7 @@
 """
 
 import os
+import hmac
 
 # ============== 算法权重配置 ==============
 class AlgorithmConfig:
@@ -16,6 +17,10 @@ class AlgorithmConfig:
     KEYWORD_WEIGHT = 0.7        # 关键词匹配权重 70%
     SEMANTIC_WEIGHT = 0.3       # 语义匹配权重 30%
     
+    # 打分引擎: 'automaton' (Aho-Corasick自动机) 或 'numpy' (NumPy向量化矩阵运算)
+    SCORING_ENGINE = os.getenv('SCORING_ENGINE', 'automaton')
+    SUPPORTED_SCORING_ENGINES = ['automaton', 'numpy']
+    
     # 验证权重总和
     @classmethod
     def validate_weights(cls):
@@ -24,6 +29,13 @@ class AlgorithmConfig:
         if abs(total_weight - 1.0) > 0.001:  # 允许小误差
             raise ValueError(f"权重总和必须为1.0，当前为{total_weight}")
         return True
+    
+    @classmethod
+    def validate_scoring_engine(cls, engine):
+        """验证打分引擎名称是否合法"""
+        if engine not in cls.SUPPORTED_SCORING_ENGINES:
+            raise ValueError(f"不支持的打分引擎: {engine}，可选: {', '.join(cls.SUPPORTED_SCORING_ENGINES)}")
+        return True
 
 # ============== 推荐参数配置 ==============
 class RecommendConfig:
@@ -37,6 +49,9 @@ class RecommendConfig:
     # 搜索相关参数
     SEARCH_MULTIPLIER = 3       # 搜索倍数，用于扩大候选集
     
+    # 批量推荐参数
+    MAX_BATCH_SIZE = 500        # 单次批量推荐的最大文本数量
+    
     @classmethod
     def validate_top_k(cls, top_k):
         """验证top_k参数是否合法"""
@@ -47,6 +62,15 @@ class RecommendConfig:
         if top_k > cls.MAX_TOP_K:
             raise ValueError(f"top_k不能大于{cls.MAX_TOP_K}")
         return True
+    
+    @classmethod
+    def validate_batch_size(cls, batch_size):
+        """验证批量推荐的文本数量是否合法"""
+        if batch_size < 1:
+            raise ValueError("批量推荐至少需要1条文本")
+        if batch_size > cls.MAX_BATCH_SIZE:
+            raise ValueError(f"批量推荐文本数量不能大于{cls.MAX_BATCH_SIZE}")
+        return True
 
 # ============== 模型配置 ==============
 class ModelConfig:
@@ -64,7 +88,13 @@ class ModelConfig:
     
     # TF-IDF配置
     TFIDF_MAX_FEATURES = 1000   # TF-IDF最大特征数
-    USE_TFIDF_DEFAULT = True    # 默认是否使用TF-IDF
+    TFIDF_NGRAM_RANGE = (2, 3)  # 字符n-gram范围（不含单字，避免"么"、"的"等单字造成的噪声匹配）
+    
+    # 是否使用TF-IDF语义打分（唯一开关）：TF-IDF融合会改变推荐分数，并绕过关键词打分的堆/提前退出和NumPy top_k路径，
+    # 每个请求增加毫秒级耗时（见README），默认关闭
+    USE_TFIDF_DEFAULT = os.getenv('USE_TFIDF_DEFAULT', 'false').lower() == 'true'
+    SEMANTIC_MIN_SIMILARITY = 0.1       # 低于该相似度的分类不计语义分数
+    SEMANTIC_MAX_INPUT_CHARS = 256      # 参与语义打分的最大输入长度，限制单次请求耗时
 
 # ============== 文件路径配置 ==============
 class PathConfig:
@@ -131,9 +161,33 @@ class OSSConfig:
     EMOJI_ROOT_PATH = 'sably/'     # 表情包在OSS中的根路径
     SUPPORTED_EXTENSIONS = ['.gif', '.jpg', '.jpeg', '.png', '.webp']  # 支持的文件格式
     
+    # 并行遍历配置：先按第一级分类目录分片，再在线程池中并发遍历各分类
+    PARALLEL_LISTING = os.getenv('OSS_PARALLEL_LISTING', 'true').lower() == 'true'
+    LIST_WORKERS = int(os.getenv('OSS_LIST_WORKERS', '8'))             # 并行遍历线程数
+    LIST_PAGE_SIZE = 1000           # 每次分页请求的最大对象数（OSS上限1000）
+    
     # 缓存配置
     METADATA_CACHE_FILE = 'oss_emoji_metadata.json'  # 元数据缓存文件
     CACHE_EXPIRE_HOURS = 24         # 缓存过期时间（小时）
+
+    # 过期缓存先用后验（stale-while-revalidate）：启动时缓存已过期但未超过最大陈旧时间则立即使用，
+    # 同时在后台重新构建并替换；超过最大陈旧时间的缓存视为无效，同步重新构建
+    STALE_WHILE_REVALIDATE = os.getenv('OSS_STALE_WHILE_REVALIDATE', 'true').lower() == 'true'
+    CACHE_MAX_STALE_HOURS = float(os.getenv('OSS_CACHE_MAX_STALE_HOURS', '168'))  # 最大陈旧时间（小时）
+
+    # 跨进程重建锁：同一主机上只有一个进程遍历OSS重建元数据，其他进程等待并复用其结果。
+    # 持有者定期续租（更新锁文件修改时间），超过租约时间未续租的锁视为持有者已退出，可被接管
+    REBUILD_LOCK_ENABLED = os.getenv('OSS_REBUILD_LOCK_ENABLED', 'true').lower() == 'true'
+    REBUILD_LOCK_LEASE_SECONDS = float(os.getenv('OSS_REBUILD_LOCK_LEASE_SECONDS', '30'))     # 租约时间（秒）
+    REBUILD_LOCK_WAIT_SECONDS = float(os.getenv('OSS_REBUILD_LOCK_WAIT_SECONDS', '1800'))    # 最长等待时间（秒）
+    
+    # 二进制缓存：与JSON同时写出，加载时优先内存映射二进制文件，JSON作为回退和导出格式
+    BINARY_CACHE_FILE = 'oss_emoji_metadata.bin'
+    USE_BINARY_CACHE = os.getenv('OSS_USE_BINARY_CACHE', 'true').lower() == 'true'
+    
+    # 增量刷新配置
+    MANIFEST_CACHE_FILE = 'oss_emoji_manifest.json'  # 逐对象清单（size / last_modified / etag）
+    INCREMENTAL_REFRESH = os.getenv('OSS_INCREMENTAL_REFRESH', 'true').lower() == 'true'  # 刷新时默认使用增量重建
     
     @classmethod
     def get_public_url(cls, object_key: str) -> str:
@@ -209,6 +263,9 @@ class AuthConfig:
         '/redoc'                # ReDoc文档
     ]
     
+    # 已验证的Authorization头缓存条数（0 表示不缓存，每次都解码校验）
+    VERIFIED_CACHE_SIZE = int(os.getenv('API_AUTH_CACHE_SIZE', '256'))
+    
     @classmethod
     def validate_credentials(cls, username: str, password: str) -> bool:
         """
@@ -221,7 +278,10 @@ class AuthConfig:
         Returns:
             验证是否通过
         """
-        return username == cls.USERNAME and password == cls.PASSWORD
+        # 常量时间比较，避免通过响应耗时逐字符猜测凭据；两项都比较，不短路
+        username_ok = hmac.compare_digest(username.encode('utf-8'), cls.USERNAME.encode('utf-8'))
+        password_ok = hmac.compare_digest(password.encode('utf-8'), cls.PASSWORD.encode('utf-8'))
+        return username_ok and password_ok
     
     @classmethod
     def is_public_path(cls, path: str) -> bool:
@@ -236,6 +296,70 @@ class AuthConfig:
         """
         return path in cls.PUBLIC_PATHS
 
+# ============== API服务执行配置 ==============
+class ServerConfig:
+    """API服务执行相关配置"""
+    
+    # 推荐计算的执行方式: 'inline' (事件循环内直接执行), 'thread' (线程池), 'process' (进程池)
+    EXECUTOR_MODE = os.getenv('RECOMMEND_EXECUTOR_MODE', 'thread')
+    SUPPORTED_EXECUTOR_MODES = ['inline', 'thread', 'process']
+    
+    # 线程池/进程池的工作者数量
+    EXECUTOR_WORKERS = int(os.getenv('RECOMMEND_EXECUTOR_WORKERS', '4'))
+    
+    # 最大在途请求数（执行中 + 排队中），超过后直接返回503
+    EXECUTOR_MAX_PENDING = int(os.getenv('RECOMMEND_EXECUTOR_MAX_PENDING', '64'))
+    
+    # 繁忙时建议客户端重试的等待秒数（Retry-After响应头）
+    RETRY_AFTER_SECONDS = 1
+    
+    # 多工作进程共享元数据快照的目录（为空表示不共享，每个进程各自加载）
+    SHARED_SNAPSHOT_DIR = os.getenv('EMOJI_SHARED_SNAPSHOT_DIR', '')
+    SHARED_SNAPSHOT_CHECK_SECONDS = float(os.getenv('EMOJI_SHARED_SNAPSHOT_CHECK_SECONDS', '2'))  # 检查新代的间隔
+    SHARED_SNAPSHOT_KEEP = int(os.getenv('EMOJI_SHARED_SNAPSHOT_KEEP', '3'))                      # 保留的代数
+    
+    @classmethod
+    def validate_executor_mode(cls, mode):
+        """验证执行方式是否合法"""
+        if mode not in cls.SUPPORTED_EXECUTOR_MODES:
+            raise ValueError(f"不支持的执行方式: {mode}，可选: {', '.join(cls.SUPPORTED_EXECUTOR_MODES)}")
+        return True
+
+# ============== 请求追踪配置 ==============
+class TraceConfig:
+    """单请求阶段追踪（Server-Timing响应头）相关配置"""
+
+    # 请求头携带该字段（任意非空值）时追踪本次请求
+    TRACE_HEADER = 'x-emoji-trace'
+
+    # 未携带请求头时的随机采样比例（0 表示只追踪显式请求）
+    SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0'))
+
+    # 被追踪的慢请求是否写入滚动慢请求日志
+    SLOW_LOG_ENABLED = os.getenv('TRACE_SLOW_LOG_ENABLED', 'true').lower() == 'true'
+    SLOW_THRESHOLD_MS = float(os.getenv('TRACE_SLOW_THRESHOLD_MS', '200'))  # 慢请求阈值（毫秒）
+    SLOW_LOG_SIZE = int(os.getenv('TRACE_SLOW_LOG_SIZE', '100'))            # 保留的慢请求条数
+
+# ============== 采样分析配置 ==============
+class ProfilerConfig:
+    """按需调用栈采样（/admin/profile）相关配置"""
+
+    # 是否允许通过接口触发采样（默认关闭：采样会占用解释器并暴露代码路径，而接口只受共用的API账号保护）
+    ENABLED = os.getenv('PROFILER_ENABLED', 'false').lower() == 'true'
+
+    # 单次采样的最长时间（秒）和默认采样间隔（毫秒）
+    MAX_SECONDS = float(os.getenv('PROFILER_MAX_SECONDS', '60'))
+    DEFAULT_INTERVAL_MS = float(os.getenv('PROFILER_INTERVAL_MS', '5'))
+
+    @classmethod
+    def validate_duration(cls, seconds):
+        """验证采样时长是否合法"""
+        if seconds <= 0:
+            raise ValueError("采样时长必须大于0")
+        if seconds > cls.MAX_SECONDS:
+            raise ValueError(f"采样时长不能大于{cls.MAX_SECONDS}秒")
+        return True
+
 # ============== 日志配置 ==============
 class LogConfig:
     """日志相关配置"""
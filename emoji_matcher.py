@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多模式字符串匹配器
+基于Aho-Corasick自动机，一次扫描即可找出文本中出现的全部模式串
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class AhoCorasickAutomaton:
+    """Aho-Corasick多模式匹配自动机"""
+
+    def __init__(self, patterns: Iterable[str]):
+        """
+        编译自动机
+
+        Args:
+            patterns: 模式串列表，模式ID即其在列表中的下标（允许重复）
+        """
+        self.patterns: List[str] = list(patterns)
+
+        # 空模式串在任何文本中都"出现"（与 '' in text 的语义一致）
+        self.empty_pattern_ids: Tuple[int, ...] = tuple(
+            i for i, pattern in enumerate(self.patterns) if not pattern
+        )
+
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+
+        self._build_trie()
+        self._build_fail_links()
+
+    def _build_trie(self):
+        """构建模式串前缀树"""
+        for pattern_id, pattern in enumerate(self.patterns):
+            if not pattern:
+                continue
+
+            state = 0
+            for ch in pattern:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][ch] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = next_state
+
+            self._output[state] += (pattern_id,)
+
+    def _build_fail_links(self):
+        """按广度优先顺序构建失败指针，并合并后缀节点的输出"""
+        queue = deque(self._goto[0].values())
+
+        while queue:
+            state = queue.popleft()
+
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+
+                fail_state = self._fail[state]
+                while fail_state and ch not in self._goto[fail_state]:
+                    fail_state = self._fail[fail_state]
+
+                target = self._goto[fail_state].get(ch, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] += self._output[self._fail[next_state]]
+
+    def search(self, text: str) -> Set[int]:
+        """
+        扫描文本一次，返回出现过的模式ID集合
+
+        Args:
+            text: 待匹配文本
+
+        Returns:
+            命中的模式ID集合
+        """
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+
+        found = set(self.empty_pattern_ids)
+        state = 0
+
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                found.update(output[state])
+
+        return found
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+TF-IDF字符n-gram语义打分器
+基于分类名及其情绪关键词构建字符n-gram TF-IDF矩阵，完全离线运行
+"""
+
+import logging
+from typing import Dict, List, Optional, Sequence
+
+try:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+except ImportError:
+    TfidfVectorizer = None
+
+from config import ModelConfig, MatchingConfig
+
+logger = logging.getLogger(__name__)
+
+
+def char_ngrams(text: str) -> List[str]:
+    """
+    按空白切分后提取每个词内部的字符n-gram（不跨词、不含空白）
+
+    Args:
+        text: 已转为小写的文本
+
+    Returns:
+        n-gram列表
+    """
+    min_n, max_n = ModelConfig.TFIDF_NGRAM_RANGE
+    ngrams = []
+    for token in text.split():
+        for n in range(min_n, min(max_n, len(token)) + 1):
+            ngrams.extend(token[i:i + n] for i in range(len(token) - n + 1))
+    return ngrams
+
+
+def is_available() -> bool:
+    """scikit-learn是否可用"""
+    return TfidfVectorizer is not None
+
+
+class SemanticScorer:
+    """
+    字符n-gram TF-IDF语义打分器
+
+    每个分类对应一篇文档：分类名 + 分类名中包含的情绪的全部关键词。
+    文档向量经过L2归一化，查询向量与分类矩阵做一次稀疏矩阵乘法即得余弦相似度。
+    """
+
+    def __init__(self, categories: Sequence[str], emotion_keywords: Dict[str, List[str]]):
+        """
+        构建TF-IDF矩阵
+
+        Args:
+            categories: 分类名列表（顺序即分类下标）
+            emotion_keywords: 情绪关键词字典
+        """
+        if TfidfVectorizer is None:
+            raise ImportError("语义打分需要scikit-learn: pip install scikit-learn")
+
+        documents = []
+        for category in categories:
+            category_lower = category.lower()
+            keywords = [
+                keyword
+                for emotion, emotion_words in emotion_keywords.items()
+                if emotion in category_lower
+                for keyword in emotion_words
+            ]
+            documents.append(' '.join([category_lower] + keywords))
+
+        self.vectorizer = TfidfVectorizer(
+            analyzer=char_ngrams,
+            max_features=ModelConfig.TFIDF_MAX_FEATURES,
+            sublinear_tf=True
+        )
+        self.category_matrix = self.vectorizer.fit_transform(documents).tocsr()
+        self.category_matrix_t = self.category_matrix.T.tocsr()
+
+        logger.info(f"🧠 语义TF-IDF矩阵: {self.category_matrix.shape[0]} 个分类 × "
+                    f"{self.category_matrix.shape[1]} 个特征")
+
+    def score_batch(self, texts: Sequence[str]) -> List[Dict[int, float]]:
+        """
+        计算一批文本与所有分类的语义相似度
+
+        Args:
+            texts: 用户输入文本列表
+
+        Returns:
+            与输入顺序一致的 {分类下标: 语义分数} 列表，仅包含不低于阈值的分类
+        """
+        if not texts:
+            return []
+
+        # 截断过长的输入，保证单次请求的耗时上限
+        queries = [text[:ModelConfig.SEMANTIC_MAX_INPUT_CHARS].lower() for text in texts]
+        query_matrix = self.vectorizer.transform(queries)
+
+        # (B×F) @ (F×C)，结果仍为稀疏矩阵，只包含与查询有公共n-gram的分类
+        similarity = (query_matrix @ self.category_matrix_t).tocsr()
+
+        results = []
+        for row in range(similarity.shape[0]):
+            start, end = similarity.indptr[row], similarity.indptr[row + 1]
+            scores = {}
+            for category_id, value in zip(similarity.indices[start:end], similarity.data[start:end]):
+                if value >= ModelConfig.SEMANTIC_MIN_SIMILARITY:
+                    scores[int(category_id)] = min(max(float(value), MatchingConfig.MIN_SEMANTIC_SCORE),
+                                                   MatchingConfig.MAX_SEMANTIC_SCORE)
+            results.append(scores)
+
+        return results
+
+    def score(self, user_text: str) -> Dict[int, float]:
+        """计算单条文本的语义分数"""
+        return self.score_batch([user_text])[0]
+
+
+def build_semantic_scorer(categories: Sequence[str],
+                          emotion_keywords: Dict[str, List[str]]) -> Optional[SemanticScorer]:
+    """
+    按配置构建语义打分器，不可用或没有可用特征时返回None
+
+    Args:
+        categories: 分类名列表
+        emotion_keywords: 情绪关键词字典
+
+    Returns:
+        SemanticScorer 或 None
+    """
+    if not ModelConfig.USE_TFIDF_DEFAULT or not categories:
+        return None
+
+    if not is_available():
+        logger.warning("⚠️  未安装scikit-learn，语义打分已禁用")
+        return None
+
+    try:
+        return SemanticScorer(categories, emotion_keywords)
+    except ValueError as e:
+        logger.warning(f"⚠️  语义TF-IDF矩阵构建失败，语义打分已禁用: {e}")
+        return None
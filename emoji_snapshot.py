@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+推荐器元数据快照
+将加载的表情包元数据编译为不可变的打分结构，供推荐请求只读共享
+"""
+
+import heapq
+import random
+import logging
+from collections.abc import MutableSequence, Sequence as SequenceABC
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from config import AlgorithmConfig, EmotionConfig, MatchingConfig
+from emoji_matcher import AhoCorasickAutomaton
+from emoji_url_store import PrefixedUrls
+import emoji_vectorized
+import emoji_semantic
+
+logger = logging.getLogger(__name__)
+
+
+def _freeze_urls(urls: Sequence[str]) -> Sequence[str]:
+    """
+    将URL列表转为不可变的紧凑序列
+
+    普通列表/元组压缩为共享分类前缀的 PrefixedUrls；
+    PrefixedUrls、二进制缓存的只读视图等不可变序列直接沿用，不提前解码。
+    """
+    if isinstance(urls, SequenceABC) and not isinstance(urls, (MutableSequence, tuple)):
+        return urls
+    return PrefixedUrls(urls)
+
+
+class RecommenderSnapshot:
+    """
+    不可变的推荐器快照
+
+    自动机的模式ID布局：前 len(categories) 个为小写分类名（模式ID即分类下标），
+    其后依次为各情绪的关键词。
+    """
+
+    __slots__ = (
+        'metadata', 'categories', 'category_lowers', 'nonempty_categories', 'nonempty_mask',
+        'emotion_keywords', 'emotion_categories', 'emotion_keyword_ids', 'emotion_norms',
+        'automaton', 'scoring_engine', 'vector_scorer', 'semantic_scorer', 'total_urls', 'loaded_at'
+    )
+
+    def __init__(self, emoji_metadata: Mapping[str, Sequence[str]],
+                 emotion_keywords: Optional[Dict[str, List[str]]] = None,
+                 scoring_engine: Optional[str] = None):
+        """
+        编译快照
+
+        Args:
+            emoji_metadata: {category: [url1, url2, ...]} 格式的元数据
+            emotion_keywords: 情绪关键词字典，默认使用配置中的关键词
+            scoring_engine: 打分引擎 ('automaton' 或 'numpy')，默认使用配置
+        """
+        if emotion_keywords is None:
+            emotion_keywords = EmotionConfig.EMOTION_KEYWORDS
+        if scoring_engine is None:
+            scoring_engine = AlgorithmConfig.SCORING_ENGINE
+        AlgorithmConfig.validate_scoring_engine(scoring_engine)
+
+        metadata = {category: _freeze_urls(urls) for category, urls in emoji_metadata.items()}
+        categories = tuple(metadata.keys())
+        category_lowers = tuple(category.lower() for category in categories)
+
+        # 情绪 -> 分类名中包含该情绪的分类下标（倒排索引）
+        emotion_categories = {}
+        for emotion in emotion_keywords:
+            category_ids = tuple(
+                i for i, category_lower in enumerate(category_lowers)
+                if emotion in category_lower
+            )
+            if category_ids:
+                emotion_categories[emotion] = category_ids
+
+        patterns = list(category_lowers)
+        emotion_keyword_ids = {}
+        emotion_norms = {}
+        for emotion, keywords in emotion_keywords.items():
+            keyword_ids = []
+            for keyword in keywords:
+                keyword_ids.append(len(patterns))
+                patterns.append(keyword)
+            if keywords:
+                emotion_keyword_ids[emotion] = tuple(keyword_ids)
+                emotion_norms[emotion] = float(len(keywords))
+
+        set_attr = object.__setattr__
+        set_attr(self, 'metadata', MappingProxyType(metadata))
+        set_attr(self, 'categories', categories)
+        set_attr(self, 'category_lowers', category_lowers)
+        set_attr(self, 'nonempty_categories', tuple(c for c in categories if metadata[c]))
+        set_attr(self, 'nonempty_mask', tuple(bool(metadata[c]) for c in categories))
+        set_attr(self, 'emotion_keywords', emotion_keywords)
+        set_attr(self, 'emotion_categories', MappingProxyType(emotion_categories))
+        set_attr(self, 'emotion_keyword_ids', MappingProxyType(emotion_keyword_ids))
+        set_attr(self, 'emotion_norms', MappingProxyType(emotion_norms))
+        set_attr(self, 'automaton', AhoCorasickAutomaton(patterns))
+
+        # 可选的NumPy向量化引擎，不可用时回退到自动机引擎
+        vector_scorer = None
+        if scoring_engine == 'numpy':
+            if emoji_vectorized.is_available():
+                vector_scorer = emoji_vectorized.VectorizedScorer(self)
+            else:
+                logger.warning("⚠️  未安装numpy，回退到自动机打分引擎")
+                scoring_engine = 'automaton'
+        set_attr(self, 'scoring_engine', scoring_engine)
+        set_attr(self, 'vector_scorer', vector_scorer)
+
+        # 可选的TF-IDF语义打分器，未启用或不可用时为None
+        set_attr(self, 'semantic_scorer', emoji_semantic.build_semantic_scorer(categories, emotion_keywords))
+
+        set_attr(self, 'total_urls', sum(len(urls) for urls in metadata.values()))
+        set_attr(self, 'loaded_at', datetime.now().isoformat())
+
+    def with_updated_categories(self, emoji_metadata: Mapping[str, Sequence[str]],
+                                affected_categories: Iterable[str]) -> 'RecommenderSnapshot':
+        """
+        基于当前快照生成只更新部分分类的新快照
+
+        分类集合和非空状态都不变时（最常见的"往已有分类上传了几张图"），
+        直接复用自动机、倒排索引和各打分引擎，只替换受影响分类的URL列表；
+        否则重新编译整个快照。
+
+        Args:
+            emoji_metadata: 新的完整元数据
+            affected_categories: 有变化的分类
+
+        Returns:
+            新的推荐器快照
+        """
+        categories = tuple(emoji_metadata.keys())
+        if categories != self.categories:
+            return RecommenderSnapshot(emoji_metadata, scoring_engine=self.scoring_engine,
+                                       emotion_keywords=self.emotion_keywords)
+
+        metadata = dict(self.metadata)
+        for category in affected_categories:
+            if category in metadata:
+                metadata[category] = _freeze_urls(emoji_metadata[category])
+
+        nonempty_mask = tuple(bool(metadata[c]) for c in categories)
+        if nonempty_mask != self.nonempty_mask:
+            return RecommenderSnapshot(metadata, scoring_engine=self.scoring_engine,
+                                       emotion_keywords=self.emotion_keywords)
+
+        snapshot = object.__new__(RecommenderSnapshot)
+        set_attr = object.__setattr__
+        for name in RecommenderSnapshot.__slots__:
+            set_attr(snapshot, name, getattr(self, name))
+        set_attr(snapshot, 'metadata', MappingProxyType(metadata))
+        set_attr(snapshot, 'total_urls', sum(len(urls) for urls in metadata.values()))
+        set_attr(snapshot, 'loaded_at', datetime.now().isoformat())
+        return snapshot
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RecommenderSnapshot是不可变对象")
+
+    def __len__(self) -> int:
+        return len(self.categories)
+
+    def emotion_scores(self, hits: Set[int]) -> Dict[str, float]:
+        """
+        计算命中的情绪分数
+
+        Args:
+            hits: 自动机命中的模式ID集合
+
+        Returns:
+            {emotion: score}，仅包含分数大于0的情绪
+        """
+        scores = {}
+
+        for emotion, keyword_ids in self.emotion_keyword_ids.items():
+            emotion_score = 0.0
+            for keyword_id in keyword_ids:
+                if keyword_id in hits:
+                    emotion_score += 1.0
+
+            if emotion_score:
+                emotion_score = min(emotion_score / self.emotion_norms[emotion], 1.0)
+                scores[emotion] = emotion_score * MatchingConfig.EMOTION_MATCH_BONUS
+
+        return scores
+
+    def score(self, user_text: str) -> Dict[int, float]:
+        """
+        计算用户文本的分类分数，只访问被命中的分类
+
+        Args:
+            user_text: 用户输入文本
+
+        Returns:
+            {分类下标: 分数}，仅包含分数大于0的分类
+        """
+        return self._score_hits(self.automaton.search(user_text.lower()))
+
+    def _score_hits(self, hits: Set[int]) -> Dict[int, float]:
+        """根据自动机命中结果计算稀疏分类分数"""
+        category_count = len(self.categories)
+
+        scores = {}
+
+        # 1. 直接匹配分类名
+        for pattern_id in hits:
+            if pattern_id < category_count:
+                scores[pattern_id] = MatchingConfig.DIRECT_MATCH_BONUS
+
+        # 2. 情绪关键词匹配，沿倒排索引只更新相关分类
+        for emotion, emotion_score in self.emotion_scores(hits).items():
+            for category_id in self.emotion_categories.get(emotion, ()):
+                if scores.get(category_id, 0.0) < emotion_score:
+                    scores[category_id] = emotion_score
+
+        return scores
+
+    def top_k(self, user_text: str, k: int) -> List[Tuple[int, float]]:
+        """
+        选出分数最高的k个非空分类，排序规则与 rank 一致
+
+        使用大小为k的堆代替全量排序；当直接匹配（最高分）的非空分类
+        已达到k个时提前结束，无需再计算情绪分数。
+
+        Args:
+            user_text: 用户输入文本
+            k: 返回数量
+
+        Returns:
+            [(分类下标, 分数), ...]，仅包含分数大于0的非空分类
+        """
+        if self.vector_scorer is not None:
+            return self.vector_scorer.top_k(user_text, k)
+        return self.automaton_top_k(user_text, k)
+
+    def automaton_top_k(self, user_text: str, k: int) -> List[Tuple[int, float]]:
+        """使用自动机引擎选出前k个分类（不受 scoring_engine 影响）"""
+        hits = self.automaton.search(user_text.lower())
+        category_count = len(self.categories)
+        nonempty_mask = self.nonempty_mask
+
+        # 只有直接匹配严格高于任何情绪分数时才能提前结束：两者相等时，
+        # 下标更小的情绪匹配分类与直接匹配分类同分，并且在同分排序中排在前面
+        if MatchingConfig.DIRECT_MATCH_BONUS > MatchingConfig.EMOTION_MATCH_BONUS:
+            direct_ids = [pattern_id for pattern_id in hits
+                          if pattern_id < category_count and nonempty_mask[pattern_id]]
+            if len(direct_ids) >= k:
+                return [(category_id, MatchingConfig.DIRECT_MATCH_BONUS)
+                        for category_id in heapq.nsmallest(k, direct_ids)]
+
+        candidates = ((category_id, score)
+                      for category_id, score in self._score_hits(hits).items()
+                      if nonempty_mask[category_id])
+        return heapq.nlargest(k, candidates, key=lambda item: (item[1], -item[0]))
+
+    def top_k_batch(self, texts: Sequence[str], k: int) -> List[List[Tuple[int, float]]]:
+        """
+        批量选出每条文本的前k个分类，向量化引擎下整批只做一次矩阵运算
+
+        Args:
+            texts: 用户输入文本列表
+            k: 每条文本的返回数量
+
+        Returns:
+            与输入顺序一致的 [(分类下标, 分数), ...] 列表
+        """
+        if self.vector_scorer is not None:
+            return self.vector_scorer.top_k_batch(texts, k)
+        return [self.automaton_top_k(text, k) for text in texts]
+
+    def keyword_scores_batch(self, texts: Sequence[str]) -> List[Dict[int, float]]:
+        """按当前打分引擎批量计算稀疏关键词分数"""
+        if self.vector_scorer is not None:
+            return self.vector_scorer.score_batch(texts)
+        return [self.score(text) for text in texts]
+
+    def rank_candidates_batch(self, texts: Sequence[str], k: int) -> List[List[Tuple[int, float, float, float]]]:
+        """
+        批量选出每条文本的前k个推荐分类，启用语义打分时融合关键词分数和语义分数
+
+        融合分数 = KEYWORD_WEIGHT × 关键词分数 + SEMANTIC_WEIGHT × 语义分数；
+        未启用语义打分时融合分数即关键词分数，并沿用堆选择和提前终止。
+
+        Args:
+            texts: 用户输入文本列表
+            k: 每条文本的返回数量
+
+        Returns:
+            与输入顺序一致的 [(分类下标, 融合分数, 关键词分数, 语义分数), ...] 列表
+        """
+        if self.semantic_scorer is None:
+            return [
+                [(category_id, score, score, 0.0) for category_id, score in ranked]
+                for ranked in self.top_k_batch(texts, k)
+            ]
+
+        keyword_weight = AlgorithmConfig.KEYWORD_WEIGHT
+        semantic_weight = AlgorithmConfig.SEMANTIC_WEIGHT
+        nonempty_mask = self.nonempty_mask
+
+        results = []
+        for keyword_scores, semantic_scores in zip(self.keyword_scores_batch(texts),
+                                                   self.semantic_scorer.score_batch(texts)):
+            candidates = []
+            for category_id in keyword_scores.keys() | semantic_scores.keys():
+                if not nonempty_mask[category_id]:
+                    continue
+                keyword_score = keyword_scores.get(category_id, 0.0)
+                semantic_score = semantic_scores.get(category_id, 0.0)
+                score = keyword_weight * keyword_score + semantic_weight * semantic_score
+                if score > 0:
+                    candidates.append((category_id, score, keyword_score, semantic_score))
+
+            results.append(heapq.nlargest(k, candidates, key=lambda item: (item[1], -item[0])))
+
+        return results
+
+    def rank(self, scores: Dict[int, float]) -> List[Tuple[int, float]]:
+        """
+        将稀疏分数按分数降序排列，同分时保持元数据中的分类顺序
+
+        Args:
+            scores: {分类下标: 分数}
+
+        Returns:
+            [(分类下标, 分数), ...]
+        """
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def sample_categories(self, count: int, exclude: Iterable[str] = ()) -> List[str]:
+        """
+        从非空分类中随机抽取若干个分类
+
+        Args:
+            count: 抽取数量
+            exclude: 需要排除的分类
+
+        Returns:
+            随机分类列表
+        """
+        exclude = set(exclude)
+        candidates = self.nonempty_categories
+        sample_size = min(len(candidates), count + len(exclude))
+
+        sampled = random.sample(candidates, sample_size)
+        return [category for category in sampled if category not in exclude][:count]
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+前缀共享的URL存储
+同一分类的URL共享 协议 + Bucket + Endpoint + 根路径 + 分类目录 前缀，只按字节存储文件名后缀
+"""
+
+import os
+from array import array
+from collections.abc import Sequence
+from typing import Iterable
+
+
+class PrefixedUrls(Sequence):
+    """
+    单个分类的紧凑URL序列
+
+    所有后缀以UTF-8拼接在一个bytes中，另用 uint32 偏移数组定位；
+    完整URL只在被访问（例如被随机选中）时拼接生成。
+    """
+
+    __slots__ = ('prefix', '_blob', '_offsets')
+
+    def __init__(self, urls: Iterable[str]):
+        """
+        压缩URL列表
+
+        Args:
+            urls: 同一分类下的完整URL
+        """
+        urls = list(urls)
+        prefix = os.path.commonprefix([min(urls), max(urls)]) if urls else ''
+
+        # 前缀截断到最后一个'/'，只共享目录部分，避免把文件名的公共开头也并入前缀
+        slash = prefix.rfind('/')
+        prefix = prefix[:slash + 1]
+
+        offsets = array('I', [0])
+        blob = bytearray()
+        for url in urls:
+            blob += url[len(prefix):].encode('utf-8')
+            offsets.append(len(blob))
+
+        self.prefix = prefix
+        self._blob = bytes(blob)
+        self._offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("URL下标越界")
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return self.prefix + str(self._blob[start:end], 'utf-8')
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Sequence) and not isinstance(other, str):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self) -> str:
+        return f"PrefixedUrls({self.prefix!r}, {len(self)} urls)"
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+NumPy向量化打分引擎
+将情绪关键词和分类名编译为矩阵，一次矩阵乘法完成一条或一批文本的分类打分
+"""
+
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from config import MatchingConfig
+
+logger = logging.getLogger(__name__)
+
+
+def is_available() -> bool:
+    """NumPy是否可用"""
+    return np is not None
+
+
+class VectorizedScorer:
+    """
+    基于NumPy的分类打分器
+
+    打分分为两步：
+    1. 关键词命中矩阵 (B×K) 乘以情绪×关键词计数矩阵的转置 (K×E)，得到每种情绪的命中数，
+       再按 1/len(keywords) 归一化并乘以 EMOTION_MATCH_BONUS；
+    2. 分类分数取分类名中包含的情绪分数的最大值，直接匹配分类名的分类置为 DIRECT_MATCH_BONUS。
+
+    命中数以整数计数后再做除法，保证与逐条计算的浮点结果完全一致。
+    """
+
+    def __init__(self, snapshot):
+        """
+        根据推荐器快照编译矩阵
+
+        Args:
+            snapshot: RecommenderSnapshot 实例
+        """
+        if np is None:
+            raise ImportError("向量化打分引擎需要numpy: pip install numpy")
+
+        self.category_count = len(snapshot.categories)
+        self.emotions: Tuple[str, ...] = tuple(snapshot.emotion_keyword_ids.keys())
+
+        # 关键词列 -> 自动机模式ID（每个情绪列表中的每次出现各占一列）
+        keyword_pattern_ids = []
+        for emotion in self.emotions:
+            keyword_pattern_ids.extend(snapshot.emotion_keyword_ids[emotion])
+        self.keyword_columns: Dict[int, int] = {
+            pattern_id: column for column, pattern_id in enumerate(keyword_pattern_ids)
+        }
+
+        # 情绪 × 关键词 计数矩阵
+        emotion_keyword_counts = np.zeros((len(self.emotions), len(keyword_pattern_ids)), dtype=np.float64)
+        for row, emotion in enumerate(self.emotions):
+            for pattern_id in snapshot.emotion_keyword_ids[emotion]:
+                emotion_keyword_counts[row, self.keyword_columns[pattern_id]] = 1.0
+        self.keyword_emotion_matrix = emotion_keyword_counts.T.copy()
+
+        self.emotion_norms = np.array(
+            [snapshot.emotion_norms[emotion] for emotion in self.emotions], dtype=np.float64
+        )
+
+        # 按分类名包含的情绪组合分组，分组数远小于分类数
+        emotion_rows = {emotion: row for row, emotion in enumerate(self.emotions)}
+        category_emotions = [[] for _ in range(self.category_count)]
+        for emotion, category_ids in snapshot.emotion_categories.items():
+            if emotion not in emotion_rows:
+                continue
+            for category_id in category_ids:
+                category_emotions[category_id].append(emotion_rows[emotion])
+
+        groups: Dict[Tuple[int, ...], int] = {(): 0}
+        category_groups = np.zeros(self.category_count, dtype=np.intp)
+        for category_id, rows in enumerate(category_emotions):
+            key = tuple(sorted(rows))
+            if key not in groups:
+                groups[key] = len(groups)
+            category_groups[category_id] = groups[key]
+
+        group_emotion_mask = np.zeros((len(groups), len(self.emotions)), dtype=bool)
+        for key, group_id in groups.items():
+            group_emotion_mask[group_id, list(key)] = True
+
+        self.group_emotion_mask = group_emotion_mask
+        self.category_groups = category_groups
+        self.nonempty_mask = np.array(snapshot.nonempty_mask, dtype=bool)
+        self.automaton = snapshot.automaton
+
+    def _hit_matrix(self, texts: Sequence[str]) -> Tuple['np.ndarray', List[List[int]]]:
+        """将文本转换为关键词命中矩阵，并收集直接匹配的分类下标"""
+        hit_matrix = np.zeros((len(texts), len(self.keyword_columns)), dtype=np.float64)
+        direct_ids = []
+
+        for row, text in enumerate(texts):
+            hits = self.automaton.search(text.lower())
+            direct = []
+            for pattern_id in hits:
+                if pattern_id < self.category_count:
+                    direct.append(pattern_id)
+                else:
+                    column = self.keyword_columns.get(pattern_id)
+                    if column is not None:
+                        hit_matrix[row, column] = 1.0
+            direct_ids.append(direct)
+
+        return hit_matrix, direct_ids
+
+    def score_matrix(self, texts: Sequence[str]) -> 'np.ndarray':
+        """
+        计算一批文本对所有分类的分数
+
+        Args:
+            texts: 用户输入文本列表
+
+        Returns:
+            形状为 (len(texts), 分类数) 的分数矩阵
+        """
+        hit_matrix, direct_ids = self._hit_matrix(texts)
+
+        # 关键词命中 -> 情绪命中数（整数计数，浮点精确）
+        emotion_hits = hit_matrix @ self.keyword_emotion_matrix
+        emotion_scores = np.minimum(emotion_hits / self.emotion_norms, 1.0) * MatchingConfig.EMOTION_MATCH_BONUS
+
+        # 情绪分数 -> 每个情绪组合的最大分数 -> 分类分数
+        if emotion_scores.shape[1]:
+            group_scores = np.where(self.group_emotion_mask[None, :, :], emotion_scores[:, None, :], 0.0).max(axis=2)
+        else:
+            group_scores = np.zeros((len(texts), self.group_emotion_mask.shape[0]), dtype=np.float64)
+        scores = group_scores[:, self.category_groups]
+
+        for row, direct in enumerate(direct_ids):
+            if direct:
+                scores[row, direct] = MatchingConfig.DIRECT_MATCH_BONUS
+
+        return scores
+
+    def rank_row(self, row_scores: 'np.ndarray', k: int) -> List[Tuple[int, float]]:
+        """
+        从一行分数中选出前k个非空分类，同分按分类下标升序
+
+        Args:
+            row_scores: 单条文本的分类分数
+            k: 返回数量
+
+        Returns:
+            [(分类下标, 分数), ...]，仅包含分数大于0的非空分类
+        """
+        candidates = np.flatnonzero((row_scores > 0) & self.nonempty_mask)
+        order = np.lexsort((candidates, -row_scores[candidates]))[:k]
+        return [(int(candidates[i]), float(row_scores[candidates[i]])) for i in order]
+
+    def top_k_batch(self, texts: Sequence[str], k: int) -> List[List[Tuple[int, float]]]:
+        """批量选出每条文本的前k个分类"""
+        if not texts:
+            return []
+        scores = self.score_matrix(texts)
+        return [self.rank_row(row_scores, k) for row_scores in scores]
+
+    def top_k(self, user_text: str, k: int) -> List[Tuple[int, float]]:
+        """选出单条文本的前k个分类"""
+        return self.top_k_batch([user_text], k)[0]
+
+    def score_batch(self, texts: Sequence[str]) -> List[Dict[int, float]]:
+        """批量计算稀疏分类分数"""
+        if not texts:
+            return []
+        return [
+            {int(i): float(row_scores[i]) for i in np.flatnonzero(row_scores > 0)}
+            for row_scores in self.score_matrix(texts)
+        ]
+
+    def score(self, user_text: str) -> Dict[int, float]:
+        """
+        计算单条文本的稀疏分类分数，格式与 RecommenderSnapshot.score 一致
+
+        Args:
+            user_text: 用户输入文本
+
+        Returns:
+            {分类下标: 分数}，仅包含分数大于0的分类
+        """
+        return self.score_batch([user_text])[0]
+
+
+def check_equivalence(snapshot, texts: Sequence[str], k: int = 10) -> bool:
+    """
+    检查向量化引擎与自动机引擎的分数和排序是否完全一致
+
+    Args:
+        snapshot: RecommenderSnapshot 实例
+        texts: 检查用的文本
+        k: 比较的top_k数量
+
+    Returns:
+        是否完全一致
+    """
+    scorer = VectorizedScorer(snapshot)
+
+    for text, ranked in zip(texts, scorer.top_k_batch(texts, k)):
+        if scorer.score(text) != snapshot.score(text):
+            logger.error(f"❌ 分数不一致: {text}")
+            return False
+        if ranked != snapshot.automaton_top_k(text, k):
+            logger.error(f"❌ 排序不一致: {text}")
+            return False
+
+    return True
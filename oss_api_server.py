@@ -7,19 +7,29 @@
 """
 
 import os
-import base64
+import time
+import asyncio
 import uvicorn
-from fastapi import FastAPI, HTTPException, Query, Request, status
+from fastapi import FastAPI, HTTPException, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
+from pydantic_core import to_json
 from typing import List, Optional
 import logging
 from contextlib import asynccontextmanager
 
 # 导入OSS推荐系统
 from oss_emoji_recommender import OSSEmojiRecommender
-from config import RecommendConfig, AlgorithmConfig, OSSConfig, AuthConfig
+from recommend_executor import RecommendExecutor, ExecutorOverloadedError
+from config import RecommendConfig, AlgorithmConfig, OSSConfig, AuthConfig, ServerConfig, ProfilerConfig
+import service_metrics
+from request_tracing import RequestTracingMiddleware, current_trace, slow_request_log
+from auth_middleware import BasicAuthMiddleware
+from stack_profiler import profiler, ProfilerBusyError
+
+# Prometheus文本格式的Content-Type
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -28,73 +38,37 @@ logger = logging.getLogger(__name__)
 # 全局推荐器实例
 recommender = None
 
-# Basic Auth中间件
-async def basic_auth_middleware(request: Request, call_next):
-    """
-    Basic Auth认证中间件
+# 创建推荐器的工厂（可替换，例如基准测试中接入本地模拟OSS）
+recommender_factory = OSSEmojiRecommender
+
+# 全局推荐执行器（将推荐计算移出事件循环）
+recommend_executor = None
+
+def get_recommend_executor() -> RecommendExecutor:
+    """获取推荐执行器，未初始化时按当前推荐器创建"""
+    global recommend_executor
     
-    Args:
-        request: FastAPI请求对象
-        call_next: 下一个中间件或路由处理器
-        
-    Returns:
-        响应对象
-    """
-    # 如果未启用认证，直接通过
-    if not AuthConfig.ENABLE_AUTH:
-        return await call_next(request)
-    
-    # 检查是否为公共路径
-    if AuthConfig.is_public_path(request.url.path):
-        return await call_next(request)
-    
-    # 获取Authorization头
-    authorization = request.headers.get("authorization")
-    
-    if not authorization or not authorization.startswith("Basic "):
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={
-                "error": "认证失败",
-                "message": AuthConfig.AUTH_FAILED_MESSAGE,
-                "detail": "请提供Basic Auth认证信息"
-            },
-            headers={"WWW-Authenticate": "Basic"}
-        )
+    if recommend_executor is None or recommend_executor.recommender is not recommender:
+        recommend_executor = RecommendExecutor(recommender)
     
-    try:
-        # 解码Basic Auth
-        encoded_credentials = authorization.split(" ")[1]
-        decoded_credentials = base64.b64decode(encoded_credentials).decode("utf-8")
-        username, password = decoded_credentials.split(":", 1)
-        
-        # 验证用户名和密码
-        if not AuthConfig.validate_credentials(username, password):
-            return JSONResponse(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                content={
-                    "error": "认证失败",
-                    "message": "用户名或密码错误",
-                    "detail": "请检查您的登录凭据"
-                },
-                headers={"WWW-Authenticate": "Basic"}
-            )
-        
-        # 认证成功，继续处理请求
-        response = await call_next(request)
-        return response
-        
-    except Exception as e:
-        logger.error(f"Basic Auth认证过程中发生错误: {e}")
-        return JSONResponse(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            content={
-                "error": "认证失败",
-                "message": "认证信息格式错误",
-                "detail": str(e)
-            },
-            headers={"WWW-Authenticate": "Basic"}
-        )
+    return recommend_executor
+
+def _executor_stat(name: str):
+    """读取推荐执行器的统计值（未初始化时不导出）"""
+    if recommend_executor is None:
+        return None
+    return recommend_executor.get_stats()[name]
+
+service_metrics.registry.register(service_metrics.Gauge(
+    'emoji_executor_pending', '推荐执行器的在途请求数', callback=lambda: _executor_stat('pending')))
+
+def service_busy_exception() -> HTTPException:
+    """推荐服务过载时返回的503异常"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="推荐服务繁忙，请稍后重试",
+        headers={"Retry-After": str(ServerConfig.RETRY_AFTER_SECONDS)}
+    )
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -113,7 +87,16 @@ async def lifespan(app: FastAPI):
             raise
         
         # 创建OSS推荐器
-        recommender = OSSEmojiRecommender(auto_load_metadata=True)
+        recommender = recommender_factory(auto_load_metadata=True)
+        
+        # 创建推荐执行器
+        get_recommend_executor()
+        
+        # 预先序列化推荐响应中的常量部分
+        prepare_response_fragments()
+        
+        # 多工作进程共享快照：跟随其他进程发布的新一代
+        recommender.start_shared_watcher()
         
         if recommender.emoji_metadata:
             logger.info("✅ OSS表情包推荐系统初始化完成")
@@ -141,6 +124,10 @@ async def lifespan(app: FastAPI):
     
     # 关闭时清理资源
     logger.info("🔄 正在关闭API服务...")
+    if recommender is not None:
+        recommender.stop_shared_watcher()
+    if recommend_executor is not None:
+        recommend_executor.shutdown()
 
 # 创建FastAPI应用
 app = FastAPI(
@@ -150,8 +137,11 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 添加请求追踪中间件（位于认证中间件内层，只追踪通过认证的请求；认证耗时由认证中间件传入）
+app.add_middleware(RequestTracingMiddleware)
+
 # 添加Basic Auth中间件（需要在CORS中间件之前）
-app.middleware("http")(basic_auth_middleware)
+app.add_middleware(BasicAuthMiddleware)
 
 # 添加CORS中间件
 app.add_middleware(
@@ -188,6 +178,18 @@ class RecommendResponse(BaseModel):
     algorithm_config: dict = Field(..., description="当前算法配置")
     oss_info: dict = Field(..., description="OSS相关信息")
 
+class BatchRecommendRequest(BaseModel):
+    """批量推荐请求模型"""
+    inputs: List[str] = Field(..., description="用户输入的文本列表", example=["今天天气不错", "工作太累了"],
+                              min_length=1, max_length=RecommendConfig.MAX_BATCH_SIZE)
+    top_k: Optional[int] = Field(None, description="每条文本返回推荐数量", example=1, ge=1, le=10)
+    stream: bool = Field(False, description="是否以NDJSON格式流式返回，每行一条推荐响应")
+
+class BatchRecommendResponse(BaseModel):
+    """批量推荐响应模型"""
+    results: List[RecommendResponse] = Field(..., description="与输入顺序一致的推荐响应列表")
+    total_count: int = Field(..., description="返回结果总数")
+
 class StatusResponse(BaseModel):
     """状态响应模型"""
     status: str = Field(..., description="服务状态")
@@ -200,6 +202,117 @@ class ConfigResponse(BaseModel):
     recommend_config: dict = Field(..., description="推荐配置")
     oss_config: dict = Field(..., description="OSS配置")
 
+def build_recommend_response(input_text: str, recommendations: List[dict]) -> RecommendResponse:
+    """
+    将推荐器结果转换为API响应模型
+    
+    Args:
+        input_text: 用户输入的原始文本
+        recommendations: recommender.recommend() 返回的推荐结果
+        
+    Returns:
+        推荐响应模型
+    """
+    output = []
+    for rec in recommendations:
+        emoji_rec = EmojiRecommendation(
+            url=rec['url'],
+            category=rec['category'],
+            score=round(rec['score'], 3),
+            keyword_score=round(rec.get('keyword_score', 0), 3),
+            semantic_score=round(rec.get('semantic_score', 0), 3),
+            keyword_weight=rec.get('keyword_weight'),
+            semantic_weight=rec.get('semantic_weight'),
+            rank=rec.get('rank'),
+            source=rec.get('source', 'oss')
+        )
+        output.append(emoji_rec)
+    
+    return RecommendResponse(
+        input=input_text,
+        output=output,
+        total_count=len(output),
+        algorithm_config=_algorithm_config_info(),
+        oss_info=_oss_info()
+    )
+
+def _algorithm_config_info() -> dict:
+    return {
+        "keyword_weight": AlgorithmConfig.KEYWORD_WEIGHT,
+        "semantic_weight": AlgorithmConfig.SEMANTIC_WEIGHT
+    }
+
+def _oss_info() -> dict:
+    return {
+        "bucket": OSSConfig.BUCKET_NAME,
+        "endpoint": OSSConfig.ENDPOINT,
+        "using_oss": True
+    }
+
+# 推荐响应中不随请求变化的尾部（algorithm_config、oss_info），启动时序列化一次
+_recommend_response_tail: Optional[bytes] = None
+
+def prepare_response_fragments() -> bytes:
+    """
+    序列化推荐响应中不随请求变化的部分（启动时调用一次，修改相关配置后需再次调用）
+    
+    Returns:
+        响应JSON中 total_count 之后的尾部字节
+    """
+    global _recommend_response_tail
+    
+    _recommend_response_tail = b''.join((
+        b',"algorithm_config":', to_json(_algorithm_config_info()),
+        b',"oss_info":', to_json(_oss_info()),
+        b'}'
+    ))
+    return _recommend_response_tail
+
+def encode_recommend_response(input_text: str, recommendations: List[dict]) -> bytes:
+    """
+    将推荐器结果直接编码为响应JSON字节，与 build_recommend_response(...).model_dump_json() 逐字节一致
+    
+    不构建 EmojiRecommendation / RecommendResponse 模型：各字段按模型的类型转换后交给 pydantic-core
+    序列化（与模型使用同一个序列化器），常量部分使用启动时预先序列化的尾部。
+    分数超出模型约束时回退到模型路径，由模型校验报错。
+    
+    Args:
+        input_text: 用户输入的原始文本
+        recommendations: recommender.recommend() 返回的推荐结果
+        
+    Returns:
+        响应JSON（UTF-8）
+    """
+    tail = _recommend_response_tail or prepare_response_fragments()
+    
+    output = []
+    for rec in recommendations:
+        score = float(round(rec['score'], 3))
+        if not 0.0 <= score <= 1.0:
+            return build_recommend_response(input_text, recommendations).model_dump_json().encode('utf-8')
+        
+        keyword_weight = rec.get('keyword_weight')
+        semantic_weight = rec.get('semantic_weight')
+        rank = rec.get('rank')
+        output.append({
+            "url": rec['url'],
+            "category": rec['category'],
+            "score": score,
+            "keyword_score": float(round(rec.get('keyword_score', 0), 3)),
+            "semantic_score": float(round(rec.get('semantic_score', 0), 3)),
+            "keyword_weight": float(keyword_weight) if keyword_weight is not None else None,
+            "semantic_weight": float(semantic_weight) if semantic_weight is not None else None,
+            "rank": int(rank) if rank is not None else None,
+            "source": rec.get('source', 'oss')
+        })
+    
+    return b''.join((
+        b'{"input":', to_json(input_text),
+        b',"output":', to_json(output),
+        b',"total_count":', str(len(output)).encode(),
+        tail
+    ))
+
 # API路由定义
 @app.get("/", response_model=dict)
 async def root():
@@ -216,9 +329,14 @@ async def root():
         ],
         "endpoints": {
             "recommend": "/recommend - 表情包推荐",
+            "recommend_batch": "/recommend/batch - 批量表情包推荐",
             "status": "/status - 服务状态",
             "config": "/config - 配置信息",
             "refresh": "/refresh - 刷新元数据",
+            "refresh_status": "/refresh/status - 刷新任务状态",
+            "metrics": "/metrics - Prometheus运行指标",
+            "slow_requests": "/admin/slow-requests - 被追踪的慢请求日志",
+            "profile": "/admin/profile - 按需调用栈采样",
             "docs": "/docs - API文档"
         }
     }
@@ -237,6 +355,8 @@ async def recommend_emoji(request: RecommendRequest):
     if recommender is None:
         raise HTTPException(status_code=503, detail="推荐系统未初始化")
     
+    handler_started = time.perf_counter()
+    
     try:
         # 获取推荐参数
         top_k = request.top_k if request.top_k is not None else RecommendConfig.DEFAULT_TOP_K
@@ -244,49 +364,87 @@ async def recommend_emoji(request: RecommendRequest):
         # 验证top_k参数
         RecommendConfig.validate_top_k(top_k)
         
-        # 执行推荐
-        recommendations = recommender.recommend(request.input, top_k=top_k)
+        # 在执行器中执行推荐，不阻塞事件循环
+        recommendations = await get_recommend_executor().recommend(request.input, top_k)
         
-        # 转换为API响应格式
-        output = []
-        for rec in recommendations:
-            emoji_rec = EmojiRecommendation(
-                url=rec['url'],
-                category=rec['category'],
-                score=round(rec['score'], 3),
-                keyword_score=round(rec.get('keyword_score', 0), 3),
-                semantic_score=round(rec.get('semantic_score', 0), 3),
-                keyword_weight=rec.get('keyword_weight'),
-                semantic_weight=rec.get('semantic_weight'),
-                rank=rec.get('rank'),
-                source=rec.get('source', 'oss')
-            )
-            output.append(emoji_rec)
-        
-        # 构建响应
-        response = RecommendResponse(
-            input=request.input,
-            output=output,
-            total_count=len(output),
-            algorithm_config={
-                "keyword_weight": AlgorithmConfig.KEYWORD_WEIGHT,
-                "semantic_weight": AlgorithmConfig.SEMANTIC_WEIGHT
-            },
-            oss_info={
-                "bucket": OSSConfig.BUCKET_NAME,
-                "endpoint": OSSConfig.ENDPOINT,
-                "using_oss": True
-            }
+        # 直接编码为响应字节，不构建响应模型、不经FastAPI按 response_model 再校验一遍
+        build_started = time.perf_counter()
+        response = Response(
+            content=encode_recommend_response(request.input, recommendations),
+            media_type="application/json"
         )
         
+        finished = time.perf_counter()
+        service_metrics.RESPONSE_BUILD_SECONDS.observe(finished - build_started)
+        service_metrics.HANDLER_SECONDS.observe(finished - handler_started)
+        
+        trace = current_trace()
+        if trace is not None:
+            trace.add('response_build', finished - build_started)
+            trace.add('handler', finished - handler_started)
+            trace.input_length = len(request.input)
+            trace.handler_finished = finished
+        
         return response
         
+    except ExecutorOverloadedError:
+        raise service_busy_exception()
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"推荐过程中发生错误: {e}")
         raise HTTPException(status_code=500, detail="推荐服务内部错误")
 
+@app.post("/recommend/batch", response_model=BatchRecommendResponse)
+async def recommend_emoji_batch(request: BatchRecommendRequest):
+    """
+    批量表情包推荐接口
+    
+    Args:
+        request: 包含文本列表和可选参数的请求
+    
+    Returns:
+        与输入顺序一致的推荐结果；stream=true 时以NDJSON逐行返回
+    """
+    if recommender is None:
+        raise HTTPException(status_code=503, detail="推荐系统未初始化")
+    
+    try:
+        top_k = request.top_k if request.top_k is not None else RecommendConfig.DEFAULT_TOP_K
+        
+        RecommendConfig.validate_top_k(top_k)
+        RecommendConfig.validate_batch_size(len(request.inputs))
+        
+        # 整批文本一次完成打分
+        batch_recommendations = await get_recommend_executor().recommend_batch(request.inputs, top_k)
+        
+        if request.stream:
+            def iter_ndjson():
+                for input_text, recommendations in zip(request.inputs, batch_recommendations):
+                    yield encode_recommend_response(input_text, recommendations) + b"\n"
+            
+            return StreamingResponse(iter_ndjson(), media_type="application/x-ndjson")
+        
+        results = [
+            encode_recommend_response(input_text, recommendations)
+            for input_text, recommendations in zip(request.inputs, batch_recommendations)
+        ]
+        
+        # 与 BatchRecommendResponse(...).model_dump_json() 的输出一致
+        return Response(
+            content=b''.join((b'{"results":[', b','.join(results), b'],"total_count":',
+                              str(len(results)).encode(), b'}')),
+            media_type="application/json"
+        )
+        
+    except ExecutorOverloadedError:
+        raise service_busy_exception()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"批量推荐过程中发生错误: {e}")
+        raise HTTPException(status_code=500, detail="推荐服务内部错误")
+
 @app.get("/recommend", response_model=RecommendResponse)
 async def recommend_emoji_get(
     input: str = Query(..., description="用户输入的文本", example="今天天气不错，心情很好"),
@@ -321,6 +479,8 @@ async def get_status():
     
     try:
         stats = recommender.get_stats()
+        if recommend_executor is not None:
+            stats['executor'] = recommend_executor.get_stats()
         return StatusResponse(
             status="healthy",
             message="OSS推荐服务运行正常",
@@ -333,6 +493,83 @@ async def get_status():
             message=f"获取状态失败: {str(e)}"
         )
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus文本格式的运行指标
+    
+    Returns:
+        各请求阶段耗时直方图、推荐来源计数、刷新耗时、OSS遍历速度和快照规模
+    """
+    return PlainTextResponse(service_metrics.registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.get("/admin/slow-requests")
+async def get_slow_requests(clear: bool = Query(False, description="读取后是否清空日志")):
+    """
+    获取滚动慢请求日志
+    
+    只包含被追踪（携带追踪请求头或被采样）且超过阈值的请求。
+    
+    Args:
+        clear: 读取后是否清空
+    
+    Returns:
+        阈值和按时间从新到旧排列的慢请求（阶段耗时、输入长度、分类数）
+    """
+    entries = slow_request_log.entries()
+    if clear:
+        slow_request_log.clear()
+    return {
+        "threshold_ms": slow_request_log.threshold_ms,
+        "count": len(entries),
+        "entries": entries
+    }
+
+@app.post("/admin/profile", response_class=PlainTextResponse)
+async def profile_process(
+    seconds: float = Query(10.0, description="采样时长（秒）", gt=0),
+    interval_ms: float = Query(None, description="采样间隔（毫秒，默认使用配置）", gt=0),
+    include_idle: bool = Query(False, description="是否保留空闲线程的调用栈")
+):
+    """
+    对当前服务进程进行限时调用栈采样
+    
+    采样在后台线程中进行，不阻塞事件循环；同一时间只允许一次采样。
+    
+    Args:
+        seconds: 采样时长
+        interval_ms: 采样间隔
+        include_idle: 是否保留空闲线程
+    
+    Returns:
+        折叠栈文本（每行 "帧;帧;... 次数"），可直接交给 flamegraph.pl / speedscope 渲染
+    """
+    if not ProfilerConfig.ENABLED:
+        raise HTTPException(status_code=403, detail="调用栈采样未启用")
+    
+    interval = interval_ms / 1000 if interval_ms is not None else None
+    
+    try:
+        ProfilerConfig.validate_duration(seconds)
+        if profiler.running:
+            raise ProfilerBusyError("已有采样正在进行")
+        
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, profiler.profile, seconds, interval, include_idle)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return PlainTextResponse(
+        result['collapsed'],
+        headers={
+            "X-Profile-Samples": str(result['samples']),
+            "X-Profile-Stacks": str(result['stacks']),
+            "X-Profile-Duration": str(result['duration_seconds'])
+        }
+    )
+
 @app.get("/config", response_model=ConfigResponse)
 async def get_config():
     """
@@ -356,42 +593,76 @@ async def get_config():
             "endpoint": OSSConfig.ENDPOINT,
             "emoji_root_path": OSSConfig.EMOJI_ROOT_PATH,
             "cache_file": OSSConfig.METADATA_CACHE_FILE,
-            "cache_expire_hours": OSSConfig.CACHE_EXPIRE_HOURS
+            "cache_expire_hours": OSSConfig.CACHE_EXPIRE_HOURS,
+            "stale_while_revalidate": OSSConfig.STALE_WHILE_REVALIDATE,
+            "cache_max_stale_hours": OSSConfig.CACHE_MAX_STALE_HOURS
         }
     )
 
-@app.post("/refresh")
-async def refresh_metadata():
+@app.post("/refresh", status_code=status.HTTP_202_ACCEPTED)
+async def refresh_metadata(
+    response: Response,
+    wait: bool = Query(False, description="是否等待刷新完成后再返回"),
+    incremental: Optional[bool] = Query(None, description="是否基于对象清单增量重建（默认使用配置）")
+):
     """
     刷新表情包元数据
     
+    刷新在后台线程中构建新快照，完成后整体替换；刷新进行中收到的请求会合并到同一任务。
+    
+    Args:
+        wait: 是否等待刷新完成（不阻塞事件循环）
+        incremental: 是否增量重建，只更新有变化的分类
+    
     Returns:
-        刷新结果
+        刷新任务状态（202）；wait=true 时刷新已完成，返回刷新结果（200）
     """
     if recommender is None:
         raise HTTPException(status_code=503, detail="推荐系统未初始化")
     
-    try:
-        logger.info("🔄 接收到元数据刷新请求...")
-        success = recommender.refresh_metadata()
-        
-        if success:
-            stats = recommender.get_stats()
-            return {
-                "success": True,
-                "message": "元数据刷新成功",
-                "stats": {
-                    "total_categories": stats['total_categories'],
-                    "total_emoji_urls": stats['total_emoji_urls'],
-                    "updated_at": stats['metadata_loaded_at']
-                }
-            }
-        else:
-            raise HTTPException(status_code=500, detail="元数据刷新失败")
-            
-    except Exception as e:
-        logger.error(f"刷新元数据时发生错误: {e}")
-        raise HTTPException(status_code=500, detail=f"刷新失败: {str(e)}")
+    logger.info("🔄 接收到元数据刷新请求...")
+    job = recommender.start_refresh(incremental=incremental)
+    
+    if not wait:
+        return {
+            "success": True,
+            "message": "元数据刷新已在后台进行" if job['merged_requests'] else "元数据刷新已开始",
+            "job": job
+        }
+    
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, recommender.wait_for_refresh)
+    
+    job = recommender.get_refresh_status()
+    if job['state'] != 'succeeded':
+        logger.error(f"刷新元数据时发生错误: {job['error']}")
+        raise HTTPException(status_code=500, detail=f"刷新失败: {job['error']}")
+    
+    stats = recommender.get_stats()
+    response.status_code = status.HTTP_200_OK
+    return {
+        "success": True,
+        "message": "元数据刷新成功",
+        "stats": {
+            "total_categories": stats['total_categories'],
+            "total_emoji_urls": stats['total_emoji_urls'],
+            "updated_at": stats['metadata_loaded_at']
+        },
+        "job": job
+    }
+
+@app.get("/refresh/status")
+async def refresh_status():
+    """
+    获取元数据刷新任务状态
+    
+    Returns:
+        刷新任务状态（idle / running / succeeded / failed）
+    """
+    if recommender is None:
+        raise HTTPException(status_code=503, detail="推荐系统未初始化")
+    
+    return recommender.get_refresh_status()
 
 @app.get("/health")
 async def health_check():
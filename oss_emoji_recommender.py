@@ -8,20 +8,30 @@
 
 import os
 import json
+import time
 import random
 import logging
-from typing import Dict, List, Tuple, Optional
+import threading
+from typing import Callable, Dict, List, Mapping, Sequence, Tuple, Optional
 from datetime import datetime
 
 # 导入配置
 from config import (
     AlgorithmConfig, RecommendConfig, EmotionConfig, 
-    OSSConfig, MatchingConfig
+    OSSConfig, MatchingConfig, ServerConfig
 )
 
 # 导入OSS元数据构建器
 from oss_metadata_builder import OSSMetadataBuilder
 
+# 导入推荐器快照
+from emoji_snapshot import RecommenderSnapshot
+from shared_snapshot import SharedSnapshotStore, SharedSnapshotWatcher
+
+# 导入服务指标
+import service_metrics
+from request_tracing import current_trace
+
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -29,15 +39,38 @@ logger = logging.getLogger(__name__)
 class OSSEmojiRecommender:
     """基于OSS的表情包推荐器"""
     
-    def __init__(self, auto_load_metadata: bool = True):
+    def __init__(self, auto_load_metadata: bool = True, scoring_engine: str = None,
+                 builder_factory: Callable[[], OSSMetadataBuilder] = None,
+                 shared_store: SharedSnapshotStore = None, revalidate_stale: bool = True):
         """
         初始化推荐器
         
         Args:
             auto_load_metadata: 是否自动加载元数据
+            scoring_engine: 打分引擎 ('automaton' 或 'numpy')，默认使用 AlgorithmConfig.SCORING_ENGINE
+            builder_factory: 创建元数据构建器的工厂（可选，例如接入本地模拟OSS），默认 OSSMetadataBuilder
+            shared_store: 多进程共享快照目录（可选），默认在配置了 ServerConfig.SHARED_SNAPSHOT_DIR 时启用
+            revalidate_stale: 加载到已过期的元数据时是否启动后台重新构建（进程池工作者只跟随主进程写出的缓存）
         """
-        self.emoji_metadata: Dict[str, List[str]] = {}
+        self.builder_factory = builder_factory or OSSMetadataBuilder
+        
+        # 多工作进程共享快照：加载时优先挂载当前代，本进程构建的快照发布为新一代
+        if shared_store is None and ServerConfig.SHARED_SNAPSHOT_DIR:
+            shared_store = SharedSnapshotStore()
+        self.shared_store = shared_store
+        self.shared_generation = None
+        self._shared_watcher = None
+        
+        # 过期缓存先用后验：当前元数据的来源和生成时间，以及后台重新验证的状态
+        self.revalidate_stale = revalidate_stale
+        self.metadata_origin = {'source': None, 'file': None, 'generated_at': None, 'build_id': None}
+        self.revalidation = {'state': 'idle', 'job_id': None, 'started_at': None, 'stale_age_seconds': None}
         self.emotion_keywords = EmotionConfig.EMOTION_KEYWORDS
+        self.scoring_engine = scoring_engine or AlgorithmConfig.SCORING_ENGINE
+        AlgorithmConfig.validate_scoring_engine(self.scoring_engine)
+        
+        # 编译后的不可变快照（在load_metadata时生成）
+        self._snapshot = self._compile_snapshot({})
         
         # 统计信息
         self.stats = {
@@ -47,9 +80,105 @@ class OSSEmojiRecommender:
             'using_oss': True
         }
         
+        # 后台刷新任务（单飞：同一时间最多一个构建任务）
+        self._refresh_lock = threading.Lock()
+        self._refresh_done = threading.Event()
+        self._refresh_done.set()
+        self.refresh_state = {
+            'state': 'idle',
+            'job_id': 0,
+            'merged_requests': 0,
+            'incremental': None,
+            'started_at': None,
+            'finished_at': None,
+            'duration_seconds': None,
+            'delta': None,
+            'error': None
+        }
+        
         if auto_load_metadata:
             self.load_metadata()
     
+    def build_snapshot(self, force_rebuild: bool = False) -> RecommenderSnapshot:
+        """
+        构建或加载元数据并编译为新快照，不影响当前正在使用的快照
+        
+        Args:
+            force_rebuild: 是否强制重新构建元数据
+            
+        Returns:
+            新的推荐器快照
+        """
+        return self._build_snapshot(force_rebuild)[0]
+    
+    def _build_snapshot(self, force_rebuild: bool = False,
+                        allow_stale: bool = False) -> Tuple[RecommenderSnapshot, Dict]:
+        """
+        构建或加载元数据并编译为新快照，同时返回元数据来源
+        
+        Args:
+            force_rebuild: 是否强制重新构建元数据
+            allow_stale: 是否接受已过期但未超过最大陈旧时间的缓存
+            
+        Returns:
+            (新快照, {'source', 'file', 'generated_at', 'build_id'})
+        """
+        # 创建OSS元数据构建器
+        builder = self.builder_factory()
+        
+        # 构建或加载元数据，并编译为新快照
+        metadata = builder.build_and_save_metadata(force_rebuild=force_rebuild, allow_stale=allow_stale)
+        
+        if builder.loaded_cache is not None:
+            origin = {'source': 'cache', 'file': builder.loaded_cache['file'],
+                      'generated_at': builder.loaded_cache['modified_at'], 'build_id': builder.build_id}
+        else:
+            origin = {'source': 'oss', 'file': OSSConfig.METADATA_CACHE_FILE, 'generated_at': time.time(),
+                      'build_id': builder.build_id}
+        return self._compile_snapshot(metadata or {}), origin
+    
+    def build_incremental_snapshot(self) -> Tuple[RecommenderSnapshot, Dict]:
+        """
+        基于最新遍历结果构建新快照，只重编译与当前快照不同的分类
+        
+        Returns:
+            (新快照, 差异信息)
+        """
+        current = self._snapshot
+        builder = self.builder_factory()
+        
+        metadata, delta = builder.build_incremental_metadata(current.metadata, self.metadata_origin.get('build_id'))
+        affected = delta['affected_categories']
+        
+        if delta['full_rebuild']:
+            snapshot = self._compile_snapshot(metadata)
+        elif not affected:
+            logger.info("✅ 元数据没有变化，沿用当前快照")
+            snapshot = current
+        else:
+            snapshot = current.with_updated_categories(metadata, affected)
+        
+        return snapshot, delta
+    
+    def install_snapshot(self, snapshot: RecommenderSnapshot, origin: Dict = None):
+        """
+        用新快照替换当前快照（单次引用赋值，正在进行的请求继续使用旧快照）
+        
+        Args:
+            snapshot: 新的推荐器快照
+            origin: 元数据来源 {'source', 'file', 'generated_at', 'build_id'}（可选）
+        """
+        self._snapshot = snapshot
+        if origin is not None:
+            self.metadata_origin = origin
+        self.stats = {
+            **self.stats,
+            'total_categories': len(snapshot.categories),
+            'total_emoji_urls': snapshot.total_urls,
+            'metadata_loaded_at': snapshot.loaded_at
+        }
+        service_metrics.record_snapshot(len(snapshot.categories), snapshot.total_urls)
+    
     def load_metadata(self, force_rebuild: bool = False) -> bool:
         """
         加载表情包元数据
@@ -63,24 +192,41 @@ class OSSEmojiRecommender:
         try:
             logger.info("📥 开始加载表情包元数据...")
             
-            # 创建OSS元数据构建器
-            builder = OSSMetadataBuilder()
+            if self.shared_store is None or force_rebuild:
+                return self._load_and_publish(force_rebuild)
             
-            # 构建或加载元数据
-            self.emoji_metadata = builder.build_and_save_metadata(force_rebuild=force_rebuild)
+            # 其他工作进程已发布共享快照时直接挂载，不再各自加载缓存。
+            # 在发布锁内检查并加载：同时启动的多个进程中只有第一个加载并发布，其余进程随后挂载它发布的一代
+            with self.shared_store.publish_lock():
+                if self.attach_shared_snapshot():
+                    if self.get_cache_age_seconds() <= self._max_cache_age_hours() * 3600:
+                        self._revalidate_if_stale()
+                        return True
+                    logger.info("⏰ 共享元数据快照超过最大陈旧时间，重新构建")
+                
+                return self._load_and_publish(force_rebuild)
+                
+        except Exception as e:
+            logger.error(f"❌ 加载元数据失败: {e}")
+            return False
+    
+    def _load_and_publish(self, force_rebuild: bool) -> bool:
+        """加载或构建元数据并替换当前快照，随后发布为共享快照的新一代"""
+        try:
+            # 过期但未超过最大陈旧时间的缓存先用于服务，随后在后台重新构建
+            allow_stale = OSSConfig.STALE_WHILE_REVALIDATE and not force_rebuild
+            snapshot, origin = self._build_snapshot(force_rebuild=force_rebuild, allow_stale=allow_stale)
             
-            if self.emoji_metadata:
-                # 更新统计信息
-                self.stats.update({
-                    'total_categories': len(self.emoji_metadata),
-                    'total_emoji_urls': sum(len(urls) for urls in self.emoji_metadata.values()),
-                    'metadata_loaded_at': datetime.now().isoformat()
-                })
+            if snapshot.metadata:
+                # 替换快照并更新统计信息
+                self.install_snapshot(snapshot, origin)
+                self.publish_shared_snapshot(snapshot)
                 
                 logger.info(f"✅ 元数据加载成功")
                 logger.info(f"📁 分类数量: {self.stats['total_categories']}")
                 logger.info(f"🎯 表情包数量: {self.stats['total_emoji_urls']}")
                 
+                self._revalidate_if_stale()
                 return True
             else:
                 logger.warning("⚠️  加载的元数据为空")
@@ -90,6 +236,157 @@ class OSSEmojiRecommender:
             logger.error(f"❌ 加载元数据失败: {e}")
             return False
     
+    def attach_shared_snapshot(self, generation: str = None) -> bool:
+        """
+        挂载共享目录中的一代元数据并替换当前快照
+        
+        Args:
+            generation: 代文件名，默认为当前代
+            
+        Returns:
+            是否成功挂载
+        """
+        attached = self.shared_store.attach(generation)
+        if attached is None:
+            return False
+        
+        generation, metadata = attached
+        snapshot = self._compile_snapshot(metadata)
+        if not snapshot.metadata:
+            return False
+        
+        self.install_snapshot(snapshot, {
+            'source': 'shared',
+            'file': metadata.filepath,
+            'generated_at': metadata.generated_at.timestamp(),
+            'build_id': metadata.generated_at.isoformat()
+        })
+        self.shared_generation = generation
+        logger.info(f"📎 已挂载共享元数据快照 {generation}: {len(snapshot.categories)} 个分类, "
+                    f"{snapshot.total_urls} 个表情包")
+        return True
+    
+    def attach_cached_metadata(self) -> bool:
+        """
+        只挂载已有的共享快照或缓存文件，不遍历OSS、不发布共享快照（进程池工作者使用，构建由主进程负责）
+        
+        Returns:
+            是否成功挂载
+        """
+        if self.shared_store is not None and self.attach_shared_snapshot():
+            return True
+        
+        # 主进程负责按时重新构建，工作者接受未超过最大陈旧时间的缓存
+        builder = self.builder_factory()
+        metadata = builder.load_cached_metadata(allow_stale=True)
+        if not metadata:
+            logger.warning("⚠️  没有可挂载的元数据缓存，等待主进程构建")
+            return False
+        
+        self.install_snapshot(self._compile_snapshot(metadata), {
+            'source': 'cache',
+            'file': builder.loaded_cache['file'],
+            'generated_at': builder.loaded_cache['modified_at'],
+            'build_id': builder.build_id
+        })
+        return True
+    
+    @staticmethod
+    def _max_cache_age_hours() -> float:
+        """启动时可直接使用的元数据的最大年龄（小时）"""
+        if OSSConfig.STALE_WHILE_REVALIDATE:
+            return max(OSSConfig.CACHE_MAX_STALE_HOURS, OSSConfig.CACHE_EXPIRE_HOURS)
+        return OSSConfig.CACHE_EXPIRE_HOURS
+    
+    def get_cache_age_seconds(self) -> Optional[float]:
+        """当前元数据自生成以来的秒数，尚未加载时返回 None"""
+        generated_at = self.metadata_origin['generated_at']
+        if generated_at is None:
+            return None
+        return max(0.0, time.time() - generated_at)
+    
+    def _revalidate_if_stale(self):
+        """当前元数据已过期时启动后台重新构建，完成后整体替换快照"""
+        age = self.get_cache_age_seconds()
+        if (not self.revalidate_stale or not OSSConfig.STALE_WHILE_REVALIDATE
+                or age is None or age <= OSSConfig.CACHE_EXPIRE_HOURS * 3600):
+            return
+        
+        logger.info(f"♻️  元数据已过期 {age / 3600:.1f} 小时，先使用当前元数据并在后台重新验证")
+        job = self.start_refresh()
+        with self._refresh_lock:
+            # 刷新任务可能在此之前已经结束，以最新的任务状态为准
+            self.revalidation = {
+                'state': self.refresh_state['state'] if self.refresh_state['job_id'] == job['job_id'] else job['state'],
+                'job_id': job['job_id'],
+                'started_at': job['started_at'],
+                'stale_age_seconds': round(age, 1)
+            }
+    
+    def get_cache_status(self) -> Dict:
+        """当前元数据的来源、年龄和后台重新验证状态"""
+        age = self.get_cache_age_seconds()
+        generated_at = self.metadata_origin['generated_at']
+        return {
+            'source': self.metadata_origin['source'],
+            'file': self.metadata_origin['file'],
+            'generated_at': datetime.fromtimestamp(generated_at).isoformat() if generated_at is not None else None,
+            'age_seconds': round(age, 1) if age is not None else None,
+            'expire_hours': OSSConfig.CACHE_EXPIRE_HOURS,
+            'max_stale_hours': OSSConfig.CACHE_MAX_STALE_HOURS,
+            'stale': age is not None and age > OSSConfig.CACHE_EXPIRE_HOURS * 3600,
+            'revalidation': dict(self.revalidation)
+        }
+    
+    def publish_shared_snapshot(self, snapshot: RecommenderSnapshot):
+        """将本进程构建的快照发布为共享目录中的新一代（未启用共享时不做任何事）"""
+        if self.shared_store is None:
+            return
+        try:
+            self.shared_generation = self.shared_store.publish(snapshot.metadata)
+        except Exception as e:
+            logger.error(f"❌ 发布共享元数据快照失败: {e}")
+    
+    def _on_shared_generation(self, generation: str):
+        """共享目录出现新一代时切换（本进程刚发布的代无需重新挂载）"""
+        if generation == self.shared_generation:
+            return
+        if not self.attach_shared_snapshot(generation):
+            raise RuntimeError(f"无法挂载共享元数据快照 {generation}")
+    
+    def start_shared_watcher(self):
+        """启动后台线程，定期检查并切换到共享目录中的新一代"""
+        if self.shared_store is None or self._shared_watcher is not None:
+            return
+        self._shared_watcher = SharedSnapshotWatcher(self.shared_store, self._on_shared_generation)
+        self._shared_watcher.start(self.shared_generation)
+    
+    def stop_shared_watcher(self):
+        """停止共享快照监视线程"""
+        if self._shared_watcher is not None:
+            self._shared_watcher.stop()
+            self._shared_watcher = None
+    
+    @property
+    def emoji_metadata(self) -> Mapping[str, Sequence[str]]:
+        """当前快照中的元数据（只读）"""
+        return self._snapshot.metadata
+    
+    @emoji_metadata.setter
+    def emoji_metadata(self, metadata: Mapping[str, Sequence[str]]):
+        """编译新快照并整体替换"""
+        self._snapshot = self._compile_snapshot(metadata or {})
+        service_metrics.record_snapshot(len(self._snapshot.categories), self._snapshot.total_urls)
+    
+    def _compile_snapshot(self, metadata: Mapping[str, Sequence[str]]) -> RecommenderSnapshot:
+        """使用当前的情绪关键词和打分引擎编译快照"""
+        return RecommenderSnapshot(metadata, self.emotion_keywords, self.scoring_engine)
+    
+    @property
+    def snapshot(self) -> RecommenderSnapshot:
+        """当前使用的推荐器快照"""
+        return self._snapshot
+    
     def calculate_keyword_score(self, user_text: str, category: str) -> float:
         """
         计算关键词匹配分数
@@ -138,23 +435,32 @@ class OSSEmojiRecommender:
         Returns:
             [(category, score), ...] 按分数降序排列
         """
-        category_scores = []
+        snapshot = self._snapshot
         
-        for category in self.emoji_metadata.keys():
-            # 计算关键词分数
-            keyword_score = self.calculate_keyword_score(user_text, category)
-            
-            # 当前版本主要使用关键词匹配
-            # 后续可以集成语义匹配功能
-            final_score = keyword_score
-            
-            category_scores.append((category, final_score))
+        # 只有被命中的分类才会出现在稀疏分数中
+        scores = snapshot.score(user_text)
         
-        # 按分数降序排列
-        category_scores.sort(key=lambda x: x[1], reverse=True)
+        # 命中分类按分数降序排列，其余分类分数为0并保持原有顺序
+        category_scores = [(snapshot.categories[category_id], score)
+                           for category_id, score in snapshot.rank(scores)]
+        category_scores.extend((category, 0.0)
+                               for category_id, category in enumerate(snapshot.categories)
+                               if category_id not in scores)
         
         return category_scores
     
+    @staticmethod
+    def _select_from_snapshot(snapshot: RecommenderSnapshot, category: str) -> str:
+        """从指定快照的分类中随机选择一个表情包URL（只有被选中的URL才会拼接生成）"""
+        if category not in snapshot.metadata:
+            raise ValueError(f"分类不存在: {category}")
+        
+        urls = snapshot.metadata[category]
+        if not urls:
+            raise ValueError(f"分类 {category} 中没有表情包")
+        
+        return random.choice(urls)
+    
     def select_random_emoji(self, category: str) -> str:
         """
         从指定分类中随机选择一个表情包URL
@@ -165,14 +471,7 @@ class OSSEmojiRecommender:
         Returns:
             表情包URL
         """
-        if category not in self.emoji_metadata:
-            raise ValueError(f"分类不存在: {category}")
-        
-        urls = self.emoji_metadata[category]
-        if not urls:
-            raise ValueError(f"分类 {category} 中没有表情包")
-        
-        return random.choice(urls)
+        return self._select_from_snapshot(self._snapshot, category)
     
     def recommend(self, user_text: str, top_k: int = None) -> List[Dict]:
         """
@@ -185,7 +484,10 @@ class OSSEmojiRecommender:
         Returns:
             推荐结果列表
         """
-        if not self.emoji_metadata:
+        # 整个请求只读取一次快照引用，避免中途被替换
+        snapshot = self._snapshot
+        
+        if not snapshot.metadata:
             raise RuntimeError("表情包元数据未加载，请先调用 load_metadata()")
         
         # 验证和设置推荐数量
@@ -194,36 +496,111 @@ class OSSEmojiRecommender:
         
         RecommendConfig.validate_top_k(top_k)
         
-        # 计算分类分数
-        category_scores = self.calculate_category_scores(user_text)
+        # 选出最优的top_k个非空命中分类（未命中的分类分数为0，无需访问）
+        scoring_started = time.perf_counter()
+        ranked_candidates = snapshot.rank_candidates_batch([user_text], top_k)[0]
+        selection_started = time.perf_counter()
+        
+        recommendations = self._build_recommendations(snapshot, ranked_candidates, top_k)
+        
+        selection_finished = time.perf_counter()
+        service_metrics.SCORING_SECONDS.observe(selection_started - scoring_started)
+        service_metrics.URL_SELECTION_SECONDS.observe(selection_finished - selection_started)
+        self._trace_stages(snapshot, selection_started - scoring_started, selection_finished - selection_started)
+        
+        logger.info(f"🎯 为文本 '{user_text}' 推荐了 {len(recommendations)} 个表情包")
+        
+        return recommendations
+    
+    def recommend_batch(self, texts: List[str], top_k: int = None) -> List[List[Dict]]:
+        """
+        批量推荐表情包
+        
+        整批请求共享同一个快照和一次参数校验，相同文本只计算一次分数，
+        但每条结果仍独立随机选择表情包URL。
+        
+        Args:
+            texts: 用户输入文本列表
+            top_k: 每条文本返回的推荐数量
+            
+        Returns:
+            与输入顺序一致的推荐结果列表
+        """
+        snapshot = self._snapshot
+        
+        if not snapshot.metadata:
+            raise RuntimeError("表情包元数据未加载，请先调用 load_metadata()")
+        
+        if top_k is None:
+            top_k = RecommendConfig.DEFAULT_TOP_K
+        
+        RecommendConfig.validate_top_k(top_k)
+        
+        # 相同文本只打分一次，整批交给快照一次完成（向量化引擎下为一次矩阵运算）
+        unique_texts = list(dict.fromkeys(texts))
+        scoring_started = time.perf_counter()
+        ranked_cache = dict(zip(unique_texts, snapshot.rank_candidates_batch(unique_texts, top_k)))
+        selection_started = time.perf_counter()
+        
+        results = [
+            self._build_recommendations(snapshot, ranked_cache[user_text], top_k)
+            for user_text in texts
+        ]
+        
+        selection_finished = time.perf_counter()
+        service_metrics.SCORING_SECONDS.observe(selection_started - scoring_started)
+        service_metrics.URL_SELECTION_SECONDS.observe(selection_finished - selection_started)
+        self._trace_stages(snapshot, selection_started - scoring_started, selection_finished - selection_started)
+        
+        logger.info(f"🎯 批量推荐完成: {len(texts)} 条文本, {len(ranked_cache)} 条不同文本")
         
+        return results
+    
+    @staticmethod
+    def _trace_stages(snapshot: RecommenderSnapshot, scoring_seconds: float, selection_seconds: float):
+        """当前请求被追踪时，记录打分和URL选择耗时以及参与打分的分类数"""
+        trace = current_trace()
+        if trace is None:
+            return
+        trace.add('scoring', scoring_seconds)
+        trace.add('url_selection', selection_seconds)
+        trace.category_count = len(snapshot.categories)
+    
+    def _build_recommendations(self, snapshot: RecommenderSnapshot,
+                               ranked_candidates: List[Tuple[int, float, float, float]],
+                               top_k: int) -> List[Dict]:
+        """
+        根据排序后的分类分数生成推荐结果，不足部分随机补充
+        
+        Args:
+            snapshot: 本次请求使用的快照
+            ranked_candidates: [(分类下标, 融合分数, 关键词分数, 语义分数), ...] 按融合分数降序排列
+            top_k: 推荐数量
+            
+        Returns:
+            推荐结果列表
+        """
         # 选择推荐结果
         recommendations = []
         used_categories = set()
         
-        for i, (category, score) in enumerate(category_scores):
+        for category_id, score, keyword_score, semantic_score in ranked_candidates:
             if len(recommendations) >= top_k:
                 break
             
-            # 跳过分数为0的分类
-            if score <= 0:
-                continue
-            
-            # 避免重复分类
-            if category in used_categories:
-                continue
+            category = snapshot.categories[category_id]
             
             try:
                 # 随机选择表情包URL
-                emoji_url = self.select_random_emoji(category)
+                emoji_url = self._select_from_snapshot(snapshot, category)
                 
                 # 构建推荐结果
                 recommendation = {
                     'url': emoji_url,
                     'category': category,
                     'score': round(score, 3),
-                    'keyword_score': round(score, 3),  # 当前版本主要使用关键词分数
-                    'semantic_score': 0.0,             # 占位符，后续可扩展
+                    'keyword_score': round(keyword_score, 3),
+                    'semantic_score': round(semantic_score, 3),
                     'keyword_weight': AlgorithmConfig.KEYWORD_WEIGHT,
                     'semantic_weight': AlgorithmConfig.SEMANTIC_WEIGHT,
                     'rank': len(recommendations) + 1,
@@ -237,37 +614,33 @@ class OSSEmojiRecommender:
                 logger.warning(f"⚠️  跳过分类 {category}: {e}")
                 continue
         
-        # 如果推荐数量不足，随机补充
+        service_metrics.RECOMMENDATIONS_OSS.inc(len(recommendations))
+        
+        # 如果推荐数量不足，从非空分类中随机补充
         if len(recommendations) < top_k:
             remaining_count = top_k - len(recommendations)
-            remaining_categories = [cat for cat in self.emoji_metadata.keys() 
-                                  if cat not in used_categories and self.emoji_metadata[cat]]
             
-            if remaining_categories:
-                random.shuffle(remaining_categories)
-                
-                for category in remaining_categories[:remaining_count]:
-                    try:
-                        emoji_url = self.select_random_emoji(category)
-                        
-                        recommendation = {
-                            'url': emoji_url,
-                            'category': category,
-                            'score': 0.1,  # 随机补充的低分
-                            'keyword_score': 0.1,
-                            'semantic_score': 0.0,
-                            'keyword_weight': AlgorithmConfig.KEYWORD_WEIGHT,
-                            'semantic_weight': AlgorithmConfig.SEMANTIC_WEIGHT,
-                            'rank': len(recommendations) + 1,
-                            'source': 'oss_random'
-                        }
-                        
-                        recommendations.append(recommendation)
-                        
-                    except ValueError:
-                        continue
-        
-        logger.info(f"🎯 为文本 '{user_text}' 推荐了 {len(recommendations)} 个表情包")
+            for category in snapshot.sample_categories(remaining_count, exclude=used_categories):
+                try:
+                    emoji_url = self._select_from_snapshot(snapshot, category)
+                    
+                    recommendation = {
+                        'url': emoji_url,
+                        'category': category,
+                        'score': 0.1,  # 随机补充的低分
+                        'keyword_score': 0.1,
+                        'semantic_score': 0.0,
+                        'keyword_weight': AlgorithmConfig.KEYWORD_WEIGHT,
+                        'semantic_weight': AlgorithmConfig.SEMANTIC_WEIGHT,
+                        'rank': len(recommendations) + 1,
+                        'source': 'oss_random'
+                    }
+                    
+                    recommendations.append(recommendation)
+                    service_metrics.RECOMMENDATIONS_RANDOM.inc()
+                    
+                except ValueError:
+                    continue
         
         return recommendations
     
@@ -278,13 +651,130 @@ class OSSEmojiRecommender:
             'categories': list(self.emoji_metadata.keys()),
             'oss_bucket': OSSConfig.BUCKET_NAME,
             'oss_endpoint': OSSConfig.ENDPOINT,
-            'cache_file': OSSConfig.METADATA_CACHE_FILE
+            'cache_file': OSSConfig.METADATA_CACHE_FILE,
+            'metadata_cache': self.get_cache_status(),
+            'shared_snapshot': {
+                'directory': self.shared_store.directory,
+                'generation': self.shared_generation
+            } if self.shared_store is not None else None
         }
     
-    def refresh_metadata(self) -> bool:
-        """刷新元数据（强制重新构建）"""
-        logger.info("🔄 强制刷新表情包元数据...")
-        return self.load_metadata(force_rebuild=True)
+    def refresh_metadata(self, incremental: bool = None) -> bool:
+        """刷新元数据并等待刷新完成；默认按 OSSConfig.INCREMENTAL_REFRESH 增量重建，incremental=False 时全量重建"""
+        self.start_refresh(incremental=incremental)
+        self.wait_for_refresh()
+        return self.refresh_state['state'] == 'succeeded'
+    
+    def start_refresh(self, force_rebuild: bool = True, incremental: bool = None) -> Dict:
+        """
+        在后台线程中刷新元数据
+        
+        已有刷新任务进行中时不会启动新任务，本次请求合并到进行中的任务。
+        
+        Args:
+            force_rebuild: 是否强制重新构建元数据
+            incremental: 是否基于对象清单增量重建，默认使用 OSSConfig.INCREMENTAL_REFRESH
+            
+        Returns:
+            刷新任务状态
+        """
+        with self._refresh_lock:
+            if self.refresh_state['state'] == 'running':
+                self.refresh_state = {
+                    **self.refresh_state,
+                    'merged_requests': self.refresh_state['merged_requests'] + 1
+                }
+                logger.info(f"🔁 刷新任务 #{self.refresh_state['job_id']} 进行中，合并本次刷新请求")
+                return self.get_refresh_status()
+            
+            if incremental is None:
+                incremental = OSSConfig.INCREMENTAL_REFRESH
+            
+            self.refresh_state = {
+                'state': 'running',
+                'job_id': self.refresh_state['job_id'] + 1,
+                'merged_requests': 0,
+                'incremental': incremental,
+                'started_at': datetime.now().isoformat(),
+                'finished_at': None,
+                'duration_seconds': None,
+                'delta': None,
+                'error': None
+            }
+            self._refresh_done.clear()
+            
+            thread = threading.Thread(
+                target=self._run_refresh,
+                args=(force_rebuild, incremental),
+                name=f"metadata-refresh-{self.refresh_state['job_id']}",
+                daemon=True
+            )
+            thread.start()
+            
+            logger.info(f"🔄 已启动后台刷新任务 #{self.refresh_state['job_id']}")
+            return self.get_refresh_status()
+    
+    def _run_refresh(self, force_rebuild: bool, incremental: bool = False):
+        """后台刷新任务：构建新快照后整体替换"""
+        started = datetime.now()
+        error = None
+        delta_summary = None
+        
+        try:
+            if incremental:
+                snapshot, delta = self.build_incremental_snapshot()
+                delta_summary = {
+                    'added': len(delta['added']),
+                    'removed': len(delta['removed']),
+                    'changed': len(delta['changed']),
+                    'affected_categories': sorted(delta['affected_categories']),
+                    'full_rebuild': delta['full_rebuild']
+                }
+                origin = {'source': 'oss', 'file': OSSConfig.METADATA_CACHE_FILE, 'generated_at': time.time(),
+                          'build_id': delta['build_id']}
+            else:
+                snapshot, origin = self._build_snapshot(force_rebuild=force_rebuild)
+            if not snapshot.metadata:
+                raise RuntimeError("构建的元数据为空")
+            self.install_snapshot(snapshot, origin)
+            self.publish_shared_snapshot(snapshot)
+            logger.info(f"✅ 后台刷新完成: {len(snapshot.categories)} 个分类, {snapshot.total_urls} 个表情包")
+        except Exception as e:
+            error = str(e)
+            logger.error(f"❌ 后台刷新失败: {e}")
+        finally:
+            finished = datetime.now()
+            service_metrics.REFRESH_SECONDS.labels(
+                'incremental' if incremental else 'full', 'failed' if error else 'succeeded'
+            ).observe((finished - started).total_seconds())
+            with self._refresh_lock:
+                self.refresh_state = {
+                    **self.refresh_state,
+                    'state': 'failed' if error else 'succeeded',
+                    'finished_at': finished.isoformat(),
+                    'duration_seconds': round((finished - started).total_seconds(), 3),
+                    'delta': delta_summary,
+                    'error': error
+                }
+                if self.revalidation['job_id'] == self.refresh_state['job_id']:
+                    self.revalidation = {**self.revalidation, 'state': self.refresh_state['state']}
+                self._refresh_done.set()
+    
+    def wait_for_refresh(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待当前刷新任务结束
+        
+        Args:
+            timeout: 最长等待秒数，None表示一直等待
+            
+        Returns:
+            刷新任务是否已结束
+        """
+        return self._refresh_done.wait(timeout)
+    
+    def get_refresh_status(self) -> Dict:
+        """获取刷新任务状态"""
+        return dict(self.refresh_state)
 
 def main():
     """主函数 - 测试推荐功能"""
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+OSS表情包元数据二进制缓存
+紧凑的可内存映射格式：字符串表 + 分类偏移 + URL后缀数据块，按需解码
+"""
+
+import os
+import sys
+import json
+import mmap
+import struct
+import shutil
+import logging
+import tempfile
+import threading
+from array import array
+from collections import abc
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# 文件格式（整数均为本机字节序的uint32，文件头记录字节序）:
+#   文件头    magic(4s) version(H) flags(H) generated_at(d) category_count(I) url_count(I) prefix_len(I)
+#   URL公共前缀  prefix_len 字节 UTF-8，补齐到8字节边界
+#   分类名偏移  uint32 × (category_count + 1)
+#   分类URL起始下标  uint32 × (category_count + 1)
+#   URL后缀偏移  uint32 × (url_count + 1)
+#   分类名数据块  UTF-8
+#   URL后缀数据块  UTF-8，完整URL = 公共前缀 + 后缀
+MAGIC = b'EMJB'
+FORMAT_VERSION = 1
+FLAG_LITTLE_ENDIAN = 0x1
+HEADER = struct.Struct('<4sHHdIII')
+
+
+def _pad(length: int) -> int:
+    """补齐到8字节边界需要的字节数"""
+    return (-length) % 8
+
+
+def _common_prefix(urls: Sequence[str]) -> str:
+    """所有URL的公共前缀（按字符计算，不会截断多字节字符）"""
+    if not urls:
+        return ''
+    return os.path.commonprefix([min(urls), max(urls)])
+
+
+class BinaryMetadataWriter:
+    """
+    增量写出二进制缓存
+
+    逐个分类追加；随对象数增长的URL偏移和后缀数据先写入临时溢出文件，
+    提交时再与文件头拼接，内存占用只与分类数相关。
+    先写入临时文件再原子替换，已映射旧文件的进程不会读到半写入的数据。
+    """
+
+    def __init__(self, filepath: str, url_prefix: str = '', generated_at: datetime = None):
+        """
+        Args:
+            filepath: 保存路径
+            url_prefix: 所有URL的公共前缀，文件中只存储前缀之后的部分
+            generated_at: 记录的生成时间，默认为提交时间
+        """
+        self.filepath = filepath
+        self.url_prefix = url_prefix
+        self.generated_at = generated_at
+        self.category_count = 0
+        self.url_count = 0
+
+        self._name_offsets = array('I', [0])
+        self._url_starts = array('I', [0])
+        self._name_blob = bytearray()
+        self._suffix_size = 0
+        self._url_offsets_spill = tempfile.TemporaryFile()
+        self._suffix_spill = tempfile.TemporaryFile()
+        array('I', [0]).tofile(self._url_offsets_spill)
+
+    def add_category(self, category: str, urls: Iterable[str]):
+        """
+        追加一个分类
+
+        Args:
+            category: 分类名
+            urls: 该分类下的完整URL
+        """
+        prefix_len = len(self.url_prefix)
+        offsets = array('I')
+        suffixes = bytearray()
+
+        for url in urls:
+            if not url.startswith(self.url_prefix):
+                raise ValueError(f"URL不以公共前缀开头: {url}")
+            suffixes += url[prefix_len:].encode('utf-8')
+            offsets.append(self._suffix_size + len(suffixes))
+
+        offsets.tofile(self._url_offsets_spill)
+        self._suffix_spill.write(suffixes)
+        self._suffix_size += len(suffixes)
+        self.url_count += len(offsets)
+        self.category_count += 1
+
+        self._name_blob += category.encode('utf-8')
+        self._name_offsets.append(len(self._name_blob))
+        self._url_starts.append(self.url_count)
+
+    def commit(self) -> str:
+        """
+        拼接文件头和各数据段并原子替换目标文件
+
+        Returns:
+            保存的文件路径
+        """
+        prefix_bytes = self.url_prefix.encode('utf-8')
+        flags = FLAG_LITTLE_ENDIAN if sys.byteorder == 'little' else 0
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, flags, (self.generated_at or datetime.now()).timestamp(),
+                             self.category_count, self.url_count, len(prefix_bytes))
+
+        tmp_path = f"{self.filepath}.tmp.{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(header)
+                f.write(prefix_bytes)
+                f.write(b'\0' * _pad(HEADER.size + len(prefix_bytes)))
+                self._name_offsets.tofile(f)
+                self._url_starts.tofile(f)
+                self._url_offsets_spill.seek(0)
+                shutil.copyfileobj(self._url_offsets_spill, f)
+                f.write(self._name_blob)
+                self._suffix_spill.seek(0)
+                shutil.copyfileobj(self._suffix_spill, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.filepath)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            self.abort()
+
+        return self.filepath
+
+    def abort(self):
+        """丢弃已写入的临时数据"""
+        self._url_offsets_spill.close()
+        self._suffix_spill.close()
+
+
+def write_binary_metadata(metadata: Mapping[str, Sequence[str]], filepath: str) -> str:
+    """
+    将元数据写入二进制缓存文件
+
+    Args:
+        metadata: {category: [url1, url2, ...]} 格式的元数据
+        filepath: 保存路径
+
+    Returns:
+        保存的文件路径
+    """
+    writer = BinaryMetadataWriter(
+        filepath, _common_prefix([url for urls in metadata.values() for url in urls])
+    )
+    for category, urls in metadata.items():
+        writer.add_category(category, urls)
+    return writer.commit()
+
+
+class CategoryUrls(abc.Sequence):
+    """单个分类的URL序列视图，访问时才解码对应的URL"""
+
+    __slots__ = ('_store', '_start', '_end')
+
+    def __init__(self, store: 'BinaryMetadata', start: int, end: int):
+        self._store = store
+        self._start = start
+        self._end = end
+
+    @property
+    def store(self) -> 'BinaryMetadata':
+        """所属的二进制元数据"""
+        return self._store
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("URL下标越界")
+        return self._store.url_at(self._start + index)
+
+    def __repr__(self) -> str:
+        return f"CategoryUrls({len(self)} urls)"
+
+
+class BinaryMetadata(abc.Mapping):
+    """
+    内存映射的只读元数据
+
+    实现 Mapping[str, Sequence[str]] 接口，可直接替代 {category: [urls]} 字典使用。
+    分类名在首次按名查找或遍历时解码，URL在被访问时才解码。
+    """
+
+    def __init__(self, filepath: str):
+        """
+        映射二进制缓存文件
+
+        Args:
+            filepath: 二进制缓存文件路径
+        """
+        self.filepath = filepath
+
+        with open(filepath, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, flags, generated_at, category_count, url_count, prefix_len = \
+            HEADER.unpack_from(self._mmap, 0)
+
+        if magic != MAGIC:
+            raise ValueError(f"不是有效的元数据二进制文件: {filepath}")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"不支持的元数据二进制格式版本: {version}")
+        if bool(flags & FLAG_LITTLE_ENDIAN) != (sys.byteorder == 'little'):
+            raise ValueError("元数据二进制文件的字节序与当前平台不一致")
+
+        self.generated_at = datetime.fromtimestamp(generated_at)
+        self.category_count = category_count
+        self.url_count = url_count
+
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+        self.url_prefix = bytes(view[offset:offset + prefix_len]).decode('utf-8')
+        offset += prefix_len + _pad(HEADER.size + prefix_len)
+
+        def take_uint32(count):
+            nonlocal offset
+            section = view[offset:offset + 4 * count].cast('I')
+            offset += 4 * count
+            return section
+
+        self._name_offsets = take_uint32(category_count + 1)
+        self._url_starts = take_uint32(category_count + 1)
+        self._url_offsets = take_uint32(url_count + 1)
+
+        self._name_blob_start = offset
+        self._suffix_blob_start = offset + self._name_offsets[category_count]
+        self._view = view
+
+        # 分类名 -> 分类下标，首次按名访问时构建
+        self._index: Optional[Dict[str, int]] = None
+
+    def copy_to(self, filepath: str) -> str:
+        """
+        将映射中的数据原样写出为新文件（写临时文件、刷盘后原子替换）
+
+        缓存文件在映射之后可能已被整体替换，按路径复制或硬链接得到的未必是本对象正在提供的数据。
+
+        Args:
+            filepath: 目标路径
+
+        Returns:
+            保存的文件路径
+        """
+        tmp_path = f"{filepath}.tmp.{os.getpid()}.{threading.get_ident()}"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(self._mmap)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, filepath)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return filepath
+
+    def category_at(self, category_id: int) -> str:
+        """解码第 category_id 个分类名"""
+        start = self._name_blob_start + self._name_offsets[category_id]
+        end = self._name_blob_start + self._name_offsets[category_id + 1]
+        return str(self._view[start:end], 'utf-8')
+
+    def url_at(self, url_id: int) -> str:
+        """解码第 url_id 个URL"""
+        start = self._suffix_blob_start + self._url_offsets[url_id]
+        end = self._suffix_blob_start + self._url_offsets[url_id + 1]
+        return self.url_prefix + str(self._view[start:end], 'utf-8')
+
+    def urls_at(self, category_id: int) -> CategoryUrls:
+        """第 category_id 个分类的URL序列视图"""
+        return CategoryUrls(self, self._url_starts[category_id], self._url_starts[category_id + 1])
+
+    def _get_index(self) -> Dict[str, int]:
+        if self._index is None:
+            self._index = {self.category_at(i): i for i in range(self.category_count)}
+        return self._index
+
+    def __getitem__(self, category: str) -> CategoryUrls:
+        return self.urls_at(self._get_index()[category])
+
+    def __contains__(self, category) -> bool:
+        return category in self._get_index()
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._get_index())
+
+    def __len__(self) -> int:
+        return self.category_count
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        """完整解码为 {category: [urls]} 字典"""
+        return {category: list(urls) for category, urls in self.items()}
+
+
+def load_binary_metadata(filepath: str) -> Optional[BinaryMetadata]:
+    """
+    加载二进制缓存，文件不存在或格式无效时返回None
+
+    Args:
+        filepath: 二进制缓存文件路径
+
+    Returns:
+        BinaryMetadata 或 None
+    """
+    if not os.path.exists(filepath):
+        return None
+
+    try:
+        return BinaryMetadata(filepath)
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"⚠️  二进制元数据缓存无效，回退到JSON: {e}")
+        return None
+
+
+def export_json(binary_path: str, json_path: str) -> str:
+    """
+    将二进制缓存导出为与 OSSMetadataBuilder.save_metadata 相同结构的JSON文件
+
+    Args:
+        binary_path: 二进制缓存文件路径
+        json_path: 导出的JSON文件路径
+
+    Returns:
+        导出的JSON文件路径
+    """
+    store = BinaryMetadata(binary_path)
+    metadata = store.to_dict()
+
+    full_metadata = {
+        'metadata': {
+            'generated_at': store.generated_at.isoformat(),
+            'total_categories': len(metadata),
+            'total_files': store.url_count
+        },
+        'categories': metadata
+    }
+
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(full_metadata, f, ensure_ascii=False, indent=2)
+
+    return json_path
+
+
+def main():
+    """命令行入口：将二进制缓存导出为JSON"""
+    if len(sys.argv) != 3:
+        print("用法: python oss_metadata_binary.py <二进制缓存文件> <导出JSON文件>")
+        return
+
+    export_json(sys.argv[1], sys.argv[2])
+    print(f"✅ 已导出: {sys.argv[2]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,28 +10,195 @@ import os
 import json
 import time
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby, islice
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
 from pathlib import Path
 
-try:
-    import oss2
-except ImportError:
-    print("❌ 请安装OSS依赖: pip install oss2")
-    exit(1)
-
 from config import OSSConfig, EmotionConfig
+from emoji_url_store import PrefixedUrls
+from oss_metadata_binary import BinaryMetadataWriter, write_binary_metadata, load_binary_metadata
+from oss_metadata_stream import MetadataJsonWriter, ManifestWriter, ManifestReader
+from rebuild_lock import RebuildLock
+import service_metrics
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# oss2 在第一次真正访问OSS时才导入；缓存有效时启动过程不加载SDK、不创建凭据和客户端
+oss2 = None
+
+def _import_oss2():
+    """导入并缓存 oss2 模块"""
+    global oss2
+    
+    if oss2 is None:
+        try:
+            import oss2 as oss2_module
+        except ImportError as e:
+            logger.error("❌ 请安装OSS依赖: pip install oss2")
+            raise ImportError("缺少OSS依赖 oss2，请执行: pip install oss2") from e
+        oss2 = oss2_module
+    
+    return oss2
+
+class _ManifestDelta:
+    """
+    把上次的对象清单与本次遍历结果按分类归并，逐分类计算差异
+    
+    清单与遍历结果都按对象键字典序排列，同一分类的对象键连续出现，
+    因此两边可以像归并排序一样同步前进，内存中只保留当前分类的清单条目。
+    """
+    
+    def __init__(self, manifest: Iterable[Tuple[str, Dict]], root_path: str):
+        """
+        Args:
+            manifest: 按写出顺序产出 (object_key, entry) 的清单（通常为 ManifestReader）
+            root_path: 表情包根路径，用于从对象键解析分类
+        """
+        self._root_path = root_path
+        self._groups = groupby(manifest, key=self._category_of)
+        self._pending: Optional[Tuple[str, Dict[str, Dict]]] = None
+        self._last_prefix = ''
+        self.ordered = True   # 清单是否按分类有序；无序时差异不可信，调用方应按全量重建处理
+        self.added: List[str] = []
+        self.removed: List[str] = []
+        self.changed: List[str] = []
+        self.affected_categories = set()
+        self._advance()
+    
+    def _category_of(self, item: Tuple[str, Dict]) -> str:
+        return item[0][len(self._root_path):].split('/')[0]
+    
+    def _advance(self):
+        """取出清单中的下一个分类"""
+        group = next(self._groups, None) if self.ordered else None
+        if group is not None and group[0] + '/' <= self._last_prefix:
+            logger.warning(f"⚠️  对象清单未按分类排列（{group[0]}），忽略清单差异")
+            self.ordered = False
+            group = None
+        if group is not None:
+            self._last_prefix = group[0] + '/'
+            group = (group[0], dict(group[1]))
+        self._pending = group
+    
+    def _remove_pending(self):
+        category, entries = self._pending
+        self.removed.extend(entries)
+        self.affected_categories.add(category)
+        self._advance()
+    
+    def add_category(self, category: str, category_files: List[Dict]):
+        """
+        对比一个分类的本次遍历结果与清单条目
+        
+        Args:
+            category: 分类名
+            category_files: 该分类的文件信息
+        """
+        # 各分类前缀以'/'结尾，按前缀比较才与对象键的字典序一致
+        prefix = category + '/'
+        while self._pending is not None and self._pending[0] + '/' < prefix:
+            self._remove_pending()
+        
+        previous = {}
+        if self._pending is not None and self._pending[0] == category:
+            previous = self._pending[1]
+            self._advance()
+        
+        for file_info in category_files:
+            object_key = file_info['object_key']
+            entry = previous.pop(object_key, None)
+            if entry is None:
+                self.added.append(object_key)
+                self.affected_categories.add(category)
+            elif (entry.get('etag') != file_info.get('etag', '')
+                  or entry.get('size') != file_info['size']
+                  or entry.get('last_modified') != file_info['last_modified']):
+                self.changed.append(object_key)
+                self.affected_categories.add(category)
+        
+        if previous:
+            self.removed.extend(previous)
+            self.affected_categories.add(category)
+    
+    def finish(self) -> Dict:
+        """
+        清单中剩余的分类都已被删除
+        
+        Returns:
+            {'added': [...], 'removed': [...], 'changed': [...], 'affected_categories': set}
+        """
+        while self._pending is not None:
+            self._remove_pending()
+        return {
+            'added': self.added,
+            'removed': self.removed,
+            'changed': self.changed,
+            'affected_categories': self.affected_categories
+        }
+
 class OSSMetadataBuilder:
     """OSS表情包元数据构建器"""
     
-    def __init__(self):
-        """初始化OSS客户端"""
+    def __init__(self, bucket=None, object_iterator=None):
+        """
+        初始化构建器
+        
+        OSS客户端（oss2、凭据提供者、Bucket）在第一次访问 bucket 时才创建，
+        只读取本地缓存的流程不会触发任何OSS相关初始化。
+        
+        Args:
+            bucket: 已创建的Bucket对象（可选，例如本地模拟OSS），提供时跳过认证
+            object_iterator: 分页遍历器类（可选），默认 oss2.ObjectIterator
+        """
+        self._bucket = bucket
+        self._object_iterator = object_iterator
+        self._client_lock = threading.Lock()
+        self.session = None
+        
+        # 最近一次从本地缓存加载的信息：{'file', 'modified_at', 'stale'}；从OSS构建时为 None
+        self.loaded_cache = None
+        # 最近一次加载或构建的元数据的生成时间（ISO格式）。同一次构建写出的元数据文件和对象清单记录同一个值，
+        # 增量重建据此确认清单描述的正是调用方正在使用的元数据
+        self.build_id: Optional[str] = None
+        # 当前持有的跨进程重建锁，写出结果前据此确认租约仍有效
+        self._held_lock: Optional[RebuildLock] = None
+        
+        if bucket is not None:
+            logger.info(f"✅ 使用外部提供的Bucket: {type(bucket).__name__}")
+    
+    @property
+    def bucket(self):
+        """OSS Bucket对象，首次访问时创建（并行遍历的多个线程共享同一个）"""
+        if self._bucket is None:
+            with self._client_lock:
+                if self._bucket is None:
+                    self._bucket = self._create_bucket()
+        return self._bucket
+    
+    @property
+    def object_iterator(self):
+        """分页遍历器类，默认 oss2.ObjectIterator"""
+        if self._object_iterator is None:
+            self._object_iterator = _import_oss2().ObjectIterator
+        return self._object_iterator
+    
+    def _create_bucket(self):
+        """
+        按配置创建OSS客户端
+        
+        Returns:
+            oss2.Bucket 对象
+        """
         try:
+            oss2 = _import_oss2()
+            
             # 验证OSS配置
             OSSConfig.validate_config()
             
@@ -64,14 +231,19 @@ class OSSMetadataBuilder:
                 logger.info("🔐 使用AKSK认证")
                 auth = oss2.Auth(OSSConfig.ACCESS_KEY_ID, OSSConfig.ACCESS_KEY_SECRET)
             
+            # 创建共享连接池的会话，供并行遍历的各线程复用
+            self.session = oss2.Session(pool_size=max(OSSConfig.LIST_WORKERS, oss2.defaults.connection_pool_size))
+            
             # 创建Bucket对象
-            self.bucket = oss2.Bucket(auth, OSSConfig.ENDPOINT, OSSConfig.BUCKET_NAME)
+            bucket = oss2.Bucket(auth, OSSConfig.ENDPOINT, OSSConfig.BUCKET_NAME, session=self.session)
             
             logger.info(f"✅ OSS客户端初始化成功")
             logger.info(f"📦 Bucket: {OSSConfig.BUCKET_NAME}")
             logger.info(f"🌐 Endpoint: {OSSConfig.ENDPOINT}")
             logger.info(OSSConfig.get_auth_info())
             
+            return bucket
+            
         except Exception as e:
             logger.error(f"❌ OSS客户端初始化失败: {e}")
             raise
@@ -88,75 +260,201 @@ class OSSMetadataBuilder:
             logger.error(f"❌ OSS连接测试失败: {e}")
             return False
     
-    def list_emoji_files(self) -> List[Dict]:
+    def _parse_emoji_object(self, obj) -> Optional[Dict]:
+        """
+        解析单个OSS对象，非表情包文件返回None
+        
+        Args:
+            obj: oss2.ObjectIterator 返回的对象信息
+            
+        Returns:
+            表情包文件信息或None
+        """
+        object_key = obj.key
+        
+        # 跳过目录（以/结尾的对象）
+        if object_key.endswith('/'):
+            return None
+        
+        # 检查文件扩展名
+        file_ext = Path(object_key).suffix.lower()
+        if file_ext not in OSSConfig.SUPPORTED_EXTENSIONS:
+            return None
+        
+        # 解析目录结构，提取分类信息
+        relative_path = object_key[len(OSSConfig.EMOJI_ROOT_PATH):] if object_key.startswith(OSSConfig.EMOJI_ROOT_PATH) else object_key
+        path_parts = relative_path.split('/')
+        
+        if len(path_parts) < 2:
+            return None
+        
+        category = path_parts[0]  # 第一级目录作为分类
+        filename = path_parts[-1]  # 文件名
+        
+        # 生成公共访问URL
+        public_url = OSSConfig.get_public_url(object_key)
+        
+        # 处理时间戳 - OSS返回的时间戳可能是int或datetime对象
+        last_modified_str = ''
+        if obj.last_modified:
+            if isinstance(obj.last_modified, datetime):
+                last_modified_str = obj.last_modified.isoformat()
+            elif isinstance(obj.last_modified, (int, float)):
+                last_modified_str = datetime.fromtimestamp(obj.last_modified).isoformat()
+            else:
+                last_modified_str = str(obj.last_modified)
+        
+        return {
+            'object_key': object_key,
+            'category': category,
+            'filename': filename,
+            'url': public_url,
+            'size': obj.size,
+            'last_modified': last_modified_str,
+            'etag': obj.etag or '',
+            'file_extension': file_ext
+        }
+    
+    def _iter_objects(self, prefix: str, delimiter: str = ''):
+        """分页遍历指定前缀下的对象"""
+        return self.object_iterator(self.bucket, prefix=prefix, delimiter=delimiter,
+                                    max_keys=OSSConfig.LIST_PAGE_SIZE)
+    
+    def list_emoji_files(self, parallel: bool = None) -> List[Dict]:
         """
         遍历OSS bucket，获取所有表情包文件信息
         
+        Args:
+            parallel: 是否按分类目录并行遍历，默认使用 OSSConfig.PARALLEL_LISTING
+            
         Returns:
             表情包文件信息列表
         """
-        emoji_files = []
+        emoji_files = list(self.iter_emoji_files(parallel))
+        logger.info(f"✅ 遍历完成，共发现 {len(emoji_files)} 个表情包文件")
+        return emoji_files
+    
+    def iter_emoji_files(self, parallel: bool = None) -> Iterator[Dict]:
+        """
+        按对象键字典序逐个产出表情包文件信息（分页遍历，不保留已产出的结果）
+        
+        Args:
+            parallel: 是否按分类目录并行遍历，默认使用 OSSConfig.PARALLEL_LISTING
+            
+        Yields:
+            表情包文件信息
+        """
+        if parallel is None:
+            parallel = OSSConfig.PARALLEL_LISTING
         
         try:
             logger.info(f"🔍 开始遍历OSS Bucket中的表情包文件...")
             logger.info(f"📁 搜索路径: {OSSConfig.EMOJI_ROOT_PATH}")
             
-            # 遍历指定路径下的所有对象
-            for obj in oss2.ObjectIterator(self.bucket, prefix=OSSConfig.EMOJI_ROOT_PATH):
-                object_key = obj.key
-                
-                # 跳过目录（以/结尾的对象）
-                if object_key.endswith('/'):
-                    continue
-                
-                # 检查文件扩展名
-                file_ext = Path(object_key).suffix.lower()
-                if file_ext not in OSSConfig.SUPPORTED_EXTENSIONS:
-                    continue
-                
-                # 解析目录结构，提取分类信息
-                relative_path = object_key[len(OSSConfig.EMOJI_ROOT_PATH):] if object_key.startswith(OSSConfig.EMOJI_ROOT_PATH) else object_key
-                path_parts = relative_path.split('/')
-                
-                if len(path_parts) >= 2:
-                    category = path_parts[0]  # 第一级目录作为分类
-                    filename = path_parts[-1]  # 文件名
-                    
-                    # 生成公共访问URL
-                    public_url = OSSConfig.get_public_url(object_key)
-                    
-                    # 处理时间戳 - OSS返回的时间戳可能是int或datetime对象
-                    last_modified_str = ''
-                    if obj.last_modified:
-                        if isinstance(obj.last_modified, datetime):
-                            last_modified_str = obj.last_modified.isoformat()
-                        elif isinstance(obj.last_modified, (int, float)):
-                            last_modified_str = datetime.fromtimestamp(obj.last_modified).isoformat()
-                        else:
-                            last_modified_str = str(obj.last_modified)
-                    
-                    file_info = {
-                        'object_key': object_key,
-                        'category': category,
-                        'filename': filename,
-                        'url': public_url,
-                        'size': obj.size,
-                        'last_modified': last_modified_str,
-                        'file_extension': file_ext
-                    }
-                    
-                    emoji_files.append(file_info)
-                    
-                    if len(emoji_files) % 50 == 0:
-                        logger.info(f"📄 已发现 {len(emoji_files)} 个表情包文件...")
+            started = time.perf_counter()
+            found = 0
+            for file_info in (self._iter_emoji_files_parallel() if parallel
+                              else self._iter_emoji_files_sequential()):
+                found += 1
+                yield file_info
             
-            logger.info(f"✅ 遍历完成，共发现 {len(emoji_files)} 个表情包文件")
-            return emoji_files
+            # 遍历耗时包含下游逐条处理的时间（流式构建时即整个构建过程）
+            service_metrics.record_listing(found, time.perf_counter() - started)
             
         except Exception as e:
             logger.error(f"❌ 遍历OSS失败: {e}")
             raise
     
+    def _iter_emoji_files_sequential(self) -> Iterator[Dict]:
+        """单线程顺序遍历整个根路径"""
+        found = 0
+        
+        # 遍历指定路径下的所有对象
+        for obj in self._iter_objects(OSSConfig.EMOJI_ROOT_PATH):
+            file_info = self._parse_emoji_object(obj)
+            if file_info is None:
+                continue
+            
+            found += 1
+            if found % 50 == 0:
+                logger.info(f"📄 已发现 {found} 个表情包文件...")
+            
+            yield file_info
+    
+    def _list_category_prefixes(self) -> List[str]:
+        """
+        使用分隔符遍历获取第一级分类目录前缀
+        
+        根路径下直接存放的文件不属于任何分类，与顺序遍历一样被忽略。
+        
+        Returns:
+            按字典序排列的分类前缀列表
+        """
+        return [obj.key for obj in self._iter_objects(OSSConfig.EMOJI_ROOT_PATH, delimiter='/')
+                if obj.is_prefix()]
+    
+    def _list_prefix_files(self, prefix: str) -> List[Dict]:
+        """遍历单个分类前缀下的全部表情包文件"""
+        emoji_files = []
+        for obj in self._iter_objects(prefix):
+            file_info = self._parse_emoji_object(obj)
+            if file_info is not None:
+                emoji_files.append(file_info)
+        return emoji_files
+    
+    def _iter_emoji_files_parallel(self) -> Iterator[Dict]:
+        """
+        按分类前缀分片并发遍历
+        
+        OSS按对象键字典序返回结果，而各分类前缀均以'/'结尾、互不包含，
+        因此按前缀顺序拼接各分片结果与顺序遍历的结果完全一致。
+        同一时间最多有 LIST_WORKERS 个分类在遍历或等待产出，内存占用不随分类数增长。
+        """
+        prefixes = self._list_category_prefixes()
+        workers = OSSConfig.LIST_WORKERS
+        logger.info(f"🧵 发现 {len(prefixes)} 个分类目录，使用 {workers} 个线程并行遍历")
+        
+        found = 0
+        remaining = iter(prefixes)
+        
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='oss-list') as executor:
+            # 滑动窗口：按提交顺序取回结果，每取回一个再提交下一个前缀
+            window = deque(
+                (prefix, executor.submit(self._list_prefix_files, prefix))
+                for prefix in islice(remaining, workers)
+            )
+            while window:
+                prefix, future = window.popleft()
+                prefix_files = future.result()
+                
+                next_prefix = next(remaining, None)
+                if next_prefix is not None:
+                    window.append((next_prefix, executor.submit(self._list_prefix_files, next_prefix)))
+                
+                found += len(prefix_files)
+                logger.info(f"📄 {prefix}: {len(prefix_files)} 个文件，累计 {found} 个")
+                yield from prefix_files
+    
+    @staticmethod
+    def iter_category_groups(emoji_files: Iterable[Dict]) -> Iterator[Tuple[str, List[Dict]]]:
+        """
+        将按对象键字典序产出的文件信息折叠为逐分类的分组
+        
+        同一分类目录下的对象键在字典序中是连续的，因此每个分类遇到下一个分类时即已完整。
+        
+        Args:
+            emoji_files: 按对象键字典序排列的表情包文件信息
+            
+        Yields:
+            (分类名, 该分类的文件信息列表)
+        """
+        seen = set()
+        for category, group in groupby(emoji_files, key=lambda file_info: file_info['category']):
+            if category in seen:
+                raise ValueError(f"遍历结果未按分类聚集，分类重复出现: {category}")
+            seen.add(category)
+            yield category, list(group)
+    
     def build_metadata_json(self, emoji_files: List[Dict]) -> Dict[str, List[str]]:
         """
         构建表情包元数据JSON
@@ -200,58 +498,146 @@ class OSSMetadataBuilder:
         
         return metadata
     
-    def save_metadata(self, metadata: Dict[str, List[str]], filepath: str = None) -> str:
+    def _metadata_info(self) -> Dict:
+        """写入元数据文件 metadata 段的来源信息"""
+        return {
+            'oss_bucket': OSSConfig.BUCKET_NAME,
+            'oss_endpoint': OSSConfig.ENDPOINT,
+            'emoji_root_path': OSSConfig.EMOJI_ROOT_PATH
+        }
+    
+    def _manifest_info(self) -> Dict:
+        """写入对象清单 metadata 段的来源信息"""
+        return {
+            'oss_bucket': OSSConfig.BUCKET_NAME,
+            'emoji_root_path': OSSConfig.EMOJI_ROOT_PATH
+        }
+    
+    def save_metadata(self, metadata: Mapping[str, Sequence[str]], filepath: str = None) -> str:
         """
-        保存元数据到JSON文件
+        保存元数据到JSON文件，启用二进制缓存时同时写出二进制文件
         
         Args:
             metadata: 元数据字典
-            filepath: 保存路径（可选）
+            filepath: 保存路径（可选，指定时只写JSON）
             
         Returns:
             保存的文件路径
         """
+        write_binary = filepath is None and OSSConfig.USE_BINARY_CACHE
         if filepath is None:
             filepath = OSSConfig.METADATA_CACHE_FILE
         
+        writer = MetadataJsonWriter(filepath, self._metadata_info())
         try:
-            # 添加元信息
-            full_metadata = {
-                'metadata': {
-                    'generated_at': datetime.now().isoformat(),
-                    'total_categories': len(metadata),
-                    'total_files': sum(len(urls) for urls in metadata.values()),
-                    'oss_bucket': OSSConfig.BUCKET_NAME,
-                    'oss_endpoint': OSSConfig.ENDPOINT,
-                    'emoji_root_path': OSSConfig.EMOJI_ROOT_PATH
-                },
-                'categories': metadata
-            }
-            
-            # 保存JSON文件
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(full_metadata, f, ensure_ascii=False, indent=2)
+            for category, urls in metadata.items():
+                writer.add_category(category, urls)
+            writer.commit()
             
             logger.info(f"✅ 元数据已保存到: {filepath}")
             logger.info(f"📁 文件大小: {os.path.getsize(filepath)} 字节")
             
+            if write_binary:
+                binary_path = write_binary_metadata(metadata, OSSConfig.BINARY_CACHE_FILE)
+                logger.info(f"✅ 二进制缓存已保存到: {binary_path} ({os.path.getsize(binary_path)} 字节)")
+            
             return filepath
             
         except Exception as e:
+            writer.abort()
             logger.error(f"❌ 保存元数据失败: {e}")
             raise
     
-    def load_cached_metadata(self, filepath: str = None) -> Optional[Dict]:
+    @staticmethod
+    def _cache_staleness(filepath: str, allow_stale: bool = False) -> Optional[bool]:
+        """
+        按修改时间判断缓存文件是否可用
+        
+        Args:
+            filepath: 缓存文件路径
+            allow_stale: 是否接受已过期但未超过 CACHE_MAX_STALE_HOURS 的缓存
+            
+        Returns:
+            None 表示不可用；否则为是否已过期（已过期时需要后台重新验证）
+        """
+        age_hours = (time.time() - os.path.getmtime(filepath)) / 3600
+        if age_hours <= OSSConfig.CACHE_EXPIRE_HOURS:
+            return False
+        if allow_stale and age_hours <= OSSConfig.CACHE_MAX_STALE_HOURS:
+            logger.info(f"⏳ 缓存文件已过期 {age_hours:.1f} 小时，先使用过期缓存: {filepath}")
+            return True
+        logger.info(f"⏰ 缓存文件已过期: {filepath}")
+        return None
+    
+    def _remember_loaded_cache(self, filepath: str, stale: bool):
+        self.loaded_cache = {
+            'file': filepath,
+            'modified_at': os.path.getmtime(filepath),
+            'stale': stale
+        }
+    
+    def load_cached_binary_metadata(self, allow_stale: bool = False) -> Optional[Mapping[str, Sequence[str]]]:
+        """
+        加载内存映射的二进制缓存
+        
+        二进制文件不存在、已过期、比JSON旧或格式无效时返回None，由调用方回退到JSON。
+        
+        Args:
+            allow_stale: 是否接受已过期但未超过最大陈旧时间的缓存
+            
+        Returns:
+            只读的 {category: [urls]} 映射或None
+        """
+        binary_path = OSSConfig.BINARY_CACHE_FILE
+        json_path = OSSConfig.METADATA_CACHE_FILE
+        
+        if not os.path.exists(binary_path):
+            return None
+        
+        try:
+            stale = self._cache_staleness(binary_path, allow_stale)
+            if stale is None:
+                return None
+            
+            # JSON被单独更新过（例如手工编辑或旧版本写入）时以JSON为准
+            if os.path.exists(json_path) and os.path.getmtime(json_path) > os.path.getmtime(binary_path):
+                logger.info(f"📄 JSON缓存比二进制缓存新，使用JSON: {json_path}")
+                return None
+        except OSError:
+            return None
+        
+        metadata = load_binary_metadata(binary_path)
+        if metadata is not None:
+            self._remember_loaded_cache(binary_path, stale)
+            self.build_id = metadata.generated_at.isoformat()
+            logger.info(f"✅ 成功映射二进制缓存: {binary_path}")
+            logger.info(f"📊 缓存信息:")
+            logger.info(f"   生成时间: {metadata.generated_at.isoformat()}")
+            logger.info(f"   分类数量: {metadata.category_count}")
+            logger.info(f"   文件数量: {metadata.url_count}")
+        
+        return metadata
+    
+    def load_cached_metadata(self, filepath: str = None,
+                             allow_stale: bool = False) -> Optional[Mapping[str, Sequence[str]]]:
         """
         加载缓存的元数据
         
+        未指定路径且启用二进制缓存时优先映射二进制文件，失败时回退到JSON。
+        加载成功后 self.loaded_cache 记录所用文件及是否已过期。
+        
         Args:
-            filepath: 元数据文件路径
+            filepath: 元数据文件路径（指定时只读取该JSON文件）
+            allow_stale: 是否接受已过期但未超过 CACHE_MAX_STALE_HOURS 的缓存
             
         Returns:
             元数据字典或None
         """
         if filepath is None:
+            if OSSConfig.USE_BINARY_CACHE:
+                binary_metadata = self.load_cached_binary_metadata(allow_stale)
+                if binary_metadata is not None:
+                    return binary_metadata
             filepath = OSSConfig.METADATA_CACHE_FILE
         
         if not os.path.exists(filepath):
@@ -260,17 +646,16 @@ class OSSMetadataBuilder:
         
         try:
             # 检查文件是否过期
-            file_mtime = datetime.fromtimestamp(os.path.getmtime(filepath))
-            expire_time = datetime.now() - timedelta(hours=OSSConfig.CACHE_EXPIRE_HOURS)
-            
-            if file_mtime < expire_time:
-                logger.info(f"⏰ 缓存文件已过期: {filepath}")
+            stale = self._cache_staleness(filepath, allow_stale)
+            if stale is None:
                 return None
             
             # 加载JSON文件
             with open(filepath, 'r', encoding='utf-8') as f:
                 data = json.load(f)
             
+            self._remember_loaded_cache(filepath, stale)
+            self.build_id = data.get('metadata', {}).get('generated_at')
             logger.info(f"✅ 成功加载缓存元数据: {filepath}")
             
             if 'metadata' in data:
@@ -286,43 +671,295 @@ class OSSMetadataBuilder:
             logger.error(f"❌ 加载缓存元数据失败: {e}")
             return None
     
-    def build_and_save_metadata(self, force_rebuild: bool = False) -> Dict[str, List[str]]:
+    def build_and_save_metadata(self, force_rebuild: bool = False,
+                                allow_stale: bool = False) -> Mapping[str, Sequence[str]]:
         """
         构建并保存元数据（支持缓存）
         
         Args:
             force_rebuild: 是否强制重新构建
+            allow_stale: 是否接受已过期但未超过最大陈旧时间的缓存（是否过期见 self.loaded_cache）
             
         Returns:
             元数据字典
         """
-        # 尝试加载缓存
+        # 尝试加载缓存（先记下缓存文件的修改时间，获取重建锁后据此判断是否已被其他进程重写）
+        cache_mtime = self._cache_mtime()
         if not force_rebuild:
-            cached_metadata = self.load_cached_metadata()
+            cached_metadata = self.load_cached_metadata(allow_stale=allow_stale)
             if cached_metadata:
                 logger.info("🎯 使用缓存的元数据")
                 return cached_metadata
         
-        logger.info("🔄 开始重新构建元数据...")
+        with self.rebuild_lock(cache_mtime) as rebuilt_by_other:
+            if rebuilt_by_other:
+                cached_metadata = self.load_cached_metadata()
+                if cached_metadata:
+                    logger.info("🤝 其他进程已完成重建，复用其结果")
+                    return cached_metadata
+            
+            logger.info("🔄 开始重新构建元数据...")
+            
+            # 测试OSS连接
+            if not self.test_connection():
+                raise ConnectionError("无法连接到OSS服务")
+            
+            # 流式遍历OSS，逐分类写出元数据和逐对象清单
+            metadata = self.stream_build_metadata(self.iter_emoji_files())
+            self.loaded_cache = None
+        
+        if not metadata:
+            logger.warning("⚠️  未发现任何表情包文件")
+            return {}
+        
+        return metadata
+    
+    @staticmethod
+    def _cache_mtime() -> Optional[float]:
+        try:
+            return os.path.getmtime(OSSConfig.METADATA_CACHE_FILE)
+        except OSError:
+            return None
+    
+    @contextmanager
+    def rebuild_lock(self, cache_mtime: Optional[float]):
+        """
+        持有跨进程重建锁执行重建（OSSConfig.REBUILD_LOCK_ENABLED 关闭时不加锁）
+        
+        同一主机上同时只有一个进程遍历OSS；获取锁后缓存文件已被其他进程重写时，
+        调用方应直接复用缓存，而不是再遍历一次。是否重写只看缓存文件的修改时间，与获取锁时是否需要等待无关：
+        其他进程可能恰好在调用方检查缓存之后、获取锁之前完成重建并释放锁。
+        两种情况下都持有锁直到调用方退出，复用的缓存加载失败、回退到重建时仍在锁内进行；
+        持有期间 stream_build_metadata 在写出每个文件前确认租约仍有效。
+        
+        Args:
+            cache_mtime: 调用方决定重建前看到的缓存文件修改时间（_cache_mtime()，文件不存在时为None）
+            
+        Yields:
+            缓存文件是否已被其他进程重写
+        """
+        if not OSSConfig.REBUILD_LOCK_ENABLED:
+            yield False
+            return
+        
+        lock = RebuildLock()
+        lock.acquire()
+        rebuilt_by_other = self._cache_mtime() != cache_mtime
+        service_metrics.REBUILD_LOCK_WAIT_SECONDS.labels(
+            'reused' if rebuilt_by_other else 'rebuilt'
+        ).observe(lock.waited_seconds)
+        
+        self._held_lock = lock
+        try:
+            yield rebuilt_by_other
+        finally:
+            self._held_lock = None
+            lock.release()
+    
+    def stream_build_metadata(self, emoji_files: Iterable[Dict],
+                              on_category: Callable[[str, List[Dict]], None] = None
+                              ) -> Mapping[str, Sequence[str]]:
+        """
+        流式构建并保存元数据
+        
+        遍历结果 → 逐分类分组 → 增量写出JSON、二进制缓存和对象清单。
+        内存中只保留当前分类的文件信息，峰值内存不随Bucket规模增长。
+        没有任何表情包文件时不覆盖已有的缓存文件。
+        
+        Args:
+            emoji_files: 按对象键字典序排列的表情包文件信息（通常为 iter_emoji_files() 的结果）
+            on_category: 每个分类写出后的回调 (分类名, 该分类的文件信息)，增量重建用它逐分类计算差异
+            
+        Returns:
+            元数据映射；启用二进制缓存时为刚写出文件的内存映射，否则为紧凑的 PrefixedUrls 字典
+        """
+        logger.info("🔨 开始流式构建元数据...")
+        
+        # 同一次构建写出的各文件记录同一个生成时间
+        generated_at = datetime.now()
+        # 写出器逐个创建并登记，后面的构造失败时也能丢弃已创建写出器的临时文件
+        writers = []
+        binary_writer = None
+        compact_metadata = {}
+        
+        try:
+            json_writer = MetadataJsonWriter(OSSConfig.METADATA_CACHE_FILE, self._metadata_info(), generated_at)
+            writers.append(json_writer)
+            manifest_writer = ManifestWriter(OSSConfig.MANIFEST_CACHE_FILE, self._manifest_info(), generated_at)
+            writers.append(manifest_writer)
+            if OSSConfig.USE_BINARY_CACHE:
+                binary_writer = BinaryMetadataWriter(OSSConfig.BINARY_CACHE_FILE,
+                                                     OSSConfig.get_public_url(OSSConfig.EMOJI_ROOT_PATH),
+                                                     generated_at)
+                writers.append(binary_writer)
+            
+            for category, category_files in self.iter_category_groups(emoji_files):
+                # 与 build_metadata_json 一致：分类内URL排序
+                urls = sorted(file_info['url'] for file_info in category_files)
+                
+                json_writer.add_category(category, urls)
+                manifest_writer.add_objects(category_files)
+                if binary_writer is not None:
+                    binary_writer.add_category(category, urls)
+                else:
+                    compact_metadata[category] = PrefixedUrls(urls)
+                if on_category is not None:
+                    on_category(category, category_files)
+                
+                logger.info(f"   📁 {category}: {len(urls)} 个文件")
+            
+            if json_writer.total_categories == 0:
+                for writer in writers:
+                    writer.abort()
+                return {}
+            
+            # 持有重建锁时每个文件替换前都确认租约仍有效，租约已被接管时放弃写出，不覆盖新持有者的结果
+            for writer in writers:
+                if self._held_lock is not None:
+                    self._held_lock.ensure_held()
+                writer.commit()
+            
+        except Exception as e:
+            for writer in writers:
+                writer.abort()
+            logger.error(f"❌ 流式构建元数据失败: {e}")
+            raise
+        
+        self.build_id = generated_at.isoformat()
+        logger.info(f"📈 总计: {json_writer.total_categories} 个分类, {json_writer.total_files} 个表情包")
+        logger.info(f"✅ 元数据已保存到: {OSSConfig.METADATA_CACHE_FILE}")
+        logger.info(f"✅ 对象清单已保存到: {OSSConfig.MANIFEST_CACHE_FILE} ({manifest_writer.total_files} 个对象)")
+        
+        if binary_writer is not None:
+            metadata = load_binary_metadata(OSSConfig.BINARY_CACHE_FILE)
+            if metadata is not None:
+                return metadata
+            # 映射失败时回退到刚写出的JSON
+            return self.load_cached_metadata(OSSConfig.METADATA_CACHE_FILE) or {}
+        
+        return compact_metadata
+    
+    def save_manifest(self, emoji_files: Iterable[Dict], filepath: str = None) -> str:
+        """
+        保存逐对象清单，供增量重建时计算差异
+        
+        Args:
+            emoji_files: 表情包文件信息列表
+            filepath: 保存路径（可选）
+            
+        Returns:
+            保存的文件路径
+        """
+        if filepath is None:
+            filepath = OSSConfig.MANIFEST_CACHE_FILE
+        
+        writer = ManifestWriter(filepath, self._manifest_info())
+        try:
+            writer.add_objects(emoji_files)
+            writer.commit()
+            
+            logger.info(f"✅ 对象清单已保存到: {filepath} ({writer.total_files} 个对象)")
+            
+            return filepath
+            
+        except Exception as e:
+            writer.abort()
+            logger.error(f"❌ 保存对象清单失败: {e}")
+            raise
+    
+    def open_manifest(self, filepath: str = None) -> Optional[ManifestReader]:
+        """
+        打开逐对象清单供逐行读取
+        
+        Args:
+            filepath: 清单文件路径
+            
+        Returns:
+            ManifestReader（调用方负责关闭）；清单不存在、根路径不一致或布局不可逐行读取时返回None
+        """
+        if filepath is None:
+            filepath = OSSConfig.MANIFEST_CACHE_FILE
+        
+        if not os.path.exists(filepath):
+            logger.info(f"📄 对象清单不存在: {filepath}")
+            return None
+        
+        try:
+            reader = ManifestReader(filepath)
+        except Exception as e:
+            logger.error(f"❌ 加载对象清单失败: {e}")
+            return None
+        
+        if reader.source.get('emoji_root_path') != OSSConfig.EMOJI_ROOT_PATH:
+            logger.info("⚠️  对象清单的根路径与当前配置不一致，忽略清单")
+            reader.close()
+            return None
+        
+        return reader
+    
+    def build_incremental_metadata(self, current_metadata: Mapping[str, Sequence[str]],
+                                   build_id: str = None) -> Tuple[Mapping[str, Sequence[str]], Dict]:
+        """
+        基于逐对象清单增量重建元数据
+        
+        仍需完整遍历OSS（OSS不提供变更流），元数据全部取自本次遍历结果；
+        与全量重建一样逐分类流式写出缓存和新清单，同时逐行归并旧清单计算差异，峰值内存不随Bucket规模增长。
+        受影响分类按分类前缀比较清单条目（对象键、数量、size / last_modified / ETag）得出，不解码 current_metadata，
+        调用方只需重编译这些分类。清单必须与 current_metadata 出自同一次构建（生成时间等于 build_id），
+        否则（例如已被其他进程重写）与没有清单一样退化为全量重建。
         
-        # 测试OSS连接
+        Args:
+            current_metadata: 当前正在使用的元数据
+            build_id: current_metadata 的生成时间（加载或构建它的 OSSMetadataBuilder.build_id）
+            
+        Returns:
+            (新元数据, 差异信息)；差异信息中的 'full_rebuild' 表示是否进行了全量重建，'build_id' 为新元数据的生成时间
+        """
+        with self.rebuild_lock(self._cache_mtime()) as rebuilt_by_other:
+            if rebuilt_by_other:
+                metadata = self.load_cached_metadata()
+                if metadata:
+                    logger.info("🤝 其他进程已完成重建，复用其结果")
+                    return metadata, {'added': [], 'removed': [], 'changed': [],
+                                      'affected_categories': set(metadata), 'full_rebuild': True,
+                                      'build_id': self.build_id}
+            
+            metadata, delta = self._build_incremental_metadata(current_metadata, build_id)
+            delta['build_id'] = self.build_id
+            return metadata, delta
+    
+    def _build_incremental_metadata(self, current_metadata: Mapping[str, Sequence[str]],
+                                    build_id: Optional[str]) -> Tuple[Mapping[str, Sequence[str]], Dict]:
         if not self.test_connection():
             raise ConnectionError("无法连接到OSS服务")
         
-        # 遍历OSS获取文件列表
-        emoji_files = self.list_emoji_files()
+        manifest = self.open_manifest() if current_metadata and build_id else None
+        if manifest is not None and manifest.source.get('generated_at') != build_id:
+            logger.info("⚠️  对象清单与当前元数据不是同一次构建的结果（可能已被其他进程重写），忽略清单")
+            manifest.close()
+            manifest = None
         
-        if not emoji_files:
-            logger.warning("⚠️  未发现任何表情包文件")
-            return {}
+        if manifest is None:
+            logger.info("🔄 无可用清单或当前元数据，执行全量重建")
+            metadata = self.stream_build_metadata(self.iter_emoji_files())
+            return metadata, {'added': [], 'removed': [], 'changed': [],
+                              'affected_categories': set(metadata), 'full_rebuild': True}
         
-        # 构建元数据
-        metadata = self.build_metadata_json(emoji_files)
+        # 遍历结果逐分类写出的同时与旧清单归并计算差异，旧清单逐行读取；
+        # 写出新清单是原子替换，不影响仍在读取的旧文件
+        with manifest:
+            merge = _ManifestDelta(manifest, OSSConfig.EMOJI_ROOT_PATH)
+            metadata = self.stream_build_metadata(self.iter_emoji_files(), merge.add_category)
+            delta = merge.finish()
         
-        # 保存元数据
-        self.save_metadata(metadata)
+        delta['full_rebuild'] = not merge.ordered
+        if delta['full_rebuild']:
+            delta['affected_categories'] = set(metadata)
         
-        return metadata
+        logger.info(f"🧮 增量差异: 新增 {len(delta['added'])}, 删除 {len(delta['removed'])}, "
+                    f"修改 {len(delta['changed'])}, 受影响分类 {len(delta['affected_categories'])}")
+        
+        return metadata, delta
 
 def main():
     """主函数 - 元数据构建入口"""
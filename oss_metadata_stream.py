@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+元数据流式写出
+按分类/对象逐段写出元数据JSON和逐对象清单，写出和读取清单时都不在内存中保留完整结构
+"""
+
+import os
+import json
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, Tuple
+
+
+class _StreamingJsonFile:
+    """先写入临时文件，提交时刷盘后原子替换目标文件，读者只会看到旧文件或完整的新文件"""
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self._tmp_path = f"{filepath}.tmp.{os.getpid()}.{threading.get_ident()}"
+        self._file = open(self._tmp_path, 'w', encoding='utf-8')
+
+    def _replace(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_path, self.filepath)
+
+    def abort(self):
+        """丢弃已写入的临时文件"""
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+class MetadataJsonWriter(_StreamingJsonFile):
+    """
+    流式写出元数据JSON
+
+    输出结构与 json.dump(..., indent=2) 一致：{"categories": {...}, "metadata": {...}}，
+    统计信息在所有分类写完后才确定，因此放在末尾。
+    """
+
+    def __init__(self, filepath: str, info: Dict = None, generated_at: datetime = None):
+        """
+        Args:
+            filepath: 保存路径
+            info: 附加到 metadata 段的信息（bucket、endpoint 等）
+            generated_at: 记录的生成时间，默认为提交时间；同一次构建的各文件传入同一个值
+        """
+        super().__init__(filepath)
+        self.info = info or {}
+        self.generated_at = generated_at
+        self.total_categories = 0
+        self.total_files = 0
+        self._file.write('{\n  "categories": {')
+
+    def add_category(self, category: str, urls: Iterable[str]):
+        """
+        追加一个分类
+
+        Args:
+            category: 分类名
+            urls: 该分类下的URL
+        """
+        urls = list(urls)
+        entry = json.dumps(urls, ensure_ascii=False, indent=2).replace('\n', '\n    ')
+        separator = ',' if self.total_categories else ''
+        self._file.write(f'{separator}\n    {json.dumps(category, ensure_ascii=False)}: {entry}')
+        self.total_categories += 1
+        self.total_files += len(urls)
+
+    def commit(self) -> str:
+        """
+        写出统计信息并原子替换目标文件
+
+        Returns:
+            保存的文件路径
+        """
+        metadata = {
+            'generated_at': (self.generated_at or datetime.now()).isoformat(),
+            'total_categories': self.total_categories,
+            'total_files': self.total_files,
+            **self.info
+        }
+        closing = '\n  ' if self.total_categories else ''
+        block = json.dumps(metadata, ensure_ascii=False, indent=2).replace('\n', '\n  ')
+        self._file.write(f'{closing}}},\n  "metadata": {block}\n}}')
+        self._replace()
+        return self.filepath
+
+
+class ManifestWriter(_StreamingJsonFile):
+    """
+    流式写出逐对象清单
+
+    输出结构：{"source": {...}, "objects": {object_key: {size, last_modified, etag}}, "metadata": {...}}，
+    每个对象独占一行，来源信息和生成时间放在第一行，ManifestReader 可以逐行读取而不载入整个清单。
+    """
+
+    def __init__(self, filepath: str, info: Dict = None, generated_at: datetime = None):
+        """
+        Args:
+            filepath: 保存路径
+            info: 来源信息（bucket、根路径等），同时写入 source 段和 metadata 段
+            generated_at: 记录的生成时间，默认为创建时间；与同一次构建的元数据文件一致，用于判断清单描述的是哪份元数据
+        """
+        super().__init__(filepath)
+        self.info = {**(info or {}), 'generated_at': (generated_at or datetime.now()).isoformat()}
+        self.total_files = 0
+        self._file.write(f'{{"source":{json.dumps(self.info, ensure_ascii=False, separators=(",", ":"))},"objects":{{')
+
+    def add_objects(self, emoji_files: Iterable[Dict]):
+        """
+        追加一批对象
+
+        Args:
+            emoji_files: 表情包文件信息
+        """
+        for file_info in emoji_files:
+            entry = json.dumps({
+                'size': file_info['size'],
+                'last_modified': file_info['last_modified'],
+                'etag': file_info.get('etag', '')
+            }, separators=(',', ':'))
+            separator = ',' if self.total_files else ''
+            self._file.write(f'{separator}\n{json.dumps(file_info["object_key"], ensure_ascii=False)}:{entry}')
+            self.total_files += 1
+
+    def commit(self) -> str:
+        """
+        写出统计信息并原子替换目标文件
+
+        Returns:
+            保存的文件路径
+        """
+        metadata = {
+            'total_files': self.total_files,
+            **self.info
+        }
+        self._file.write(f'\n}},"metadata":{json.dumps(metadata, ensure_ascii=False, separators=(",", ":"))}}}')
+        self._replace()
+        return self.filepath
+
+
+class ManifestReader:
+    """
+    逐行读取 ManifestWriter 写出的对象清单
+
+    按写出顺序（即遍历时的对象键字典序）产出 (object_key, {size, last_modified, etag})，
+    内存中只保留当前一行。不是逐行布局的清单（例如旧版本写出的单行清单）在打开时抛出 ValueError。
+    """
+
+    _HEAD = '{"source":'
+    _HEAD_END = ',"objects":{\n'
+    _TAIL = '},"metadata":'
+
+    def __init__(self, filepath: str):
+        """
+        Args:
+            filepath: 清单文件路径
+        """
+        self.filepath = filepath
+        self._file = open(filepath, 'r', encoding='utf-8')
+        try:
+            head = self._file.readline()
+            if not (head.startswith(self._HEAD) and head.endswith(self._HEAD_END)):
+                raise ValueError(f"不是逐行布局的对象清单: {filepath}")
+            self.source: Dict = json.loads(head[len(self._HEAD):-len(self._HEAD_END)])
+        except Exception:
+            self._file.close()
+            raise
+
+    def __iter__(self) -> Iterator[Tuple[str, Dict]]:
+        for line in self._file:
+            if line.startswith(self._TAIL):
+                return
+            (object_key, entry), = json.loads('{' + line.rstrip('\n').rstrip(',') + '}').items()
+            yield object_key, entry
+        raise ValueError(f"对象清单不完整: {self.filepath}")
+
+    def close(self):
+        """关闭清单文件"""
+        self._file.close()
+
+    def __enter__(self) -> 'ManifestReader':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+跨进程元数据重建锁（带租约）
+锁文件以 O_CREAT | O_EXCL 原子创建，内容为持有者信息（令牌、主机、进程号、获取时间）；
+持有期间后台线程每 1/3 租约时间更新一次锁文件的修改时间（续租）。
+等待者发现锁文件超过租约时间未更新时，认为持有者已异常退出（如被 SIGKILL 或 OOM），
+把锁文件改名移走后重新竞争。持有者在写出结果前确认锁仍由自己持有（ensure_held），
+租约已失效的旧持有者不会覆盖新持有者的结果。锁文件与元数据缓存在同一目录，同一主机上的所有工作进程共用。
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import OSSConfig
+
+logger = logging.getLogger(__name__)
+
+
+class RebuildLockTimeout(TimeoutError):
+    """等待重建锁超时"""
+
+
+class RebuildLockLost(RuntimeError):
+    """持有的重建锁已失效（租约过期或已被其他进程接管）"""
+
+
+class RebuildLock:
+    """基于锁文件的跨进程互斥锁，持有者定期续租"""
+
+    def __init__(self, path: str = None, lease_seconds: float = None, wait_seconds: float = None,
+                 poll_interval: float = 0.05):
+        """
+        初始化重建锁
+
+        Args:
+            path: 锁文件路径，默认为元数据缓存文件旁的 .lock 文件
+            lease_seconds: 租约时间（秒），默认使用 OSSConfig.REBUILD_LOCK_LEASE_SECONDS
+            wait_seconds: 最长等待时间（秒），默认使用 OSSConfig.REBUILD_LOCK_WAIT_SECONDS
+            poll_interval: 等待期间检查锁文件的间隔（秒）
+        """
+        self.path = path or f"{OSSConfig.METADATA_CACHE_FILE}.lock"
+        self.lease_seconds = lease_seconds or OSSConfig.REBUILD_LOCK_LEASE_SECONDS
+        self.wait_seconds = OSSConfig.REBUILD_LOCK_WAIT_SECONDS if wait_seconds is None else wait_seconds
+        self.poll_interval = poll_interval
+
+        self.token: Optional[str] = None
+        self.contended = False       # 获取时锁是否被其他进程持有
+        self.waited_seconds = 0.0    # 获取锁的等待时间
+        self._stop_renewal: Optional[threading.Event] = None
+        self._renewal_thread: Optional[threading.Thread] = None
+
+    def _read_lease(self, path: str = None) -> Dict:
+        """读取锁文件中的持有者信息，不存在或正在写入时返回空字典"""
+        try:
+            with open(path or self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def holder(self) -> Optional[Dict]:
+        """当前持有者信息，未被持有时返回 None"""
+        if not os.path.exists(self.path):
+            return None
+        return self._read_lease()
+
+    def _try_create(self) -> bool:
+        """原子创建锁文件，成功即获得锁"""
+        token = uuid.uuid4().hex
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return False
+
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({
+                'token': token,
+                'host': socket.gethostname(),
+                'pid': os.getpid(),
+                'acquired_at': datetime.now().isoformat()
+            }, f)
+
+        self.token = token
+        self._stop_renewal = threading.Event()
+        self._renewal_thread = threading.Thread(
+            target=self._renew, args=(token, self._stop_renewal), name='rebuild-lock-renewal', daemon=True)
+        self._renewal_thread.start()
+        return True
+
+    def _renew(self, token: str, stop: threading.Event):
+        """续租线程：定期更新锁文件修改时间，锁被接管后停止"""
+        while not stop.wait(self.lease_seconds / 3):
+            if self._read_lease().get('token') != token:
+                logger.warning(f"⚠️  重建锁租约已失效（被其他进程接管）: {self.path}")
+                return
+            try:
+                os.utime(self.path)
+            except OSError:
+                return
+
+    def is_held(self) -> bool:
+        """
+        锁是否仍由本对象持有
+
+        锁文件必须仍是本对象创建的，且最近一次续租未超过租约时间
+        （续租停滞时其他进程随时可能视其过期并接管）。
+        """
+        if self.token is None or self._read_lease().get('token') != self.token:
+            return False
+        try:
+            return time.time() - os.path.getmtime(self.path) <= self.lease_seconds
+        except FileNotFoundError:
+            return False
+
+    def ensure_held(self):
+        """
+        确认锁仍由本对象持有，写出结果前调用，避免租约失效的旧持有者覆盖新持有者的结果
+
+        Raises:
+            RebuildLockLost: 锁已失效
+        """
+        if not self.is_held():
+            raise RebuildLockLost(f"重建锁租约已失效，放弃写出结果: {self.path}")
+
+    def _break_expired(self) -> bool:
+        """
+        移走租约已过期的锁文件
+
+        Returns:
+            锁文件已不存在（可以立即重新竞争）时返回 True
+        """
+        try:
+            modified_at = os.path.getmtime(self.path)
+        except FileNotFoundError:
+            return True
+        if time.time() - modified_at <= self.lease_seconds:
+            return False
+
+        lease = self._read_lease()
+        expired_path = f"{self.path}.expired.{os.getpid()}.{threading.get_ident()}"
+        try:
+            os.rename(self.path, expired_path)
+        except FileNotFoundError:
+            return True
+
+        # 检查与改名之间其他进程可能已接管并创建了新锁：移走的不是过期的那个锁时放回原处。
+        # 放回成功后只删除多出的这个链接；放回失败时保留文件，不删除仍在持有的锁
+        if self._read_lease(expired_path).get('token') != lease.get('token'):
+            try:
+                os.link(expired_path, self.path)
+            except OSError as e:
+                logger.warning(f"⚠️  无法放回误移走的重建锁文件，保留在 {expired_path}: {e}")
+                return False
+            os.remove(expired_path)
+            return False
+
+        os.remove(expired_path)
+        logger.warning(f"⚠️  重建锁租约已过期，接管锁（原持有者 {lease.get('host')}:{lease.get('pid')}）")
+        return True
+
+    def acquire(self):
+        """
+        获取锁，锁被其他进程持有时等待
+
+        Raises:
+            RebuildLockTimeout: 超过最长等待时间
+        """
+        started = time.monotonic()
+        while not self._try_create():
+            if not self.contended:
+                holder = self._read_lease()
+                logger.info(f"⏳ 其他进程正在重建元数据（{holder.get('host')}:{holder.get('pid')}），等待其完成...")
+            self.contended = True
+
+            if self._break_expired():
+                continue
+            if time.monotonic() - started > self.wait_seconds:
+                raise RebuildLockTimeout(f"等待重建锁超过 {self.wait_seconds:.0f} 秒: {self.path}")
+            time.sleep(self.poll_interval)
+
+        self.waited_seconds = time.monotonic() - started
+
+    def release(self):
+        """释放锁（锁已被其他进程接管时不删除对方的锁文件）"""
+        if self.token is None:
+            return
+
+        self._stop_renewal.set()
+        self._renewal_thread.join()
+        if self._read_lease().get('token') == self.token:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+        self.token = None
+
+    def __enter__(self) -> 'RebuildLock':
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
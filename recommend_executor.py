@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+推荐计算执行器
+将CPU密集的推荐计算移出事件循环，使用有界的线程池/进程池并在过载时快速拒绝
+"""
+
+import os
+import time
+import asyncio
+import logging
+import contextvars
+from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+
+from config import OSSConfig, ServerConfig
+from request_tracing import RequestTrace, current_trace, use_trace
+import service_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorOverloadedError(RuntimeError):
+    """在途请求数已达上限"""
+
+
+class ExecutorRestartingError(ExecutorOverloadedError):
+    """进程池已损坏（工作进程异常退出）并已重新创建，请求可稍后重试"""
+
+
+# ============== 进程池工作者 ==============
+# 进程模式下每个工作进程持有自己的推荐器，只挂载主进程写出的缓存（或共享快照），
+# 不遍历OSS重建；缓存文件（或共享快照的当前代）变化后重新挂载
+
+_worker_recommender = None
+_worker_metadata_version = None
+
+
+def _init_process_worker(scoring_engine: str):
+    """进程池工作者初始化：挂载已有的元数据（过期缓存由主进程在后台重新构建）"""
+    global _worker_recommender, _worker_metadata_version
+
+    from oss_emoji_recommender import OSSEmojiRecommender
+
+    _worker_recommender = OSSEmojiRecommender(auto_load_metadata=False, scoring_engine=scoring_engine,
+                                              revalidate_stale=False)
+    _worker_metadata_version = _get_metadata_version()
+    _worker_recommender.attach_cached_metadata()
+
+
+def _get_metadata_version():
+    """工作进程跟随的元数据版本：共享快照的当前代，未启用共享快照时为缓存文件的修改时间"""
+    if _worker_recommender is not None and _worker_recommender.shared_store is not None:
+        return _worker_recommender.shared_store.current_generation()
+    try:
+        return os.path.getmtime(OSSConfig.METADATA_CACHE_FILE)
+    except OSError:
+        return None
+
+
+def _get_worker_recommender():
+    """获取工作进程的推荐器，元数据版本变化时重新挂载"""
+    global _worker_metadata_version
+
+    version = _get_metadata_version()
+    if version is not None and version != _worker_metadata_version:
+        logger.info(f"🔄 工作进程 {os.getpid()} 检测到元数据更新，重新挂载")
+        _worker_metadata_version = version
+        _worker_recommender.attach_cached_metadata()
+
+    return _worker_recommender
+
+
+def _run_in_worker(method: str, *args) -> Tuple[object, Dict]:
+    """
+    在工作进程中执行推荐
+
+    工作进程中记录的指标和追踪不会回到主进程，因此总是在本地追踪对象中收集阶段耗时，
+    连同推荐来源计数随结果返回，由主进程记录到指标和请求追踪中。
+
+    Returns:
+        (推荐结果, {'stages': [(阶段名, 秒), ...], 'category_count': 分类数, 'sources': {来源: 数量}})
+    """
+    trace = RequestTrace('worker', method)
+    with use_trace(trace):
+        result = getattr(_get_worker_recommender(), method)(*args)
+
+    batch = result if method == 'recommend_batch' else [result]
+    sources = Counter(rec['source'] for recs in batch for rec in recs)
+    return result, {'stages': trace.stages, 'category_count': trace.category_count, 'sources': dict(sources)}
+
+
+def _process_recommend(user_text: str, top_k: int):
+    """进程池中执行单条推荐"""
+    return _run_in_worker('recommend', user_text, top_k)
+
+
+def _process_recommend_batch(texts: List[str], top_k: int):
+    """进程池中执行批量推荐"""
+    return _run_in_worker('recommend_batch', texts, top_k)
+
+
+# 工作进程返回的阶段耗时与推荐来源在主进程中对应的指标
+_WORKER_STAGE_METRICS = {
+    'scoring': service_metrics.SCORING_SECONDS,
+    'url_selection': service_metrics.URL_SELECTION_SECONDS
+}
+_WORKER_SOURCE_METRICS = {
+    'oss': service_metrics.RECOMMENDATIONS_OSS,
+    'oss_random': service_metrics.RECOMMENDATIONS_RANDOM
+}
+
+
+class RecommendExecutor:
+    """
+    有界推荐执行器
+
+    在途请求（执行中 + 排队中）超过 max_pending 时立即抛出 ExecutorOverloadedError，
+    由API层转换为带 Retry-After 的503响应，避免排队延迟无限增长。
+    计数只在事件循环线程中修改，无需加锁。
+    """
+
+    def __init__(self, recommender, mode: str = None, max_workers: int = None, max_pending: int = None):
+        """
+        初始化执行器
+
+        Args:
+            recommender: 推荐器实例（inline/thread模式使用）
+            mode: 执行方式 ('inline', 'thread', 'process')
+            max_workers: 工作者数量
+            max_pending: 最大在途请求数
+        """
+        self.recommender = recommender
+        self.mode = mode or ServerConfig.EXECUTOR_MODE
+        self.max_workers = max_workers or ServerConfig.EXECUTOR_WORKERS
+        self.max_pending = max_pending or ServerConfig.EXECUTOR_MAX_PENDING
+        self.pending = 0
+        self.rejected = 0
+
+        ServerConfig.validate_executor_mode(self.mode)
+
+        self._pool: Optional[Executor] = self._create_pool()
+
+        logger.info(f"⚙️  推荐执行器: {self.mode} 模式, 工作者 {self.max_workers}, 最大在途请求 {self.max_pending}")
+
+    def _create_pool(self) -> Optional[Executor]:
+        """按执行方式创建线程池/进程池，inline 模式返回 None"""
+        if self.mode == 'thread':
+            return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='recommend')
+        if self.mode == 'process':
+            return ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_process_worker,
+                initargs=(self.recommender.scoring_engine,)
+            )
+        return None
+
+    async def _submit(self, inline_func, process_func, *args):
+        """提交任务，超过在途上限时快速失败"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            # 计数器在进程内单调递增，执行器被重新创建时也不会回退
+            service_metrics.EXECUTOR_REJECTED.inc()
+            raise ExecutorOverloadedError(f"在途请求数已达上限 {self.max_pending}")
+
+        self.pending += 1
+        try:
+            if self._pool is None:
+                return inline_func(*args)
+
+            loop = asyncio.get_running_loop()
+            if self.mode == 'process':
+                return await self._run_in_process(loop, process_func, *args)
+
+            trace = current_trace()
+            if trace is None:
+                return await loop.run_in_executor(self._pool, inline_func, *args)
+            return await self._run_traced(loop, trace, inline_func, *args)
+        finally:
+            self.pending -= 1
+
+    async def _run_traced(self, loop, trace, func, *args):
+        """线程模式下执行被追踪的请求：记录排队耗时，并把追踪上下文带入工作线程"""
+        submitted = time.perf_counter()
+        context = contextvars.copy_context()
+
+        def run_in_context():
+            trace.add('executor_queue', time.perf_counter() - submitted)
+            return context.run(func, *args)
+
+        return await loop.run_in_executor(self._pool, run_in_context)
+
+    async def _run_in_process(self, loop, func, *args):
+        """
+        在进程池中执行推荐，并在主进程中记录工作进程返回的阶段耗时和推荐来源
+
+        Raises:
+            ExecutorRestartingError: 工作进程异常退出导致进程池损坏（进程池已重新创建）
+        """
+        pool = self._pool
+        submitted = time.perf_counter()
+        try:
+            result, timings = await loop.run_in_executor(pool, func, *args)
+        except BrokenProcessPool:
+            self._restart_pool(pool)
+            raise ExecutorRestartingError("推荐进程池已损坏并重新创建，请稍后重试")
+        round_trip = time.perf_counter() - submitted
+
+        stages = timings['stages']
+        for stage, seconds in stages:
+            metric = _WORKER_STAGE_METRICS.get(stage)
+            if metric is not None:
+                metric.observe(seconds)
+        for source, count in timings['sources'].items():
+            metric = _WORKER_SOURCE_METRICS.get(source)
+            if metric is not None:
+                metric.inc(count)
+
+        trace = current_trace()
+        if trace is not None:
+            # 往返耗时中工作进程计算以外的部分：排队、参数与结果的序列化和进程间传输
+            trace.add('executor_queue', round_trip - sum(seconds for _, seconds in stages))
+            for stage, seconds in stages:
+                trace.add(stage, seconds)
+            trace.category_count = timings['category_count']
+        return result
+
+    def _restart_pool(self, broken_pool: Executor):
+        """替换已损坏的进程池；同一批失败的请求只重建一次"""
+        if self._pool is not broken_pool:
+            return
+        logger.error("❌ 推荐进程池已损坏（工作进程异常退出），重新创建进程池")
+        broken_pool.shutdown(wait=False)
+        self._pool = self._create_pool()
+
+    async def recommend(self, user_text: str, top_k: int) -> List[Dict]:
+        """异步执行单条推荐"""
+        return await self._submit(self._recommend, _process_recommend, user_text, top_k)
+
+    async def recommend_batch(self, texts: List[str], top_k: int) -> List[List[Dict]]:
+        """异步执行批量推荐"""
+        return await self._submit(self._recommend_batch, _process_recommend_batch, texts, top_k)
+
+    def _recommend(self, user_text: str, top_k: int) -> List[Dict]:
+        return self.recommender.recommend(user_text, top_k=top_k)
+
+    def _recommend_batch(self, texts: List[str], top_k: int) -> List[List[Dict]]:
+        return self.recommender.recommend_batch(texts, top_k=top_k)
+
+    def get_stats(self) -> Dict:
+        """获取执行器统计信息"""
+        return {
+            'mode': self.mode,
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'pending': self.pending,
+            'rejected': self.rejected
+        }
+
+    def shutdown(self):
+        """关闭线程池/进程池"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+单请求阶段追踪
+按请求头或采样比例开启，记录各阶段的单调时钟耗时，通过 Server-Timing 响应头返回，
+慢请求同时写入滚动慢请求日志
+
+未被追踪的请求只多一次请求头查找（以及采样比例大于0时的一次随机数），各阶段通过
+current_trace() 取到 None 后直接跳过记录。
+"""
+
+import time
+import random
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from config import TraceConfig
+
+logger = logging.getLogger(__name__)
+
+# 当前请求的追踪对象；线程池执行推荐时由执行器复制上下文传入
+_current_trace: ContextVar[Optional['RequestTrace']] = ContextVar('emoji_request_trace', default=None)
+
+# 认证中间件（位于追踪中间件外层）把认证耗时写入 scope 的键，追踪开始时补记为 auth 阶段
+AUTH_SECONDS_SCOPE_KEY = 'emoji.auth_seconds'
+
+
+class RequestTrace:
+    """一次请求的阶段耗时记录"""
+
+    __slots__ = ('method', 'path', 'started', 'stages', 'handler_finished',
+                 'input_length', 'category_count', 'status_code')
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.stages: List[Tuple[str, float]] = []
+        self.handler_finished: Optional[float] = None
+        self.input_length: Optional[int] = None
+        self.category_count: Optional[int] = None
+        self.status_code: Optional[int] = None
+
+    def add(self, stage: str, seconds: float):
+        """记录一个阶段的耗时（秒）"""
+        self.stages.append((stage, seconds))
+
+    def elapsed(self) -> float:
+        """从请求开始到现在的耗时（秒）"""
+        return time.perf_counter() - self.started
+
+    def server_timing(self, total: float) -> str:
+        """
+        生成 Server-Timing 响应头的值
+
+        Args:
+            total: 请求总耗时（秒）
+
+        Returns:
+            如 "auth;dur=0.041, scoring;dur=1.203, total;dur=2.310"（毫秒）
+        """
+        metrics = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.stages]
+        metrics.append(f"total;dur={total * 1000:.3f}")
+        return ', '.join(metrics)
+
+    def to_dict(self, total: float) -> Dict:
+        """转换为慢请求日志条目"""
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'method': self.method,
+            'path': self.path,
+            'status_code': self.status_code,
+            'total_ms': round(total * 1000, 3),
+            'stages_ms': {stage: round(seconds * 1000, 3) for stage, seconds in self.stages},
+            'input_length': self.input_length,
+            'category_count': self.category_count
+        }
+
+
+def current_trace() -> Optional[RequestTrace]:
+    """获取当前请求的追踪对象，未追踪时返回 None"""
+    return _current_trace.get()
+
+
+@contextmanager
+def use_trace(trace: RequestTrace):
+    """在上下文内把 trace 设为当前追踪对象（进程池工作者用它收集阶段耗时，随结果返回主进程）"""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+class SlowRequestLog:
+    """滚动慢请求日志：只保留最近 max_entries 条超过阈值的被追踪请求"""
+
+    def __init__(self, max_entries: int = None, threshold_ms: float = None):
+        self.threshold_ms = TraceConfig.SLOW_THRESHOLD_MS if threshold_ms is None else threshold_ms
+        self._entries = deque(maxlen=max_entries or TraceConfig.SLOW_LOG_SIZE)
+        self._lock = threading.Lock()
+
+    def record(self, trace: RequestTrace, total: float) -> bool:
+        """
+        记录一次被追踪的请求
+
+        Returns:
+            是否超过阈值并写入日志
+        """
+        if total * 1000 < self.threshold_ms:
+            return False
+
+        entry = trace.to_dict(total)
+        with self._lock:
+            self._entries.append(entry)
+        logger.warning(f"🐢 慢请求 {trace.method} {trace.path}: {entry['total_ms']}ms, "
+                       f"输入长度 {trace.input_length}, 分类数 {trace.category_count}, "
+                       f"阶段 {entry['stages_ms']}")
+        return True
+
+    def entries(self) -> List[Dict]:
+        """按时间从新到旧返回日志条目"""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# 全局慢请求日志
+slow_request_log = SlowRequestLog()
+
+
+class RequestTracingMiddleware:
+    """
+    纯ASGI追踪中间件
+
+    对被追踪的请求创建 RequestTrace 放入上下文，在响应开始时补记序列化阶段并写入
+    Server-Timing 响应头。注册在认证中间件内层：未通过认证的请求不会被追踪，
+    也不会得到 Server-Timing 或进入慢请求日志；认证耗时由认证中间件经 scope 传入。
+    """
+
+    def __init__(self, app, header: str = None, sample_rate: float = None):
+        self.app = app
+        self.header = (header or TraceConfig.TRACE_HEADER).lower().encode('latin-1')
+        self.sample_rate = TraceConfig.SAMPLE_RATE if sample_rate is None else sample_rate
+
+    def _should_trace(self, scope) -> bool:
+        for name, value in scope['headers']:
+            if name == self.header:
+                return bool(value)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self._should_trace(scope):
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace(scope['method'], scope['path'])
+        auth_seconds = scope.get(AUTH_SECONDS_SCOPE_KEY)
+        if auth_seconds is not None:
+            # 认证在外层已经完成，计入阶段和总耗时
+            trace.started -= auth_seconds
+            trace.add('auth', auth_seconds)
+        token = _current_trace.set(trace)
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                now = time.perf_counter()
+                if trace.handler_finished is not None:
+                    # 处理函数返回后到响应开始之间主要是响应模型的校验与JSON序列化
+                    trace.add('serialization', now - trace.handler_finished)
+                trace.status_code = message['status']
+                total = now - trace.started
+                headers = list(message.get('headers', []))
+                headers.append((b'server-timing', trace.server_timing(total).encode('latin-1')))
+                message = dict(message, headers=headers)
+
+                if TraceConfig.SLOW_LOG_ENABLED:
+                    slow_request_log.record(trace, total)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+服务运行指标
+轻量的计数器 / 仪表 / 直方图实现，按 Prometheus 文本格式导出（/metrics）
+
+热路径上每次记录只有一次 bisect 和一次加锁自增，指标对象在导入时创建，调用方直接持有引用。
+"""
+
+import time
+import bisect
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 请求阶段耗时的直方图分桶（秒）
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 元数据刷新耗时的直方图分桶（秒）
+REFRESH_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    """格式化标签，如 {stage="auth"}"""
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """指标族基类：一个名称下按标签值区分多个子指标"""
+
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """获取（必要时创建）指定标签值的子指标，应在模块导入或初始化时调用并保存引用"""
+        if len(values) != len(self.label_names):
+            raise ValueError(f"{self.name} 需要标签 {self.label_names}")
+        key = tuple(str(value) for value in values)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _render_child(self, labels: List[Tuple[str, str]], child) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """按文本格式导出"""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            lines.extend(self._render_child(list(zip(self.label_names, key)), child))
+        return lines
+
+
+class _Value:
+    """单个数值，自增和设置都在锁内完成"""
+
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    """只增计数器"""
+
+    metric_type = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        """无标签计数器自增"""
+        self.labels().inc(amount)
+
+    def _render_child(self, labels, child):
+        return [f"{self.name}{_format_labels(labels)} {_format_value(child.value)}"]
+
+
+class Gauge(_Metric):
+    """可任意设置的仪表；也可以传入回调，在导出时取值"""
+
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, help_text, label_names)
+        self.callback = callback
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float):
+        """设置无标签仪表的值"""
+        self.labels().set(value)
+
+    def render(self) -> List[str]:
+        if self.callback is not None:
+            value = self.callback()
+            if value is not None:
+                self.labels().set(value)
+        return super().render()
+
+    def _render_child(self, labels, child):
+        return [f"{self.name}{_format_labels(labels)} {_format_value(child.value)}"]
+
+
+class _HistogramChild:
+    """单个直方图：非累计的分桶计数 + 总和 + 总数"""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """记录一次观测值"""
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> '_Timer':
+        """上下文管理器：记录代码块耗时"""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram: _HistogramChild):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    """固定分桶直方图"""
+
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        """无标签直方图记录观测值"""
+        self.labels().observe(value)
+
+    def _render_child(self, labels, child):
+        with child._lock:
+            counts, total, count = list(child.counts), child.sum, child.count
+
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            bucket_labels = labels + [('le', _format_value(float(bound)))]
+            lines.append(f"{self.name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """导出全部指标为 Prometheus 文本格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# ============== 全局指标 ==============
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    'emoji_request_stage_seconds', '推荐请求各阶段耗时（秒）', ['stage']))
+AUTH_SECONDS = STAGE_SECONDS.labels('auth')
+SCORING_SECONDS = STAGE_SECONDS.labels('scoring')
+URL_SELECTION_SECONDS = STAGE_SECONDS.labels('url_selection')
+RESPONSE_BUILD_SECONDS = STAGE_SECONDS.labels('response_build')
+HANDLER_SECONDS = STAGE_SECONDS.labels('handler')
+
+RECOMMENDATIONS_TOTAL = registry.register(Counter(
+    'emoji_recommendations_total', '返回的推荐结果数量，按来源区分', ['source']))
+RECOMMENDATIONS_OSS = RECOMMENDATIONS_TOTAL.labels('oss')
+RECOMMENDATIONS_RANDOM = RECOMMENDATIONS_TOTAL.labels('oss_random')
+
+REFRESH_SECONDS = registry.register(Histogram(
+    'emoji_refresh_duration_seconds', '元数据刷新耗时（秒）', ['mode', 'result'], buckets=REFRESH_BUCKETS))
+
+REBUILD_LOCK_WAIT_SECONDS = registry.register(Histogram(
+    'emoji_rebuild_lock_wait_seconds', '等待跨进程重建锁的耗时（秒）', ['outcome'], buckets=REFRESH_BUCKETS))
+
+EXECUTOR_REJECTED = registry.register(Counter(
+    'emoji_executor_rejected_total', '推荐执行器因过载拒绝的请求总数'))
+
+OSS_LIST_OBJECTS = registry.register(Counter(
+    'emoji_oss_list_objects_total', 'OSS遍历得到的表情包对象总数'))
+OSS_LIST_SECONDS = registry.register(Counter(
+    'emoji_oss_list_seconds_total', 'OSS遍历累计耗时（秒）'))
+OSS_LIST_RATE = registry.register(Gauge(
+    'emoji_oss_list_objects_per_second', '最近一次OSS遍历的速度（对象/秒）'))
+
+SNAPSHOT_CATEGORIES = registry.register(Gauge(
+    'emoji_snapshot_categories', '当前快照中的分类数量'))
+SNAPSHOT_URLS = registry.register(Gauge(
+    'emoji_snapshot_urls', '当前快照中的表情包URL数量'))
+SNAPSHOT_LOADED = registry.register(Gauge(
+    'emoji_snapshot_loaded_timestamp_seconds', '当前快照的加载时间（Unix时间戳）'))
+
+
+def record_listing(objects: int, seconds: float):
+    """记录一次完整的OSS遍历"""
+    OSS_LIST_OBJECTS.inc(objects)
+    OSS_LIST_SECONDS.inc(seconds)
+    if seconds > 0:
+        OSS_LIST_RATE.set(objects / seconds)
+
+
+def record_snapshot(categories: int, urls: int):
+    """记录当前快照规模"""
+    SNAPSHOT_CATEGORIES.set(categories)
+    SNAPSHOT_URLS.set(urls)
+    SNAPSHOT_LOADED.set(time.time())
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多工作进程共享的元数据快照
+加载或刷新元数据的进程把元数据发布为一个新"代"的二进制缓存文件（oss_metadata_binary 格式），
+再原子替换指针文件 CURRENT；其他工作进程只读映射同一个文件，URL数据由操作系统页缓存在进程间共享，
+内存占用不再随工作进程数线性增长。只共享URL数据：各进程仍由映射的元数据各自编译匹配索引
+（自动机、倒排索引、TF-IDF矩阵），其大小只与分类数相关。
+
+多个进程同时冷启动时，"挂载当前代，没有则加载并发布"在发布锁内依次进行，
+只有第一个进程加载并发布，其余进程获取锁后直接挂载它发布的一代。
+
+目录布局:
+    <dir>/gen-<纳秒时间戳>-<pid>.bin   各代元数据（写完后不再修改）
+    <dir>/CURRENT                      当前代的文件名，写临时文件后 os.replace 原子替换
+    <dir>/PUBLISH.lock                 发布锁（带租约的锁文件，见 rebuild_lock）
+
+已被映射的旧代文件删除后，映射仍然有效（POSIX），因此只保留最近几代即可。
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Mapping, Optional, Sequence, Tuple
+
+from config import ServerConfig
+from oss_metadata_binary import BinaryMetadata, CategoryUrls, load_binary_metadata, write_binary_metadata
+from rebuild_lock import RebuildLock, RebuildLockTimeout
+
+logger = logging.getLogger(__name__)
+
+POINTER_FILE = 'CURRENT'
+PUBLISH_LOCK_FILE = 'PUBLISH.lock'
+GENERATION_PREFIX = 'gen-'
+GENERATION_SUFFIX = '.bin'
+
+
+def _source_binary(metadata: Mapping[str, Sequence[str]]) -> Optional[BinaryMetadata]:
+    """元数据整体来自同一个二进制缓存文件时返回该文件的映射（如快照中的分类URL视图）"""
+    if isinstance(metadata, BinaryMetadata):
+        return metadata
+
+    store = None
+    for urls in metadata.values():
+        if not isinstance(urls, CategoryUrls) or (store is not None and urls.store is not store):
+            return None
+        store = urls.store
+    if store is None or len(store) != len(metadata):
+        return None
+    return store
+
+
+class SharedSnapshotStore:
+    """共享快照目录：发布新代、读取当前代、清理旧代"""
+
+    def __init__(self, directory: str = None, keep: int = None):
+        """
+        初始化共享目录
+
+        Args:
+            directory: 共享目录路径，默认使用 ServerConfig.SHARED_SNAPSHOT_DIR
+            keep: 保留的代数（含当前代）
+        """
+        self.directory = directory or ServerConfig.SHARED_SNAPSHOT_DIR
+        self.keep = max(1, keep or ServerConfig.SHARED_SNAPSHOT_KEEP)
+        os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def pointer_path(self) -> str:
+        return os.path.join(self.directory, POINTER_FILE)
+
+    def current_generation(self) -> Optional[str]:
+        """读取当前代的文件名，尚未发布时返回 None"""
+        try:
+            with open(self.pointer_path, 'r', encoding='utf-8') as f:
+                generation = f.read().strip()
+        except OSError:
+            return None
+        return generation or None
+
+    @contextmanager
+    def publish_lock(self):
+        """
+        持有共享目录的发布锁（跨进程），用于串行化冷启动时的"挂载或加载并发布"
+
+        等待超时时不加锁继续，最坏情况下各进程各自发布一代，与不加锁时相同。
+        """
+        lock = RebuildLock(os.path.join(self.directory, PUBLISH_LOCK_FILE))
+        try:
+            lock.acquire()
+        except RebuildLockTimeout as e:
+            logger.warning(f"⚠️  等待共享快照发布锁超时，不加锁继续: {e}")
+            yield
+            return
+
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def attach(self, generation: str = None) -> Optional[Tuple[str, BinaryMetadata]]:
+        """
+        只读映射指定代（默认当前代）
+
+        Returns:
+            (代文件名, 映射的元数据)；不存在或无效时返回 None
+        """
+        generation = generation or self.current_generation()
+        if generation is None:
+            return None
+        metadata = load_binary_metadata(os.path.join(self.directory, generation))
+        if metadata is None:
+            return None
+        return generation, metadata
+
+    def publish(self, metadata: Mapping[str, Sequence[str]]) -> str:
+        """
+        发布新一代元数据并原子切换指针
+
+        已经是二进制缓存映射的元数据直接复制映射中的字节（不按路径链接：映射之后缓存文件可能已被替换），
+        其他元数据写出为新的二进制文件；两种方式都先写临时文件再原子替换。
+
+        Args:
+            metadata: 要发布的元数据
+
+        Returns:
+            新代的文件名
+        """
+        generation = f"{GENERATION_PREFIX}{time.time_ns()}-{os.getpid()}{GENERATION_SUFFIX}"
+        path = os.path.join(self.directory, generation)
+
+        source = _source_binary(metadata)
+        if source is not None:
+            source.copy_to(path)
+        else:
+            write_binary_metadata(metadata, path)
+
+        tmp_path = f"{self.pointer_path}.tmp.{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(generation)
+        os.replace(tmp_path, self.pointer_path)
+
+        logger.info(f"📤 已发布共享元数据快照: {generation}")
+        self._remove_old_generations(generation)
+        return generation
+
+    def _remove_old_generations(self, current: str):
+        """只保留最近 keep 代；正在被其他进程映射的文件删除后映射仍然有效"""
+        generations = sorted(
+            (name for name in os.listdir(self.directory)
+             if name.startswith(GENERATION_PREFIX) and name.endswith(GENERATION_SUFFIX)),
+            key=lambda name: int(name[len(GENERATION_PREFIX):].split('-', 1)[0])
+        )
+        for name in generations[:-self.keep]:
+            if name == current:
+                continue
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError as e:
+                logger.warning(f"⚠️  删除旧共享快照失败 {name}: {e}")
+
+
+class SharedSnapshotWatcher:
+    """后台线程定期检查指针文件，当前代变化时回调"""
+
+    def __init__(self, store: SharedSnapshotStore, on_change: Callable[[str], None],
+                 interval: float = None):
+        """
+        初始化监视器
+
+        Args:
+            store: 共享快照目录
+            on_change: 当前代变化时调用，参数为新代文件名
+            interval: 检查间隔（秒）
+        """
+        self.store = store
+        self.on_change = on_change
+        self.interval = interval or ServerConfig.SHARED_SNAPSHOT_CHECK_SECONDS
+        self.known_generation: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, known_generation: Optional[str] = None):
+        """启动监视线程"""
+        self.known_generation = known_generation
+        self._thread = threading.Thread(target=self._run, name='shared-snapshot-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            generation = self.store.current_generation()
+            if generation is None or generation == self.known_generation:
+                continue
+            try:
+                self.on_change(generation)
+                self.known_generation = generation
+            except Exception as e:
+                logger.error(f"❌ 切换共享元数据快照失败 {generation}: {e}")
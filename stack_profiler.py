@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+按需采样分析器
+在限定时长内由后台线程定期读取全部线程的调用栈（sys._current_frames），
+汇总为 flamegraph.pl / speedscope 等工具可直接渲染的折叠栈格式：
+
+    MainThread;uvicorn.main.run;...;oss_emoji_recommender.OSSEmojiRecommender.recommend 42
+
+不采样时没有任何钩子或线程，对请求处理零开销；同一时间只允许一次采样。
+"""
+
+import sys
+import time
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Optional
+
+from config import ProfilerConfig
+
+logger = logging.getLogger(__name__)
+
+# 叶子帧为这些函数时视为线程空闲（等待锁、任务队列或IO事件）
+IDLE_FUNCTIONS = frozenset([
+    ('threading', 'wait'),
+    ('threading', '_wait_for_tstate_lock'),
+    ('queue', 'get'),
+    ('selectors', 'select'),
+    ('concurrent.futures.thread', '_worker'),
+])
+
+
+class ProfilerBusyError(RuntimeError):
+    """已有采样正在进行"""
+
+
+def _frame_label(frame) -> str:
+    """帧标签：模块名.限定函数名（Python 3.11+ 包含类名，如 OSSEmojiRecommender.recommend）"""
+    code = frame.f_code
+    module = frame.f_globals.get('__name__', '?')
+    return f"{module}.{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def _is_idle(frame) -> bool:
+    return (frame.f_globals.get('__name__'), frame.f_code.co_name) in IDLE_FUNCTIONS
+
+
+class StackProfiler:
+    """定时采样全部线程调用栈的分析器"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.last_run: Optional[Dict] = None
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def profile(self, seconds: float, interval: float = None, include_idle: bool = False) -> Dict:
+        """
+        在当前线程中采样 seconds 秒
+
+        Args:
+            seconds: 采样时长（不超过 ProfilerConfig.MAX_SECONDS）
+            interval: 采样间隔（秒）
+            include_idle: 是否保留空闲线程的栈
+
+        Returns:
+            {'collapsed': 折叠栈文本, 'samples': 采样轮数, 'stacks': 栈样本数, ...}
+
+        Raises:
+            ProfilerBusyError: 已有采样正在进行
+            ValueError: 参数不合法
+        """
+        ProfilerConfig.validate_duration(seconds)
+        interval = ProfilerConfig.DEFAULT_INTERVAL_MS / 1000 if interval is None else interval
+        if interval <= 0:
+            raise ValueError("采样间隔必须大于0")
+
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("已有采样正在进行")
+
+        try:
+            logger.info(f"🔬 开始采样调用栈: {seconds}s, 间隔 {interval * 1000:.1f}ms")
+            result = self._sample(seconds, interval, include_idle)
+            self.last_run = {key: value for key, value in result.items() if key != 'collapsed'}
+            logger.info(f"✅ 采样完成: {result['samples']} 轮, {result['stacks']} 个栈样本")
+            return result
+        finally:
+            self._lock.release()
+
+    def _sample(self, seconds: float, interval: float, include_idle: bool) -> Dict:
+        own_thread = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+
+        while True:
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread or (not include_idle and _is_idle(frame)):
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(thread_names.get(thread_id, str(thread_id)))
+                stacks[';'.join(reversed(labels))] += 1
+            samples += 1
+
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            time.sleep(min(interval, deadline - now))
+
+        collapsed = '\n'.join(f"{stack} {count}" for stack, count in stacks.most_common())
+        return {
+            'collapsed': collapsed + '\n' if collapsed else '',
+            'samples': samples,
+            'stacks': sum(stacks.values()),
+            'unique_stacks': len(stacks),
+            'duration_seconds': round(time.perf_counter() - started, 3),
+            'interval_ms': round(interval * 1000, 3),
+            'finished_at': time.time()
+        }
+
+
+# 全局分析器（每个进程一个）
+profiler = StackProfiler()
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+测试公共夹具：项目模块与 benchmarks 下的模拟OSS可直接导入，缓存文件写入临时目录
+"""
+
+import os
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (PROJECT_ROOT, os.path.join(PROJECT_ROOT, 'benchmarks')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from config import ModelConfig, OSSConfig, ServerConfig
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """每个测试使用独立的缓存文件，不共享快照，不构建语义打分器"""
+    monkeypatch.setattr(OSSConfig, 'METADATA_CACHE_FILE', str(tmp_path / 'oss_emoji_metadata.json'))
+    monkeypatch.setattr(OSSConfig, 'BINARY_CACHE_FILE', str(tmp_path / 'oss_emoji_metadata.bin'))
+    monkeypatch.setattr(OSSConfig, 'MANIFEST_CACHE_FILE', str(tmp_path / 'oss_emoji_manifest.json'))
+    monkeypatch.setattr(ServerConfig, 'SHARED_SNAPSHOT_DIR', '')
+    monkeypatch.setattr(ModelConfig, 'USE_TFIDF_DEFAULT', False)
+    return tmp_path
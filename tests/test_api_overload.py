@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+执行器过载时API快速返回带 Retry-After 的503
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from config import AuthConfig, ServerConfig
+import oss_api_server
+import service_metrics
+from oss_emoji_recommender import OSSEmojiRecommender
+from recommend_executor import ExecutorRestartingError, RecommendExecutor
+
+AUTH = (AuthConfig.USERNAME, AuthConfig.PASSWORD)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """注入已加载元数据的推荐器和 inline 执行器（不经过 lifespan，不访问OSS）"""
+    recommender = OSSEmojiRecommender(auto_load_metadata=False)
+    recommender.emoji_metadata = {'开心小猫': ['https://example.com/sably/开心小猫/0.gif'],
+                                  '难过狗狗': ['https://example.com/sably/难过狗狗/0.gif']}
+    executor = RecommendExecutor(recommender, mode='inline', max_pending=2)
+    monkeypatch.setattr(oss_api_server, 'recommender', recommender)
+    monkeypatch.setattr(oss_api_server, 'recommend_executor', executor)
+    oss_api_server.prepare_response_fragments()
+    return TestClient(oss_api_server.app)
+
+
+def _assert_busy(response):
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == str(ServerConfig.RETRY_AFTER_SECONDS)
+
+
+def test_recommend_succeeds_below_limit(client):
+    response = client.post('/recommend', json={'input': '今天好开心', 'top_k': 1}, auth=AUTH)
+    assert response.status_code == 200
+    assert response.json()['output'][0]['category'] == '开心小猫'
+
+
+def test_overloaded_executor_returns_503(client):
+    executor = oss_api_server.recommend_executor
+    executor.pending = executor.max_pending
+    rejected = service_metrics.EXECUTOR_REJECTED.labels().value
+
+    _assert_busy(client.post('/recommend', json={'input': '开心'}, auth=AUTH))
+    _assert_busy(client.post('/recommend/batch', json={'inputs': ['开心', '难过']}, auth=AUTH))
+
+    assert executor.rejected == 2
+    assert service_metrics.EXECUTOR_REJECTED.labels().value == rejected + 2
+
+
+def test_restarting_process_pool_returns_503(client, monkeypatch):
+    async def broken(*args):
+        raise ExecutorRestartingError("推荐进程池已损坏并重新创建，请稍后重试")
+
+    monkeypatch.setattr(oss_api_server.recommend_executor, 'recommend', broken)
+    _assert_busy(client.post('/recommend', json={'input': '开心'}, auth=AUTH))
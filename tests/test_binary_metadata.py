@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+二进制元数据缓存的写出与映射读取
+"""
+
+import json
+
+from oss_metadata_binary import BinaryMetadata, export_json, load_binary_metadata, write_binary_metadata
+
+METADATA = {
+    '开心小猫': ['https://bucket.oss-cn-shanghai.aliyuncs.com/sably/开心小猫/00001.gif',
+                 'https://bucket.oss-cn-shanghai.aliyuncs.com/sably/开心小猫/00002.png'],
+    'sad dog': ['https://bucket.oss-cn-shanghai.aliyuncs.com/sably/sad%20dog/a.webp'],
+    '空分类': [],
+    '😀表情': ['https://bucket.oss-cn-shanghai.aliyuncs.com/sably/😀表情/x.jpg'] * 3,
+}
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'metadata.bin')
+    write_binary_metadata(METADATA, path)
+
+    store = load_binary_metadata(path)
+    assert isinstance(store, BinaryMetadata)
+    assert store.category_count == len(METADATA)
+    assert store.url_count == sum(len(urls) for urls in METADATA.values())
+    assert list(store) == list(METADATA)
+    assert {category: list(urls) for category, urls in store.items()} == METADATA
+    assert store['开心小猫'][-1] == METADATA['开心小猫'][-1]
+    assert '不存在' not in store
+
+
+def test_export_json(tmp_path):
+    binary_path, json_path = str(tmp_path / 'metadata.bin'), str(tmp_path / 'metadata.json')
+    write_binary_metadata(METADATA, binary_path)
+    export_json(binary_path, json_path)
+
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    assert data['categories'] == METADATA
+    assert data['metadata']['total_files'] == sum(len(urls) for urls in METADATA.values())
+
+
+def test_invalid_file_returns_none(tmp_path):
+    path = tmp_path / 'metadata.bin'
+    path.write_bytes(b'not a metadata file' * 8)
+    assert load_binary_metadata(str(path)) is None
+    assert load_binary_metadata(str(tmp_path / 'missing.bin')) is None
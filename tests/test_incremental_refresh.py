@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+增量刷新：按清单差异只重编译受影响的分类，结果与全量重建一致
+"""
+
+import pytest
+
+from common import synthetic_category_names
+from fake_oss import FakeObjectIterator, generate_bucket
+
+from config import OSSConfig
+from oss_emoji_recommender import OSSEmojiRecommender
+from oss_metadata_builder import OSSMetadataBuilder
+
+ROOT = OSSConfig.EMOJI_ROOT_PATH
+
+
+@pytest.fixture
+def bucket():
+    return generate_bucket(synthetic_category_names(30), 4, root_path=ROOT)
+
+
+@pytest.fixture
+def recommender(bucket):
+    return OSSEmojiRecommender(
+        builder_factory=lambda: OSSMetadataBuilder(bucket=bucket, object_iterator=FakeObjectIterator),
+        revalidate_stale=False
+    )
+
+
+def _full_rebuild(bucket):
+    metadata = OSSMetadataBuilder(bucket=bucket, object_iterator=FakeObjectIterator).build_and_save_metadata(
+        force_rebuild=True)
+    return {category: list(urls) for category, urls in metadata.items()}
+
+
+def _category_keys(bucket, category):
+    """分类目录下的全部对象键（含目录占位对象和非图片文件）"""
+    return [obj.key for obj in FakeObjectIterator(bucket, prefix=f"{ROOT}{category}/")]
+
+
+def test_delta_covers_only_changed_categories(bucket, recommender):
+    categories = list(recommender.snapshot.categories)
+    changed, removed = categories[3], categories[7]
+    added = '增量新增分类'
+
+    bucket.put_object(f"{ROOT}{changed}/99999_new.gif")
+    for key in _category_keys(bucket, removed):
+        bucket.delete_object(key)
+    bucket.put_object(f"{ROOT}{added}/00000_a.gif")
+    bucket.put_object(f"{ROOT}{added}/00001_b.png")
+
+    snapshot, delta = recommender.build_incremental_snapshot()
+
+    assert not delta['full_rebuild']
+    assert delta['affected_categories'] == {changed, removed, added}
+    assert len(delta['added']) == 3
+    assert len(delta['removed']) == len(recommender.snapshot.metadata[removed])
+    assert delta['changed'] == []
+    assert {category: list(urls) for category, urls in snapshot.metadata.items()} == _full_rebuild(bucket)
+
+
+def test_modified_object_is_reported_as_changed(bucket, recommender):
+    category = recommender.snapshot.categories[0]
+    key = next(key for key in _category_keys(bucket, category) if not key.endswith(('/', '.txt')))
+    bucket.put_object(key, size=12345)
+
+    _, delta = recommender.build_incremental_snapshot()
+
+    assert not delta['full_rebuild']
+    assert delta['affected_categories'] == {category}
+    assert delta['added'] == [] and delta['removed'] == []
+    assert len(delta['changed']) == 1
+
+
+def test_no_change_keeps_snapshot(recommender):
+    current = recommender.snapshot
+    snapshot, delta = recommender.build_incremental_snapshot()
+
+    assert not delta['full_rebuild']
+    assert delta['affected_categories'] == set()
+    assert snapshot is current
+
+
+def test_manifest_from_another_build_forces_full_rebuild(bucket, recommender):
+    # 清单被其他进程重写后与当前元数据不再出自同一次构建
+    recommender.metadata_origin = {**recommender.metadata_origin, 'build_id': '1970-01-01T00:00:00'}
+
+    _, delta = recommender.build_incremental_snapshot()
+
+    assert delta['full_rebuild']
+    assert delta['affected_categories'] == set(recommender.snapshot.categories)
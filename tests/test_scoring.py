@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+打分引擎与参考实现（逐分类 calculate_keyword_score）的等价性
+"""
+
+import pytest
+
+from common import CHAT_TEXTS, synthetic_category_names
+
+import emoji_vectorized
+from emoji_snapshot import RecommenderSnapshot
+from oss_emoji_recommender import OSSEmojiRecommender
+from bench_scoring import check_equal_bonuses, reference_ranking, to_ranking
+
+TOP_K = 5
+
+
+@pytest.fixture(scope='module')
+def recommender():
+    categories = synthetic_category_names(500)
+    recommender = OSSEmojiRecommender(auto_load_metadata=False, scoring_engine='automaton')
+    recommender.emoji_metadata = {category: [f"https://example.com/sably/{category}/0.gif"]
+                                  for category in categories}
+    return recommender
+
+
+def test_automaton_matches_reference(recommender):
+    snapshot = recommender.snapshot
+    for text in CHAT_TEXTS:
+        expected = reference_ranking(recommender, snapshot.categories, text)
+        assert to_ranking(snapshot, snapshot.rank(snapshot.score(text))) == expected, text
+        assert to_ranking(snapshot, snapshot.automaton_top_k(text, TOP_K)) == expected[:TOP_K], text
+
+
+@pytest.mark.skipif(not emoji_vectorized.is_available(), reason='未安装NumPy')
+def test_numpy_matches_reference(recommender):
+    snapshot = RecommenderSnapshot(recommender.snapshot.metadata, recommender.emotion_keywords, 'numpy')
+    scorer = snapshot.vector_scorer
+    for text, ranked in zip(CHAT_TEXTS, scorer.top_k_batch(CHAT_TEXTS, TOP_K)):
+        expected = reference_ranking(recommender, snapshot.categories, text)
+        assert to_ranking(snapshot, snapshot.rank(scorer.score(text))) == expected, text
+        assert to_ranking(snapshot, ranked) == expected[:TOP_K], text
+
+
+def test_equal_bonuses_keep_category_order():
+    assert check_equal_bonuses() == []